@@ -0,0 +1,372 @@
+"""
+Microbenchmarks for the hot paths of the engine.
+Separate from the unit tests: these only measure how fast things are, not if they are correct.
+
+The results can be saved as json, and compared against an earlier (baseline) result file,
+to spot performance regressions before a release:
+
+    python scripts/microbench.py --save baseline.json
+    ... make changes ...
+    python scripts/microbench.py --baseline baseline.json
+
+The exit code is 1 when a benchmark got slower than the allowed threshold compared to the baseline.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+tale_root = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+sys.path.insert(0, tale_root)
+
+import tale
+from tale import base, driver, errors, mud_context, player, util
+from tale.savegames import TaleSerializer, TaleDeserializer
+from tale.story import StoryConfig, MoneyType
+from tale.tio.console_io import ConsoleIo
+from tale.tio.if_browser_io import HttpIo
+from tale.tio.styleaware_wrapper import StyleTagsAwareTextWrapper
+
+
+# benchmark name -> (setup function that returns the function to time, fixed number of loops or 0 to calibrate)
+benchmarks = collections.OrderedDict()     # type: Dict[str, Tuple[Callable[[], Callable[[], Any]], int]]
+
+
+def benchmark(name: str, loops: int=0) -> Callable:
+    """Register a benchmark. The decorated setup function must return the (argumentless) function to time."""
+    def register(setup: Callable[[], Callable[[], Any]]) -> Callable:
+        benchmarks[name] = (setup, loops)
+        return setup
+    return register
+
+
+class BenchDriver(driver.Driver):
+    def __init__(self) -> None:
+        super().__init__()
+        # fix up some essential attributes on the driver that are normally only present after loading a story file
+        self.game_clock = util.GameDateTime(datetime.datetime.now())
+        self.moneyfmt = util.MoneyFormatter.create_for(MoneyType.MODERN)
+
+
+def crowded_room(num_livings: int=40, num_items: int=80) -> Tuple[base.Location, player.Player]:
+    room = base.Location("Market square", "A crowded market square, full of people and stuff.")
+    other_room = base.Location("Side street")
+    room.add_exits([base.Exit(["north", "street"], other_room, "A side street leads north."),
+                    base.Exit("south", other_room, "The south gate.")])
+    julie = player.Player("julie", "f", race="human")
+    julie.move(room)
+    for number in range(num_livings):
+        living = base.Living("npc%d" % number, "mf"[number % 2], race="human", descr="Just someone in the crowd.")
+        living.aliases = {"person%d" % number}
+        living.move(room)
+    for number in range(num_items):
+        item = base.Item("thing%d" % number, "small thing %d" % number, descr="A small thing lying about.")
+        item.aliases = {"object%d" % number}
+        room.insert(item, None)
+    room.insert(base.Item("newspaper", "today's newspaper"), None)
+    base.Living("kate", "f", race="human").move(room)
+    base.Living("max", "m", race="human").move(room)
+    return room, julie
+
+
+soul_commands = ["smile at kate and max", "grin sickly at everyone", "wave at npc12", "poke kate",
+                 "examine newspaper", "take thing42 and thing7", "say hello everyone", "nod happily at max"]
+
+
+@benchmark("soul_parse_crowded")
+def setup_soul_parse() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    soul = base.Soul()
+    external_verbs = {"examine", "take", "say"}
+
+    def run() -> None:
+        for command in soul_commands:
+            try:
+                soul.parse(julie, command, external_verbs)
+            except errors.NonSoulVerb:
+                pass
+    return run
+
+
+@benchmark("soul_parse_cached_crowded")
+def setup_soul_parse_cached() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    soul = base.Soul(parse_cache_size=16)
+
+    class ExternalVerbs(set):
+        @property
+        def parse_cache_token(self) -> Any:
+            return self     # the verbs never change during the benchmark
+
+    external_verbs = ExternalVerbs({"examine", "take", "say"})
+
+    def run() -> None:
+        for command in soul_commands:
+            try:
+                soul.parse(julie, command, external_verbs)
+            except errors.NonSoulVerb:
+                pass
+    return run
+
+
+@benchmark("soul_process_verb_parsed_crowded")
+def setup_soul_process_verb() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    soul = base.Soul()
+    parsed = [soul.parse(julie, command) for command in ["smile at kate and max", "grin sickly at everyone", "poke kate"]]
+
+    def run() -> None:
+        for p in parsed:
+            soul.process_verb_parsed(julie, p)
+    return run
+
+
+@benchmark("tab_complete_crowded")
+def setup_tab_complete() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    conn = player.PlayerConnection(julie)
+    conn.io = ConsoleIo(conn)
+
+    def run() -> None:
+        for prefix in ["s", "sm", "n", "npc1", "th", "ne", "x"]:
+            conn.io.tab_complete(prefix, mud_context.driver)
+    return run
+
+
+@benchmark("suggest_verbs_crowded")
+def setup_suggest_verbs() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    mud_context.driver.suggest_verbs(julie, "smlie")    # creates the spelling indexes
+
+    def run() -> None:
+        for word in ["smlie", "nroth", "invnetory", "kaet", "xyzzy"]:
+            mud_context.driver.suggest_verbs(julie, word)
+    return run
+
+
+@benchmark("location_look_crowded")
+def setup_location_look() -> Callable[[], Any]:
+    room, julie = crowded_room()
+    return lambda: room.look(exclude_living=julie)
+
+
+@benchmark("location_look_crowded_changed")
+def setup_location_look_changed() -> Callable[[], Any]:
+    room, julie = crowded_room()
+
+    def run() -> None:
+        room.changed()      # the look has to be composed anew
+        room.look(exclude_living=julie)
+    return run
+
+
+sample_text = ("<location>[Market square]</> A <bright>crowded</> market square, full of people and stuff. "
+               "It's noisy here -- merchants shout their \"best\" prices and a <it>juggler</> tries to catch some attention. "
+               "You see <item>a newspaper</>, <item>a small thing</> and <living>kate</> and <living>max</> who are chatting. ") * 3
+
+
+@benchmark("connection_get_output_console")
+def setup_get_output() -> Callable[[], Any]:
+    julie = player.Player("julie", "f", race="human")
+    conn = player.PlayerConnection(julie, ConsoleIo(None))
+
+    def run() -> None:
+        for _ in range(5):
+            julie.tell(sample_text)
+            julie.tell("\n")
+        julie.tell("  inventory:\n    a newspaper\n    a small thing", format=False)
+        conn.get_output()
+    return run
+
+
+@benchmark("styleaware_wrapper_fill")
+def setup_wrapper() -> Callable[[], Any]:
+    wrapper = StyleTagsAwareTextWrapper(width=72, fix_sentence_endings=True, initial_indent="  ", subsequent_indent="  ")
+    return lambda: wrapper.fill(sample_text)
+
+
+@benchmark("httpio_convert_to_html")
+def setup_convert_to_html() -> Callable[[], Any]:
+    io = HttpIo(None, None)
+    return lambda: io.convert_to_html(sample_text)
+
+
+@benchmark("savegame_roundtrip")
+def setup_savegame() -> Callable[[], Any]:
+    room, julie = crowded_room(20, 40)
+    items = list(room.items)
+    livings = [living for living in room.livings if living is not julie]
+    locations = [room] + list({x.target for x in room.exits.values()})
+    exits = list(set(room.exits.values()))
+    config = StoryConfig()
+    serializer = TaleSerializer()
+    deserializer = TaleDeserializer()
+
+    def run() -> None:
+        data = serializer.serialize(config, julie, items, livings, locations, exits, [], mud_context.driver.game_clock)
+        deserializer.deserialize(data)
+    return run
+
+
+@benchmark("item_clone")
+def setup_item_clone() -> Callable[[], Any]:
+    prototype = base.Prototype("sword", "rusty sword", descr="An old, rusty sword. It has seen better days.",
+                               aliases={"blade", "rusty"}, extra_desc={"rust": "It's everywhere."})
+    sword = base.Weapon("sword")
+    sword.init_from_prototype(prototype)
+    sword.value = 12.5
+    sword.weight = 3.0
+
+    def run() -> None:
+        clone = sword.clone()
+        del base.MudObjRegistry.all_items[clone.vnum]
+    return run
+
+
+circle_loader = """
+import datetime, sys, tempfile, time
+sys.path.insert(0, ".")
+sys.path.insert(1, {tale_root!r})
+from tale import mud_context, util, driver, vfs
+import story
+d = driver.Driver()
+d.game_clock = util.GameDateTime(datetime.datetime.now())
+d.moneyfmt = util.MoneyFormatter.create_for(story.Story.config.money_type)
+d.user_resources = vfs.VirtualFileSystem(root_path=tempfile.mkdtemp(), readonly=False)
+mud_context.driver = d
+mud_context.config = story.Story.config
+import zones
+zones.init_zones(d)
+"""
+
+
+@benchmark("circle_world_loading", loops=1)
+def setup_circle() -> Callable[[], Any]:
+    # the circle data is cached in module globals, so every load is done in a fresh interpreter process.
+    # the measured time thus includes the interpreter startup.
+    code = circle_loader.format(tale_root=tale_root)
+    circle_dir = os.path.join(tale_root, "stories", "circle")
+
+    def run() -> None:
+        subprocess.check_call([sys.executable, "-c", code], cwd=circle_dir, stdout=subprocess.DEVNULL)
+    return run
+
+
+def calibrate(function: Callable[[], Any], min_time: float) -> int:
+    """determine the number of loops needed for a single timing to take at least min_time seconds"""
+    loops = 1
+    while True:
+        if timed(function, loops) >= min_time:
+            return loops
+        loops *= 2
+
+
+def timed(function: Callable[[], Any], loops: int) -> float:
+    timer = time.perf_counter
+    start = timer()
+    for _ in range(loops):
+        function()
+    return timer() - start
+
+
+def run_benchmarks(names: List[str], repeat: int, min_time: float) -> Dict[str, Dict[str, Any]]:
+    results = collections.OrderedDict()    # type: Dict[str, Dict[str, Any]]
+    for name in names:
+        setup, loops = benchmarks[name]
+        function = setup()
+        function()   # warm up
+        loops = loops or calibrate(function, min_time)
+        timings = sorted(timed(function, loops) / loops for _ in range(repeat))
+        results[name] = {
+            "loops": loops,
+            "repeat": repeat,
+            "best": timings[0],
+            "median": timings[len(timings) // 2]
+        }
+        print("%-36s  best %12s   median %12s   (%d loops)" %
+              (name, format_time(timings[0]), format_time(timings[len(timings) // 2]), loops))
+    return results
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1.0:
+        return "%.3f s" % seconds
+    if seconds >= 0.001:
+        return "%.3f ms" % (seconds * 1000)
+    return "%.3f us" % (seconds * 1000000)
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """prints the comparison with the baseline results and returns the names of the benchmarks that regressed"""
+    regressions = []
+    print("\nCompared to baseline (tale %s, python %s):" % (baseline["tale_version"], baseline["python_version"]))
+    for name, result in results.items():
+        base_result = baseline["results"].get(name)
+        if not base_result:
+            print("%-36s  (not in baseline)" % name)
+            continue
+        ratio = result["best"] / base_result["best"]
+        marker = ""
+        if ratio > 1.0 + threshold:
+            marker = "  <-- SLOWER"
+            regressions.append(name)
+        elif ratio < 1.0 - threshold:
+            marker = "  faster"
+        print("%-36s  %12s -> %12s   %+6.1f%%%s" %
+              (name, format_time(base_result["best"]), format_time(result["best"]), (ratio - 1.0) * 100, marker))
+    return regressions
+
+
+def main(args: List[str]=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the hot paths of the Tale engine.")
+    parser.add_argument('-f', '--filter', type=str, help='only run the benchmarks whose name contains this text', default="")
+    parser.add_argument('-r', '--repeat', type=int, help='number of timings per benchmark, default=5', default=5)
+    parser.add_argument('-m', '--min-time', type=float, help='minimum duration of one timing in seconds, default=0.2', default=0.2)
+    parser.add_argument('-s', '--save', type=str, help='save the results as json to this file')
+    parser.add_argument('-b', '--baseline', type=str, help='compare the results against this json file')
+    parser.add_argument('-t', '--threshold', type=float, help='allowed slowdown compared to the baseline, default=0.1 (10%%)', default=0.1)
+    parser.add_argument('-l', '--list', help='list the available benchmarks', action='store_true')
+    options = parser.parse_args(args)
+    if options.list:
+        print("\n".join(benchmarks))
+        return 0
+    names = [name for name in benchmarks if options.filter in name]
+    mud_context.driver = BenchDriver()
+    mud_context.config = StoryConfig()
+    mud_context.resources = mud_context.driver.resources
+    print("Tale %s, %s %s on %s\n" % (tale.__version__, platform.python_implementation(), platform.python_version(), platform.platform()))
+    results = run_benchmarks(names, options.repeat, options.min_time)
+    output = {
+        "tale_version": tale.__version__,
+        "python_version": platform.python_version(),
+        "python_implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "date": datetime.datetime.now().isoformat(),
+        "results": results
+    }
+    if options.save:
+        with open(options.save, "w") as out:
+            json.dump(output, out, indent=2)
+        print("\nResults written to", options.save)
+    if options.baseline:
+        with open(options.baseline) as inp:
+            baseline = json.load(inp)
+        regressions = compare(results, baseline, options.threshold)
+        if regressions:
+            print("\n%d benchmark(s) got slower: %s" % (len(regressions), ", ".join(regressions)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
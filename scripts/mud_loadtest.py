@@ -0,0 +1,332 @@
+"""
+Headless load generator and latency benchmark for the MUD driver.
+
+Starts the mud driver on a story, without the web server, and connects a number
+of scripted bot players through an in-process I/O adapter. The bots log in via the
+regular login dialog and then walk around, talk, and take and drop things at a configurable rate.
+Afterwards it reports the command-to-output latency distribution, the server tick durations,
+the memory growth and the length of the deferreds queue.
+
+Example:  python scripts/mud_loadtest.py -g stories/circle -n 50 -t 60 -r 0.5 --json loadtest.json
+(The demo story is less suitable: the bots will stumble upon the game ending there.)
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from tale import accounts, base
+from tale.driver_mud import MudDriver, LimboReaper
+from tale.player import PlayerConnection
+from tale.profiler import RollingHistogram
+from tale.tio.mud_browser_io import MudHttpIo
+
+try:
+    import resource
+except ImportError:
+    resource = None     # not available on windows
+
+
+BOT_PASSWORD = "loadtest123"
+DEFAULT_MIX = "walk=4,say=2,take=1,drop=1,look=1"
+
+
+def bot_name(number: int) -> str:
+    # account names can only contain lowercase letters
+    letters = ""
+    while True:
+        number, digit = divmod(number, 26)
+        letters = chr(ord('a') + digit) + letters
+        if number == 0:
+            return "bot" + letters.rjust(3, "a")
+
+
+class BotIo(MudHttpIo):
+    """
+    In-process I/O adapter for a bot player. The html output is rendered as usual and then discarded.
+    The first output (or input prompt) after a command was entered, marks the response to that command.
+    """
+    def __init__(self, player_connection: PlayerConnection) -> None:
+        super().__init__(player_connection)
+        self.responded = threading.Event()
+        self.command_sent = 0.0
+        self.latency = 0.0
+
+    def command(self, text: str) -> None:
+        self.responded.clear()
+        self.command_sent = time.perf_counter()
+        self.player_connection.player.store_input_line(text)
+
+    def response(self, discard_html: bool=True) -> None:
+        if discard_html:
+            self.get_html_to_browser()
+            self.get_html_special()
+        if self.command_sent and not self.responded.is_set():
+            self.latency = time.perf_counter() - self.command_sent
+            self.responded.set()
+
+    def render_output(self, paragraphs: Sequence[Tuple[str, bool]], **params: Any) -> str:
+        result = super().render_output(paragraphs, **params)
+        self.response()
+        return result
+
+    def output(self, *lines: str) -> None:
+        super().output(*lines)
+        self.response()
+
+    def output_no_newline(self, text: str) -> None:
+        super().output_no_newline(text)
+        self.response(False)    # can be called from within output(), which holds the html buffer lock
+
+    def write_input_prompt(self) -> None:
+        self.response()
+
+
+class LoadTestDriver(MudDriver):
+    """
+    Mud driver that runs the game loop in a background thread, and the bots against it,
+    instead of the web server. Uses a temporary accounts database.
+    """
+    def __init__(self, options: argparse.Namespace) -> None:
+        super().__init__()
+        self.options = options
+        self.results = {}   # type: Dict[str, Any]
+
+    def create_player_io(self, connection: PlayerConnection) -> MudHttpIo:
+        return BotIo(connection)
+
+    def start_main_loop(self):
+        accounts_dir = tempfile.mkdtemp(prefix="tale-loadtest")
+        self.mud_accounts = accounts.MudAccounts(os.path.join(accounts_dir, "useraccounts.sqlite"))
+        base._limbo.init_inventory([LimboReaper()])  # add the grim reaper to Limbo
+        self.mud_accounts.create("loadwizard", BOT_PASSWORD, "wizard@localhost", base.Stats.from_race("human", "n"), {"wizard"})
+        for number in range(self.options.bots):
+            self.mud_accounts.create(bot_name(number), BOT_PASSWORD, "bot@localhost", base.Stats.from_race("human", "n"))
+        main_loop_thread = threading.Thread(name="mainloop", target=self._main_loop_wrapper, args=(None,))
+        main_loop_thread.daemon = True
+        main_loop_thread.start()
+        try:
+            self.results = LoadTest(self, self.options).run()
+        finally:
+            self._stop_mainloop = True
+            self.wakeup_main_loop()
+            main_loop_thread.join()
+            for name in os.listdir(accounts_dir):
+                os.remove(os.path.join(accounts_dir, name))
+            os.rmdir(accounts_dir)
+
+
+class Bot:
+    def __init__(self, loadtest: 'LoadTest', number: int) -> None:
+        self.loadtest = loadtest
+        self.driver = loadtest.driver
+        self.name = bot_name(number)
+        self.random = random.Random(number)
+        self.conn = None    # type: PlayerConnection
+        self.logged_in = False
+        self.commands = 0
+        self.timeouts = 0
+
+    @property
+    def io(self) -> BotIo:
+        return self.conn.io     # type: ignore
+
+    def wait_for_dialog(self, timeout: float=10.0) -> bool:
+        # waits until the login dialog asks for input
+        end = time.time() + timeout
+        while time.time() < end:
+            if self.conn in self.driver.waiting_for_input and not self.conn.player.input_is_available.is_set():
+                return True
+            time.sleep(0.005)
+        return False
+
+    def login(self) -> None:
+        self.conn = self.driver.connect_player("web", 0)
+        for answer in (self.name, BOT_PASSWORD):
+            if not self.wait_for_dialog():
+                raise TimeoutError("bot %s: login dialog didn't ask for input" % self.name)
+            self.io.command(answer)
+        end = time.time() + 10.0
+        while time.time() < end:
+            if self.conn.player and self.conn.player.name == self.name:
+                if self.conn not in self.driver.waiting_for_input:
+                    self.logged_in = True
+                    return
+                self.io.command("")     # story's welcome prompt
+            time.sleep(0.005)
+        raise TimeoutError("bot %s: login didn't complete" % self.name)
+
+    def next_command(self) -> Tuple[str, str]:
+        action = self.random.choice(self.loadtest.actions)
+        player = self.conn.player
+        try:
+            if action == "walk":
+                directions = sorted(player.location.exits)
+                if directions:
+                    return action, self.random.choice(directions)
+            elif action == "say":
+                return action, "say " + self.random.choice(["hello everyone", "nice weather today", "anyone seen the key?"])
+            elif action == "take":
+                items = sorted(item.name for item in list(player.location.items))
+                if items:
+                    return action, "take " + self.random.choice(items)
+            elif action == "drop":
+                items = sorted(item.name for item in list(player.inventory))
+                if items:
+                    return action, "drop " + self.random.choice(items)
+        except RuntimeError:
+            pass    # world changed while looking at it from this thread, just look around instead
+        return "look", "look"
+
+    def run(self) -> None:
+        while not self.loadtest.stopped.is_set():
+            if self.loadtest.options.rate > 0:
+                self.loadtest.stopped.wait(self.random.expovariate(self.loadtest.options.rate))
+                if self.loadtest.stopped.is_set():
+                    break
+            if self.conn in self.driver.waiting_for_input:
+                self.io.command("")     # some dialog asks for input, just continue
+                self.io.responded.wait(10.0)
+                continue
+            action, command = self.next_command()
+            self.io.command(command)
+            if self.io.responded.wait(10.0):
+                self.commands += 1
+                self.loadtest.add_latency(action, self.io.latency)
+            else:
+                self.timeouts += 1
+
+
+class LoadTest:
+    def __init__(self, driver: LoadTestDriver, options: argparse.Namespace) -> None:
+        self.driver = driver
+        self.options = options
+        self.actions = []   # type: List[str]
+        for entry in options.mix.split(","):
+            action, _, weight = entry.partition("=")
+            self.actions.extend([action.strip()] * int(weight or 1))
+        self.stopped = threading.Event()
+        self.latencies = {"all": RollingHistogram(1000000)}    # type: Dict[str, RollingHistogram]
+        self.latency_lock = threading.Lock()
+        self.deferreds_length = []  # type: List[int]
+
+    def add_latency(self, action: str, latency: float) -> None:
+        with self.latency_lock:
+            self.latencies["all"].add(latency)
+            if action not in self.latencies:
+                self.latencies[action] = RollingHistogram(1000000)
+            self.latencies[action].add(latency)
+
+    @staticmethod
+    def memory_usage() -> Dict[str, Optional[int]]:
+        gc.collect()
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+        return {"objects": len(gc.get_objects()), "max_rss": max_rss}
+
+    def run(self) -> Dict[str, Any]:
+        bots = [Bot(self, number) for number in range(self.options.bots)]
+        print("Logging in %d bots..." % len(bots))
+        login_start = time.time()
+        for bot in bots:
+            bot.login()
+        login_duration = time.time() - login_start
+        self.driver.tick_profiler.reset()
+        memory_start = self.memory_usage()
+        print("Running the load for %.1f seconds..." % self.options.time)
+        threads = [threading.Thread(name="bot-" + bot.name, target=bot.run) for bot in bots]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        end = time.time() + self.options.time
+        while time.time() < end:
+            self.deferreds_length.append(len(self.driver.deferreds))
+            time.sleep(0.1)
+        self.stopped.set()
+        for thread in threads:
+            thread.join()
+        memory_end = self.memory_usage()
+        num_commands = sum(bot.commands for bot in bots)
+        return {
+            "story": self.driver.story.config.name,
+            "bots": len(bots),
+            "duration": self.options.time,
+            "rate": self.options.rate,
+            "mix": self.options.mix,
+            "login_duration": login_duration,
+            "commands": num_commands,
+            "commands_per_second": num_commands / self.options.time,
+            "timeouts": sum(bot.timeouts for bot in bots),
+            "latency": {action: histogram.stats() for action, histogram in self.latencies.items()},
+            "tick": self.driver.tick_profiler.phase_timings["total"].stats(),
+            "tick_overloads": self.driver.tick_overloads,
+            "deferreds": {
+                "min": min(self.deferreds_length),
+                "max": max(self.deferreds_length),
+                "avg": sum(self.deferreds_length) / len(self.deferreds_length),
+                "end": self.deferreds_length[-1]
+            },
+            "memory": {
+                "objects_start": memory_start["objects"],
+                "objects_end": memory_end["objects"],
+                "max_rss_start": memory_start["max_rss"],
+                "max_rss_end": memory_end["max_rss"]
+            }
+        }
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    def ms(stats: Dict[str, float]) -> str:
+        return ("p50=%.2f  p95=%.2f  p99=%.2f  max=%.2f ms" %
+                (stats["p50"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000, stats["max"] * 1000))
+    print("\nStory: %s   bots: %d   duration: %.1f sec   rate: %.2f cmd/sec/bot" %
+          (results["story"], results["bots"], results["duration"], results["rate"]))
+    print("Login of all bots took %.2f sec" % results["login_duration"])
+    print("Commands: %d (%.1f per second), timeouts: %d" % (results["commands"], results["commands_per_second"], results["timeouts"]))
+    print("Command latency:")
+    for action, stats in sorted(results["latency"].items()):
+        print("   %-6s (%6d)  %s" % (action, stats["count"], ms(stats)))
+    print("Tick duration:    (%6d)  %s   overloads: %d" % (results["tick"]["count"], ms(results["tick"]), results["tick_overloads"]))
+    deferreds = results["deferreds"]
+    print("Deferreds queue:  min=%d  max=%d  avg=%.1f  end=%d" % (deferreds["min"], deferreds["max"], deferreds["avg"], deferreds["end"]))
+    memory = results["memory"]
+    print("Memory:  objects %d -> %d" % (memory["objects_start"], memory["objects_end"]), end="")
+    if memory["max_rss_start"] is not None:
+        print(",  max rss %d -> %d kb" % (memory["max_rss_start"], memory["max_rss_end"]))
+    else:
+        print()
+
+
+def main(args: Sequence[str]=None) -> None:
+    parser = argparse.ArgumentParser(description="Headless load generator and latency benchmark for the Tale mud driver.")
+    parser.add_argument('-g', '--game', type=str, help='path to the game directory', required=True)
+    parser.add_argument('-n', '--bots', type=int, help='number of bot players, default=10', default=10)
+    parser.add_argument('-t', '--time', type=float, help='duration of the load test in seconds, default=30', default=30.0)
+    parser.add_argument('-r', '--rate', type=float, help='commands per second per bot (0=as fast as possible), default=1', default=1.0)
+    parser.add_argument('-m', '--mix', type=str, help='weighted command mix, default=' + DEFAULT_MIX, default=DEFAULT_MIX)
+    parser.add_argument('-j', '--json', type=str, help='also write the results as json to this file')
+    options = parser.parse_args(args)
+    options.game = os.path.abspath(options.game)
+    json_file = os.path.abspath(options.json) if options.json else None
+    driver = LoadTestDriver(options)
+    driver.start(options.game)
+    print_report(driver.results)
+    if json_file:
+        with open(json_file, "w") as out:
+            json.dump(driver.results, out, indent=2, sort_keys=True)
+        print("Results written to", json_file)
+
+
+if __name__ == "__main__":
+    main()
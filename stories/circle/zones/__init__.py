@@ -118,12 +118,13 @@ def init_zones(driver: Driver) -> None:
     print("Spawned: %d mobs (%d specials), %d items, %d shops" % (num_mobs, len(mobs_with_special), num_items, num_shops))
     print(len(unconverted_objs()), "unused item defs.")
 
-    # divide all the special mobs over the 5 mobs buckets (via their hash number)
-    # this prevents all 300+ special mobs doing something every 10 seconds at the same time
+    # divide all the special mobs over the 5 mobs buckets (via their vnum)
+    # this prevents all 300+ special mobs doing something every 10 seconds at the same time.
+    # the order is fixed (not the hash or set order) so that replays of a recorded game behave the same.
     global _special_mobs_buckets
     assert len(_special_mobs_buckets) == 5
-    for mob in mobs_with_special:
-        _special_mobs_buckets[(hash(mob) // 10) % 5].append(mob)
+    for mob in sorted(mobs_with_special, key=lambda mob: mob.vnum):
+        _special_mobs_buckets[mob.vnum % 5].append(mob)
     mobs_with_special.clear()
     # set up the periodical pulse events
     mobile_timer = 10.0 / len(_special_mobs_buckets)
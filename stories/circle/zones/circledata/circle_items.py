@@ -7,7 +7,7 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 
 from types import SimpleNamespace
 from typing import Set, Dict, no_type_check
-from tale.base import Item, Armour, Container, Weapon, Key
+from tale.base import Item, Armour, Container, Weapon, Key, Prototype
 from tale.items.basic import *
 from tale.items.board import BulletinBoard
 from tale.items.bank import Bank
@@ -28,6 +28,8 @@ def init_circle_items() -> None:
 
 # various caches, DO NOT CLEAR THESE, or duplicates might be spawned
 converted_items = set()  # type: Set[int]
+# the names and descriptions shared by all items spawned from the same vnum
+item_prototypes = {}    # type: Dict[int, Prototype]
 
 
 def unconverted_objs() -> Set[int]:
@@ -160,11 +162,15 @@ def make_item(vnum: int) -> Item:
         item = Item(name, title, short_descr=c_obj.longdesc)
     else:
         raise ValueError("invalid obj type: " + c_obj.type)
-    for ed in c_obj.extradesc:
-        kwds = ed["keywords"] - {name}  # remove the item name from the extradesc to avoid doubles
-        item.add_extradesc(kwds, ed["text"])
+    prototype = item_prototypes.get(vnum)
+    if prototype is None:
+        extra_desc = {}
+        for ed in c_obj.extradesc:
+            for keyword in ed["keywords"] - {name}:  # remove the item name from the extradesc to avoid doubles
+                extra_desc[keyword] = ed["text"]
+        prototype = item_prototypes[vnum] = Prototype(name, title, short_descr=c_obj.longdesc, aliases=aliases, extra_desc=extra_desc)
+    item.init_from_prototype(prototype)
     item.circle_vnum = vnum  # keep the vnum
-    item.aliases = aliases
     if c_obj.cost > 0:
         item.value = c_obj.cost
     item.rent = c_obj.rent
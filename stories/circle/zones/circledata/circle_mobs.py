@@ -9,7 +9,7 @@ import re
 import random
 from types import SimpleNamespace
 from typing import Type, List, Set, Dict
-from tale.base import Living, Item
+from tale.base import Living, Item, Prototype
 from tale.util import Context, call_periodically, roll_dice
 from tale.shop import Shopkeeper
 from tale.errors import ActionRefused
@@ -431,27 +431,38 @@ circle_mob_class = {
 # various caches, DO NOT CLEAR THESE, or duplicates might be spawned
 converted_mobs = set()   # type: Set[int]
 mobs_with_special = set()     # type: Set[CircleMob]
+# the names and descriptions shared by all mobs spawned from the same vnum
+mob_prototypes = {}    # type: Dict[int, Prototype]
+
+
+def mob_prototype(vnum: int) -> Prototype:
+    prototype = mob_prototypes.get(vnum)
+    if prototype is None:
+        c_mob = mobs[vnum]
+        title = c_mob.shortdesc
+        if title.startswith("the ") or title.startswith("The "):
+            title = title[4:]
+        if title.startswith("a ") or title.startswith("A "):
+            title = title[2:]
+        extra_desc = {}    # type: Dict[str, str]
+        for ed in getattr(c_mob, "extradesc", ()):
+            for keyword in ed["keywords"]:
+                extra_desc[keyword] = ed["text"]
+        prototype = mob_prototypes[vnum] = Prototype(c_mob.aliases[0], title, descr=c_mob.detaileddesc, short_descr=c_mob.longdesc,
+                                                     aliases=c_mob.aliases[1:], extra_desc=extra_desc)
+    return prototype
 
 
 def make_mob(vnum: int, mob_class: Type[CircleMob]=CircleMob) -> Living:
     """Create an instance of an item for the given vnum"""
     c_mob = mobs[vnum]
-    name = c_mob.aliases[0]
-    aliases = set(c_mob.aliases[1:])   # type: Set[str]
-    title = c_mob.shortdesc
-    if title.startswith("the ") or title.startswith("The "):
-        title = title[4:]
-    if title.startswith("a ") or title.startswith("A "):
-        title = title[2:]
+    prototype = mob_prototype(vnum)
     # for now, we take the stats from the 'human' race because the circle data lacks race and stats
     # @todo map circle mobs on races?
     mob_class = circle_mob_class.get(vnum, mob_class)
-    mob = mob_class(name, c_mob.gender, race="human", title=title, descr=c_mob.detaileddesc, short_descr=c_mob.longdesc)
+    mob = mob_class(prototype.name, c_mob.gender, race="human", title=prototype.title)
+    mob.init_from_prototype(prototype)
     mob.circle_vnum = vnum  # keep the vnum
-    if hasattr(c_mob, "extradesc"):
-        for ed in c_mob.extradesc:
-            mob.add_extradesc(ed["keywords"], ed["text"])
-    mob.aliases = aliases
     mob.aggressive = "aggressive" in c_mob.actions
     mob.money = float(c_mob.gold)
     mob.stats.alignment = c_mob.alignment
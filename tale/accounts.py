@@ -192,7 +192,8 @@ class MudAccounts:
     @staticmethod
     def _pwhash(password: str, salt: str="") -> Tuple[str, str]:
         if not salt:
-            salt = str(random.random() * time.time() + id(password)).replace('.', '')
+            # not from the global random generator: that one is seeded when recording or replaying a game
+            salt = str(random.SystemRandom().random() * time.time() + id(password)).replace('.', '')
         pwhash = hashlib.sha1((salt + password).encode("utf-8")).hexdigest()
         return pwhash, salt
 
@@ -251,7 +252,7 @@ class MudAccounts:
     def _store_stats(self, conn: sqlite3.Connection, account_id: int, stats: base.Stats) -> None:
         columns = ["account"]
         values = [account_id]
-        stat_vars = dict(vars(stats))
+        stat_vars = util.object_vars(stats)
         for not_stored in ["bodytype", "language", "weight", "size"]:
             del stat_vars[not_stored]    # these are not stored, but always initialized from the races table
         for key, value in stat_vars.items():
@@ -37,13 +37,19 @@ Use its enter/leave methods instead.
 
 import builtins
 import copy
+import enum
+import heapq
+import itertools
 import random
 import re
+import sys
+import weakref
 from weakref import WeakValueDictionary
 from collections import OrderedDict
 from textwrap import dedent
-from types import ModuleType
-from typing import Iterable, Any, Sequence, Optional, Set, Dict, Union, FrozenSet, Tuple, List, Type, no_type_check
+from types import ModuleType, MappingProxyType
+from typing import Iterable, Iterator, Any, Sequence, Optional, Set, Dict, Mapping, Union, FrozenSet, Tuple, List, Type, NamedTuple, \
+    AbstractSet, Container as TypingContainer, MutableSet as TypingMutableSet, TypeVar, no_type_check
 
 from . import lang
 from . import mud_context
@@ -54,15 +60,464 @@ from . import story
 from . import verbdefs
 from .errors import ActionRefused, ParseError, LocationIntegrityError, TaleError, UnknownVerbException, NonSoulVerb
 
-__all__ = ["MudObject", "Armour", 'Container', "Door", "Exit", "Item", "Living", "Stats", "Location", "Weapon", "Key", "Soul"]
+__all__ = ["MudObject", "Prototype", "Armour", 'Container', "Door", "Exit", "Item", "Living", "Stats", "Location", "Weapon", "Key", "Soul"]
 
-pending_actions = pubsub.topic("driver-pending-actions")
-pending_tells = pubsub.topic("driver-pending-tells")
+# the driver gets the events of these in one batch. If too many are queued up, they're processed right away.
+pending_actions = pubsub.bounded_topic("driver-pending-actions", 10000, pubsub.Overflow.SYNC)
+pending_tells = pubsub.bounded_topic("driver-pending-tells", 10000, pubsub.Overflow.SYNC)
 async_dialogs = pubsub.topic("driver-async-dialogs")
+# the notifications of locations (someone arrived, left, or performed an action there), delivered in one batch.
+location_notifications = pubsub.bounded_topic("location-notifications", 10000, pubsub.Overflow.SYNC)
+# the locations and livings that have a wiretap topic. The topic is only created when someone wants to tap it.
+wiretapped = set()  # type: Set[Union[Location, Living]]
+# version stamps for the contents of locations and inventories, unique over all of them (used by the parse cache)
+_versions = itertools.count(1)
+# read-only empty structures, shared by the name indexes until the first object is added to them
+_no_mapping = MappingProxyType({})     # type: Any
+_no_prefixes = util.PrefixIndex()
 
 
 ParsedWhoType = Union['Living', 'Item', 'Exit']
 ContainingType = Union['Location', 'Container', 'Living']
+T = TypeVar("T", bound='MudObject')     # the type of the objects in a NameIndexedSet
+
+
+def _wiretap(obj: Union['Location', 'Living'], kind: str) -> pubsub.Topic:
+    if obj._wiretap is None:
+        obj._wiretap = pubsub.topic((kind, "%s#%d" % (obj.name, obj.vnum)))
+        wiretapped.add(obj)
+    return obj._wiretap
+
+
+def destroy_wiretap(obj: Union['Location', 'Living']) -> None:
+    """Destroy the wiretap topic of the location or living, if it has one."""
+    if obj._wiretap is not None:
+        obj._wiretap.destroy()
+        obj._wiretap = None
+    wiretapped.discard(obj)
+
+
+def destroy_idle_wiretaps(min_idle_time: float) -> None:
+    """Destroy the wiretap topics that have no subscribers (anymore) and that have been idle for a while."""
+    for obj in list(wiretapped):
+        tap = obj._wiretap
+        if tap is None or (not tap.subscribers and not tap.events and tap.idle_time > min_idle_time):
+            destroy_wiretap(obj)
+
+
+class LocationNotificationKind(enum.Enum):
+    """The kinds of location notifications. The value is the name of the notification method on Location."""
+    ACTION = "notify_action"
+    PLAYER_ARRIVED = "notify_player_arrived"
+    PLAYER_LEFT = "notify_player_left"
+    NPC_ARRIVED = "notify_npc_arrived"
+    NPC_LEFT = "notify_npc_left"
+
+
+LocationNotification = NamedTuple("LocationNotification", [("kind", LocationNotificationKind),
+                                                           ("actor", 'Living'),
+                                                           ("location", 'Location'),
+                                                           ("other_location", Optional['Location']),
+                                                           ("parsed", Optional['ParseResult'])])
+
+
+def notify_location(kind: LocationNotificationKind, actor: 'Living', location: 'Location',
+                    other_location: Optional['Location']=None, parsed: Optional['ParseResult']=None) -> None:
+    """
+    Queue a notification for the location. For arrivals, the other location is where the actor came from,
+    for departures it is where the actor went to. For actions, the parse result of the action is given.
+    """
+    if location is not None:
+        location_notifications.send(LocationNotification(kind, actor, location, other_location, parsed))
+
+
+class LocationNotifier(pubsub.Listener):
+    """
+    Delivers the location notifications, a whole batch in one loop.
+    Arrival and departure notifications are skipped for locations whose class doesn't override
+    the notification method, because the default implementation does nothing.
+    Action notifications are always delivered, because the livings and items in the location get them as well.
+    """
+    def __init__(self) -> None:
+        self.overridden_methods = {}   # type: Dict[Type[Location], FrozenSet[LocationNotificationKind]]
+
+    def location_overrides(self, location_class: Type['Location']) -> FrozenSet[LocationNotificationKind]:
+        overrides = self.overridden_methods.get(location_class)
+        if overrides is None:
+            overrides = frozenset(kind for kind in LocationNotificationKind
+                                  if getattr(location_class, kind.value) is not getattr(Location, kind.value))
+            self.overridden_methods[location_class] = overrides
+        return overrides
+
+    def pubsub_event(self, topicname: pubsub.TopicNameType, event: LocationNotification) -> None:
+        self.pubsub_events(topicname, [event])
+
+    def pubsub_events(self, topicname: pubsub.TopicNameType, events: List[LocationNotification]) -> None:
+        overridden_methods = self.overridden_methods
+        action = LocationNotificationKind.ACTION
+        for kind, actor, location, other_location, parsed in events:
+            if kind is action:
+                assert parsed is not None, "action notification without parse result"
+                location._notify_action_all(parsed, actor)
+            else:
+                location_class = type(location)
+                overrides = overridden_methods.get(location_class)
+                if overrides is None:
+                    overrides = self.location_overrides(location_class)
+                if kind in overrides:
+                    getattr(location, kind.value)(actor, other_location)
+
+
+class NameIndexedSet(TypingMutableSet[T]):
+    """
+    A set of mud objects (the livings or items in a location, or the inventory of a living)
+    that also keeps an index of the names and aliases of the objects in it, so that they can be found
+    by name without looking at every object. The index is updated when objects are added or removed,
+    and when the name or aliases of an object in the set change.
+    The names are also stored in a trie of words, to match names consisting of several words in a sentence.
+    The custom verbs of the objects are counted as well, to quickly check if a verb is a custom verb.
+    The names and the custom verbs are also kept in prefix indexes, for tab completion and suggestions.
+    A spelling index of the names, to suggest corrections for typos, is created the first time it is needed.
+    The version is a stamp that changes whenever an object is added or removed, or is reindexed.
+    Iterating over the set gives the objects in the order they were added.
+    Most of these sets are empty, so they share empty read-only structures until the first object is added.
+    """
+    __slots__ = ("_objects", "_names", "_trie", "_verbs", "_name_prefixes", "_verb_prefixes", "_name_spelling",
+                 "_ref", "version", "__weakref__")
+
+    def __init__(self, objects: Iterable[T]=()) -> None:
+        self._objects = _no_mapping    # type: Dict[T, Tuple[Tuple[str, ...], Tuple[str, ...]]]  # object -> its names, verbs
+        self._names = _no_mapping      # type: Dict[str, List[T]]
+        self._trie = _no_mapping       # type: Dict[Optional[str], Any]
+        self._verbs = _no_mapping      # type: Dict[str, int]   # custom verb -> number of objects that have it
+        self._name_prefixes = self._verb_prefixes = _no_prefixes
+        self._name_spelling = None     # type: Optional[util.SpellingIndex]
+        self._ref = None   # type: Optional[weakref.ReferenceType[NameIndexedSet]]
+        self.version = next(_versions)
+        for obj in objects:
+            self.add(obj)
+
+    def __reduce__(self):
+        # copies rebuild the index from the objects
+        return self.__class__, (list(self._objects),)
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, list(self._objects))
+
+    @classmethod
+    def _from_iterable(cls, objects: Iterable[Any]) -> Set[Any]:
+        # the results of set operators such as livings - {player} are plain sets,
+        # so temporary sets don't take over the name index references of the objects
+        return set(objects)
+
+    def __contains__(self, obj: Any) -> bool:
+        return obj in self._objects
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._objects)
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    def add(self, obj: T) -> None:
+        if obj not in self._objects:
+            self._add_object(obj)
+
+    def discard(self, obj: T) -> None:
+        if obj in self._objects:
+            self._remove_object(obj)
+
+    def find(self, name: str) -> Optional[T]:
+        """the object with the given name or alias, or None if there's no such object"""
+        objects = self._names.get(name)
+        return objects[0] if objects else None
+
+    def has_name(self, name: str) -> bool:
+        return name in self._names
+
+    def names(self) -> Iterable[str]:
+        """all names and aliases of the objects in this set"""
+        return self._names.keys()
+
+    def names_with_prefix(self, prefix: str) -> List[str]:
+        """the names and aliases of the objects in this set that start with the given prefix, sorted"""
+        return self._name_prefixes.with_prefix(prefix)
+
+    def first_name_with_prefix(self, prefix: str) -> Optional[str]:
+        """the first name or alias (in sorted order) of the objects in this set that starts with the given prefix, or None"""
+        return self._name_prefixes.first_with_prefix(prefix)
+
+    def names_by_spelling(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """the names and aliases of the objects in this set within the edit distance of the word, as (distance, name) tuples"""
+        if self._name_spelling is None:
+            self._name_spelling = util.SpellingIndex(self._names, max_distance=2)
+        return self._name_spelling.suggest(word, max_distance)
+
+    def match_words(self, words: Sequence[str], startindex: int, max_words: int=6) -> Tuple[Optional[T], str, int]:
+        """
+        Find the shortest name (possibly consisting of multiple words) that matches the words starting at startindex.
+        Returns (matched_object, matched_name, number of words used in match), or (None, "", 0) if nothing matched.
+        """
+        node = self._trie
+        for wordcount, word in enumerate(words[startindex:startindex + max_words], start=1):
+            child = node.get(word)
+            if child is None:
+                break
+            node = child
+            if None in node:
+                name = node[None]
+                return self._names[name][0], name, wordcount
+        return None, "", 0
+
+    def has_verb(self, verb: str) -> bool:
+        """is the verb a custom verb of one of the objects in this set?"""
+        return verb in self._verbs
+
+    def verbs_with_prefix(self, prefix: str) -> List[str]:
+        """the custom verbs of the objects in this set that start with the given prefix, sorted"""
+        return self._verb_prefixes.with_prefix(prefix)
+
+    def verbs(self) -> Dict[str, str]:
+        """the custom verbs of the objects in this set (verb -> help text)"""
+        verbs = {}  # type: Dict[str, str]
+        for obj in self._objects:
+            if obj._verbs:
+                verbs.update(obj._verbs)
+        return verbs
+
+    def reindex(self, obj: T) -> None:
+        """update the index after the name, aliases or verbs of the object have changed"""
+        if obj in self._objects:
+            self._unindex(obj, self._objects[obj])
+            self._objects[obj] = self._index(obj)
+            self.version = next(_versions)
+
+    def _add_object(self, obj: T) -> None:
+        if self._ref is None:
+            self._objects = OrderedDict()
+            self._names = {}
+            self._trie = {}
+            self._verbs = {}
+            self._name_prefixes = util.PrefixIndex()
+            self._verb_prefixes = util.PrefixIndex()
+            self._ref = weakref.ref(self)
+        self._objects[obj] = self._index(obj)
+        obj._names_index = self._ref
+        self.version = next(_versions)
+
+    def _remove_object(self, obj: T) -> None:
+        self._unindex(obj, self._objects.pop(obj))
+        self.version = next(_versions)
+        if obj._names_index is self._ref:
+            obj._names_index = None
+
+    def _index(self, obj: T) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        keys = (obj.name,) + tuple(alias for alias in obj._aliases or () if alias != obj.name)
+        for key in keys:
+            objects = self._names.get(key)
+            if objects:
+                objects.append(obj)
+            else:
+                self._names[key] = [obj]
+                self._name_prefixes.add(key)
+                if self._name_spelling is not None:
+                    self._name_spelling.add(key)
+                node = self._trie
+                for word in key.split(" "):
+                    node = node.setdefault(word, {})
+                node[None] = key
+        verbs = tuple(obj._verbs or ())
+        for verb in verbs:
+            if verb in self._verbs:
+                self._verbs[verb] += 1
+            else:
+                self._verbs[verb] = 1
+                self._verb_prefixes.add(verb)
+        return keys, verbs
+
+    def _unindex(self, obj: T, indexed: Tuple[Tuple[str, ...], Tuple[str, ...]]) -> None:
+        keys, verbs = indexed
+        for key in keys:
+            objects = self._names[key]
+            objects.remove(obj)
+            if not objects:
+                del self._names[key]
+                self._name_prefixes.discard(key)
+                if self._name_spelling is not None:
+                    self._name_spelling.discard(key)
+                path = []
+                node = self._trie
+                for word in key.split(" "):
+                    path.append((node, word))
+                    node = node[word]
+                del node[None]
+                for parent, word in reversed(path):
+                    if parent[word]:
+                        break
+                    del parent[word]
+        for verb in verbs:
+            if self._verbs[verb] > 1:
+                self._verbs[verb] -= 1
+            else:
+                del self._verbs[verb]
+                self._verb_prefixes.discard(verb)
+
+
+class AliasSet(set):
+    """The aliases of a mud object. Changes are passed on to the name index of the set the object is in."""
+    __slots__ = ("owner",)
+
+    def __init__(self, owner: 'MudObject', aliases: Iterable[str]=()) -> None:
+        super().__init__(aliases)
+        self.owner = owner
+
+    def __reduce__(self):
+        return self.__class__, (self.owner, list(self))
+
+    def add(self, alias: str) -> None:
+        super().add(alias)
+        self.owner._reindex()
+
+    def remove(self, alias: str) -> None:
+        super().remove(alias)
+        self.owner._reindex()
+
+    def discard(self, alias: object) -> None:
+        super().discard(alias)
+        self.owner._reindex()
+
+    def pop(self) -> str:
+        alias = super().pop()
+        self.owner._reindex()
+        return alias
+
+    def clear(self) -> None:
+        super().clear()
+        self.owner._reindex()
+
+    def update(self, *others: Iterable[str]) -> None:
+        super().update(*others)
+        self.owner._reindex()
+
+    def difference_update(self, *others: Iterable[object]) -> None:
+        super().difference_update(*others)
+        self.owner._reindex()
+
+    def intersection_update(self, *others: Iterable[object]) -> None:
+        super().intersection_update(*others)
+        self.owner._reindex()
+
+    def symmetric_difference_update(self, other: Iterable[str]) -> None:
+        super().symmetric_difference_update(other)
+        self.owner._reindex()
+
+    def __ior__(self, other: AbstractSet[Any]) -> 'AliasSet':   # type: ignore
+        self.update(other)
+        return self
+
+    def __isub__(self, other: AbstractSet[Any]) -> 'AliasSet':   # type: ignore
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other: AbstractSet[Any]) -> 'AliasSet':   # type: ignore
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other: AbstractSet[Any]) -> 'AliasSet':   # type: ignore
+        self.symmetric_difference_update(other)
+        return self
+
+
+class AliasList(list):
+    """The aliases of a mud object, if they were given as a list. See AliasSet."""
+    __slots__ = ("owner",)
+
+    def __init__(self, owner: 'MudObject', aliases: Iterable[str]=()) -> None:
+        super().__init__(aliases)
+        self.owner = owner
+
+    def __reduce__(self):
+        return self.__class__, (self.owner, list(self))
+
+    def append(self, alias: str) -> None:
+        super().append(alias)
+        self.owner._reindex()
+
+    def extend(self, aliases: Iterable[str]) -> None:
+        super().extend(aliases)
+        self.owner._reindex()
+
+    def insert(self, index: Any, alias: str) -> None:
+        super().insert(index, alias)
+        self.owner._reindex()
+
+    def remove(self, alias: str) -> None:
+        super().remove(alias)
+        self.owner._reindex()
+
+    def pop(self, index: Any=-1) -> str:
+        alias = super().pop(index)
+        self.owner._reindex()
+        return alias
+
+    def clear(self) -> None:
+        super().clear()
+        self.owner._reindex()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self.owner._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self.owner._reindex()
+
+    def __iadd__(self, other: Iterable[Any]) -> 'AliasList':   # type: ignore
+        self.extend(other)
+        return self
+
+
+class VerbsDict(dict):
+    """The custom verbs of a mud object. Changes are passed on to the name index of the set the object is in."""
+    __slots__ = ("owner",)
+
+    def __init__(self, owner: 'MudObject', verbs: Optional[Dict[str, str]]=None) -> None:
+        super().__init__(verbs or {})
+        self.owner = owner
+
+    def __reduce__(self):
+        return self.__class__, (self.owner, dict(self))
+
+    def __setitem__(self, verb: str, helptext: str) -> None:
+        super().__setitem__(verb, helptext)
+        self.owner._reindex()
+
+    def __delitem__(self, verb: str) -> None:
+        super().__delitem__(verb)
+        self.owner._reindex()
+
+    def pop(self, *args: Any) -> Any:
+        result = super().pop(*args)
+        self.owner._reindex()
+        return result
+
+    def popitem(self) -> Tuple[str, str]:
+        result = super().popitem()
+        self.owner._reindex()
+        return result
+
+    def setdefault(self, *args: Any) -> Any:
+        result = super().setdefault(*args)
+        self.owner._reindex()
+        return result
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self.owner._reindex()
+
+    def clear(self) -> None:
+        super().clear()
+        self.owner._reindex()
 
 
 class ParseResult:
@@ -137,6 +592,16 @@ class ParseResult:
             return list(self.who_info)[-1]
         return None
 
+    def copy(self) -> 'ParseResult':
+        """A copy of this parse result that can be changed without affecting the original"""
+        who_info = ParseResult.WhoInfoOrderedDict()
+        for who, info in self.who_info.items():
+            who_info[who] = ParseResult.WhoInfo(info.sequence)
+            who_info[who].previous_word = info.previous_word
+        return ParseResult(self.verb, adverb=self.adverb, message=self.message, bodypart=self.bodypart,
+                           qualifier=self.qualifier, args=list(self.args), who_info=who_info,
+                           unrecognized=list(self.unrecognized), unparsed=self.unparsed)
+
     def __str__(self) -> str:
         who_info_str = [" %s->%s" % (living.name, info) for living, info in self.who_info.items()]
         s = [
@@ -157,48 +622,132 @@ class ParseResult:
         return "\n".join(s)
 
 
+_nothing_parsed = ParseResult("")   # shared by the livings and souls that haven't parsed anything yet (don't change it)
+
+
 class MudObjRegistry:
+    """
+    Hands out the vnums and keeps track of all created MudObjects, in a table per kind of object (by vnum).
+    The secondary indexes (objects by class and by name) are only built when they're queried for the
+    first time, after that they're kept up to date (destroyed objects are removed from them).
+    Objects by location are found via the locations themselves.
+    """
     # the vnum machinery for all created MudObjects:
     seq_nr = 1
     all_items = WeakValueDictionary()       # type: WeakValueDictionary[int, Item]
     all_livings = WeakValueDictionary()     # type: WeakValueDictionary[int, Living]
     all_locations = WeakValueDictionary()   # type: WeakValueDictionary[int, Location]
     all_exits = WeakValueDictionary()       # type: WeakValueDictionary[int, Exit]
+    _tables = {}        # type: Dict[type, WeakValueDictionary[int, Any]]   # class -> the table its objects are stored in
+    _by_class = None    # type: Optional[Dict[type, weakref.WeakSet[MudObject]]]
+    _by_name = None     # type: Optional[Dict[str, weakref.WeakSet[MudObject]]]
 
     @staticmethod
-    def track_vnum(instance: Any, fix_clones: bool=False):
+    def track_vnum(instance: Any):
         # create and store a new unique vnum for this mudobject
+        cls = instance.__class__
+        table = MudObjRegistry._tables.get(cls)
+        if table is None:
+            table = MudObjRegistry._tables[cls] = MudObjRegistry._table_for(cls)
         instance.vnum = MudObjRegistry.seq_nr
         MudObjRegistry.seq_nr += 1
-        if isinstance(instance, Item):
-            MudObjRegistry.all_items[instance.vnum] = instance        # type: ignore
-        elif isinstance(instance, Living):
-            MudObjRegistry.all_livings[instance.vnum] = instance      # type: ignore
-        elif isinstance(instance, Exit):
-            MudObjRegistry.all_exits[instance.vnum] = instance        # type: ignore
-        elif isinstance(instance, Location):
-            MudObjRegistry.all_locations[instance.vnum] = instance    # type: ignore
-        else:
-            raise TypeError("weird MudObj subtype: " + str(type(instance)))
-        if fix_clones:
-            # the 'clone' command consumes too many vnums because of the way deepcopy works.
-            # try to find the double registration and remove it.
-            pid = instance.vnum - 1
-            existing = MudObjRegistry.all_items.get(pid, None)  # type: Optional[MudObject]
-            if existing is instance:
-                del MudObjRegistry.all_items[pid]
-            else:
-                existing = MudObjRegistry.all_livings.get(pid, None)
-                if existing is instance:
-                    del MudObjRegistry.all_livings[pid]
-                else:
-                    existing = MudObjRegistry.all_exits.get(pid, None)
-                    if existing is instance:
-                        del MudObjRegistry.all_exits[pid]
-                    else:
-                        existing = MudObjRegistry.all_locations.get(pid, None)
-                        if existing is instance:
-                            del MudObjRegistry.all_locations[pid]
+        table[instance.vnum] = instance
+        if MudObjRegistry._by_class is not None:
+            MudObjRegistry._by_class.setdefault(cls, weakref.WeakSet()).add(instance)
+
+    @staticmethod
+    def _table_for(cls: type) -> 'WeakValueDictionary[int, Any]':
+        if issubclass(cls, Item):
+            return MudObjRegistry.all_items
+        elif issubclass(cls, Living):
+            return MudObjRegistry.all_livings
+        elif issubclass(cls, Exit):
+            return MudObjRegistry.all_exits
+        elif issubclass(cls, Location):
+            return MudObjRegistry.all_locations
+        raise TypeError("weird MudObj subtype: " + str(cls))
+
+    @staticmethod
+    def all_objects() -> Iterator['MudObject']:
+        yield from MudObjRegistry.all_locations.values()
+        yield from MudObjRegistry.all_exits.values()
+        yield from MudObjRegistry.all_items.values()
+        yield from MudObjRegistry.all_livings.values()
+
+    @staticmethod
+    def name_changed(obj: 'MudObject', old_name: Optional[str]) -> None:
+        # keep the name index up to date (if it is in use), called when the name of the object has been (re)set.
+        # old_name is None for a new object that isn't in the index yet (a clone).
+        by_name = MudObjRegistry._by_name
+        if by_name is not None:
+            if old_name is not None:
+                old_name = old_name.lower()
+                if old_name in by_name:
+                    by_name[old_name].discard(obj)
+            by_name.setdefault(obj.name.lower(), weakref.WeakSet()).add(obj)
+
+    @staticmethod
+    def forget(obj: 'MudObject') -> None:
+        # remove a destroyed object from the secondary indexes (it stays in its vnum table until it's garbage collected)
+        if MudObjRegistry._by_name is not None:
+            objects = MudObjRegistry._by_name.get(obj.name.lower())
+            if objects is not None:
+                objects.discard(obj)
+        if MudObjRegistry._by_class is not None:
+            objects = MudObjRegistry._by_class.get(obj.__class__)
+            if objects is not None:
+                objects.discard(obj)
+
+    @staticmethod
+    def of_class(cls: Type[Any], locations: Optional[Iterable['Location']]=None) -> Iterator[Any]:
+        """
+        Lazily iterate over all objects that are an instance of the given class (Item, Living, or a subclass).
+        If locations are given (a zone, for instance) only the livings and items in these locations are considered,
+        otherwise the class index is used.
+        """
+        if locations is not None:
+            for location in locations:
+                if issubclass(cls, Living):
+                    yield from (living for living in location.livings if isinstance(living, cls))
+                elif issubclass(cls, Item):
+                    yield from (item for item in location.items if isinstance(item, cls))
+            return
+        if MudObjRegistry._by_class is None:
+            by_class = {}   # type: Dict[type, weakref.WeakSet[MudObject]]
+            for obj in MudObjRegistry.all_objects():
+                by_class.setdefault(obj.__class__, weakref.WeakSet()).add(obj)
+            MudObjRegistry._by_class = by_class
+        for klass, objects in list(MudObjRegistry._by_class.items()):
+            if issubclass(klass, cls):
+                yield from list(objects)
+
+    @staticmethod
+    def by_name(name: str, cls: Optional[Type[Any]]=None) -> List[Any]:
+        """
+        Returns all objects that have the given name (case insensitive), optionally only the ones of the given class.
+        (Only considers the name, not the title or aliases.)
+        """
+        if MudObjRegistry._by_name is None:
+            by_name = {}   # type: Dict[str, weakref.WeakSet[MudObject]]
+            for obj in MudObjRegistry.all_objects():
+                by_name.setdefault(obj.name.lower(), weakref.WeakSet()).add(obj)
+            MudObjRegistry._by_name = by_name
+        objects = MudObjRegistry._by_name.get(name.lower(), ())
+        return [obj for obj in objects if cls is None or isinstance(obj, cls)]
+
+    @staticmethod
+    def listing(table: 'WeakValueDictionary[int, Any]', start_vnum: int=0) -> Iterator[Tuple[int, Any]]:
+        """
+        Lazily iterate over the (vnum, object) pairs in the given table in vnum order, starting from the given vnum.
+        The table isn't in vnum order (objects can be created with a given vnum), so the vnums are kept in a heap.
+        """
+        vnums = [vnum for vnum in table.keys() if vnum >= start_vnum]
+        heapq.heapify(vnums)
+        while vnums:
+            vnum = heapq.heappop(vnums)
+            obj = table.get(vnum)
+            if obj is not None:
+                yield vnum, obj
 
     @classmethod
     @no_type_check
@@ -233,6 +782,39 @@ class MudObjRegistry:
             return objclass(*vargs, **kwargs)
 
 
+class Prototype:
+    """
+    Shared, read-only template with the names and descriptions of the objects that are
+    spawned many times from the same definition (for instance, every instance of a certain
+    item or mob vnum in a zone file).  Objects that are initialized from it via init_from_prototype
+    refer to the prototype's strings, aliases and extra descriptions instead of each holding their own copy.
+    An object gets its own copy of the aliases or extra descriptions only when it accesses them via
+    its aliases or extra_desc properties, which allow them to be changed (get_extradesc doesn't copy).
+    """
+    __slots__ = ("name", "title", "description", "short_description", "aliases", "extra_desc")
+
+    def __init__(self, name: str, title: str = "", *, descr: str = "", short_descr: str = "",
+                 aliases: Iterable[str] = (), extra_desc: Optional[Dict[str, str]] = None) -> None:
+        self.name = sys.intern(name.lower())
+        if title:
+            MudObject._check_title(title)
+        self.title = sys.intern(title or name)
+        self.description = dedent(descr).strip() if descr else ""
+        self.short_description = short_descr.strip() if short_descr else ""
+        self.aliases = frozenset(aliases)   # type: FrozenSet[str]
+        self.extra_desc = MappingProxyType(dict(extra_desc)) if extra_desc else _no_mapping   # type: Mapping[str, str]
+
+    def __repr__(self):
+        return "<%s '%s' @ 0x%x>" % (self.__class__.__name__, self.name, id(self))
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'Prototype':
+        return self     # it's immutable and meant to be shared
+
+
+# attribute values of these types don't need to be copied when an object is cloned
+_immutable_types = frozenset({str, int, float, bool, type(None), frozenset, MappingProxyType, Prototype})
+
+
 class MudObject:
     """
     Root class of all objects in the mud world
@@ -249,7 +831,15 @@ class MudObject:
     includes the tantalizing sentence, ``The wall looks strange here.``
     Using extra descriptions, players could then see additional detail by typing
     ``look at wall.``  There can be an unlimited number of Extra Descriptions.
+
+    The attributes of the mud objects are stored in slots, and the aliases, verbs, extra descriptions
+    and story data are only created when they're needed, to keep the many objects in a world small.
+    Other attributes can still be added (they end up in the object's __dict__, as usual).
+    Objects that are spawned many times from the same definition can share their names and
+    descriptions via a Prototype, see init_from_prototype.
     """
+    __slots__ = ("vnum", "_name", "_title", "_description", "_short_description", "_extradesc",
+                 "_aliases", "_verbs", "_story_data", "_names_index", "_prototype", "__dict__", "__weakref__")
     subjective = "it"
     possessive = "its"
     objective = "it"
@@ -260,20 +850,25 @@ class MudObject:
         if cls is MudObject:
             raise TypeError("don't create MudObject directly, use one of the subclasses")
         instance = super().__new__(cls)
+        instance._names_index = None
+        instance._name = ""
         MudObjRegistry.track_vnum(instance)
         return instance
 
     def __init__(self, name: str, title: str = "", *, descr: str = "", short_descr: str = "") -> None:
         self.vnum = self.vnum   # type: int  # set by mudregistry numbering logic
-        self._extradesc = {}  # type: Dict[str,str]
-        self.name = self._description = self._title = self._short_description = ""
-        self.init_names(name, title, descr, short_descr)
-        self.aliases = set()  # type: Set[str]
+        self._names_index = self._names_index   # type: Optional[weakref.ReferenceType[NameIndexedSet]]  # the name index this object is in
+        self._name = self._name     # type: str  # set via the name property, which keeps the name indexes up to date
+        self._description = self._title = self._short_description = ""
+        self._extradesc = None  # type: Optional[Mapping[str,str]]   # read-only if shared with a prototype
+        self._aliases = None    # type: Optional[Union[AliasSet, AliasList, FrozenSet[str]]]   # frozenset if shared with a prototype
         # any custom verbs that need to be recognised (verb->docstring mapping), verb handling is done via handle_verb() callbacks.
-        self.verbs = {}  # type: Dict[str, str]
-        # register all periodical tagged methods
-        self.story_data = {}  # type: Dict[Any, Any]   # not used by Tale itself, story can put custom data here. Use builtin types only.
+        self._verbs = None      # type: Optional[VerbsDict]
+        self._story_data = None     # type: Optional[Dict[Any, Any]]
+        self._prototype = None      # type: Optional[Prototype]
+        self.init_names(name, title, descr, short_descr)
         self.init()
+        # register all periodical tagged methods
         if util.get_periodicals(self):
             if mud_context.driver is None:
                 raise TaleError("Attempt to create MudObject while Driver hasn't been properly initialized yet. "
@@ -288,6 +883,62 @@ class MudObject:
         """
         pass
 
+    @property
+    def aliases(self) -> Set[str]:
+        if not isinstance(self._aliases, (AliasSet, AliasList)):
+            self._aliases = AliasSet(self, self._aliases or ())     # copy the prototype's aliases, they can be changed now
+        return self._aliases    # type: ignore
+
+    @aliases.setter
+    def aliases(self, value: Iterable[str]) -> None:
+        # the aliases notify the name index this object is in, when they're changed
+        if isinstance(value, list):
+            self._aliases = AliasList(self, value)
+        else:
+            self._aliases = AliasSet(self, value) if value else None
+        self._reindex()
+
+    @property
+    def verbs(self) -> Dict[str, str]:
+        if self._verbs is None:
+            self._verbs = VerbsDict(self)
+        return self._verbs
+
+    @verbs.setter
+    def verbs(self, value: Dict[str, str]) -> None:
+        # the verbs notify the name index this object is in, when they're changed
+        self._verbs = VerbsDict(self, value) if value else None
+        self._reindex()
+
+    @property
+    def story_data(self) -> Dict[Any, Any]:
+        """not used by Tale itself, story can put custom data here. Use builtin types only."""
+        if self._story_data is None:
+            self._story_data = {}
+        return self._story_data
+
+    @story_data.setter
+    def story_data(self, value: Dict[Any, Any]) -> None:
+        self._story_data = value
+
+    def _reindex(self) -> None:
+        # update the name index of the set this object is in
+        if self._names_index is not None:
+            names_index = self._names_index()
+            if names_index is not None:
+                names_index.reindex(self)
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        # the name index of the set this object is in, and the registry's name index, are updated
+        old_name, self._name = self._name, value
+        self._reindex()
+        MudObjRegistry.name_changed(self, old_name)
+
     @property
     def title(self) -> str:
         return self._title
@@ -295,6 +946,7 @@ class MudObject:
     @title.setter
     def title(self, value: str) -> None:
         self._title = value
+        self._appearance_changed()
 
     @property
     def description(self) -> str:
@@ -311,9 +963,20 @@ class MudObject:
     @short_description.setter
     def short_description(self, value: str) -> None:
         self._short_description = value
+        self._appearance_changed()
+
+    def _appearance_changed(self) -> None:
+        # the title or short description changed: give the set this object is in a new version,
+        # so the location (see Location.look) knows it has to describe its contents anew.
+        if self._names_index is not None:
+            names_index = self._names_index()
+            if names_index is not None:
+                names_index.version = next(_versions)
 
     @property
     def extra_desc(self) -> Dict[str, str]:
+        if not isinstance(self._extradesc, dict):
+            self._extradesc = dict(self._extradesc or {})   # copy the prototype's extra descriptions, they can be changed now
         return self._extradesc
 
     @extra_desc.setter
@@ -323,23 +986,50 @@ class MudObject:
 
     def init_names(self, name: str, title: str, descr: str, short_descr: str) -> None:
         """(re)set the name and description attributes"""
-        self.name = name.lower()
         if title:
             self._check_title(title)
-        self._title = title or name
+        self._title = sys.intern(title or name)
         self._description = dedent(descr).strip() if descr else ""
         self._short_description = short_descr.strip() if short_descr else ""
-        self._extradesc = {}   # maps keyword to description
+        self._extradesc = None   # maps keyword to description
+        self._prototype = None
+        self.name = sys.intern(name.lower())    # many objects share the same few names
+
+    def init_from_prototype(self, prototype: Prototype) -> None:
+        """
+        (re)set the name and description attributes, aliases and extra descriptions from the prototype.
+        These are shared with the prototype (and all other objects initialized from it) until they're changed.
+        If the prototype has no description, the object keeps its own (it may depend on the object, such as for money).
+        """
+        self._title = prototype.title
+        if prototype.description:
+            self._description = prototype.description
+        self._short_description = prototype.short_description
+        self._aliases = prototype.aliases or None
+        self._extradesc = prototype.extra_desc or None
+        self._prototype = prototype
+        self.name = prototype.name      # also reindexes the aliases
+
+    @property
+    def prototype(self) -> Optional[Prototype]:
+        """the prototype this object shares its names and descriptions with (if any)"""
+        return self._prototype
 
-    def _check_title(self, title: str) -> None:
+    def get_extradesc(self, keyword: str) -> str:
+        """The extra description text for the keyword (or empty string). Doesn't copy shared extra descriptions."""
+        return (self._extradesc or {}).get(keyword, "")
+
+    @staticmethod
+    def _check_title(title: str) -> None:
         w = title.partition(" ")[0].lower()
         if w in {"a", "an", "the"}:
             raise TaleError("title cannot start with an article: '%s' (these are added automatically)" % title)
 
     def add_extradesc(self, keywords: Set[str], description: str) -> None:
         """For the set of keywords, add the extra description text"""
+        extra_desc = self.extra_desc
         for keyword in keywords:
-            self._extradesc[keyword] = description
+            extra_desc[keyword] = description
 
     def __repr__(self):
         return "<%s '%s' #%d @ 0x%x>" % (self.__class__.__name__, self.name, self.vnum, id(self))
@@ -347,6 +1037,30 @@ class MudObject:
     def destroy(self, ctx: Optional[util.Context]) -> None:
         """Common cleanup code that needs to be called when the object is destroyed"""
         mud_context.driver.remove_deferreds(self)
+        MudObjRegistry.forget(self)
+
+    def _duplicate(self, memo: Dict[int, Any], **replaced: Any) -> Any:
+        # Creates a copy of the object, with a new vnum, by copying its attributes one by one.
+        # Immutable values (such as the names, descriptions, and the aliases and extra descriptions
+        # shared with a prototype) are shared with the copy, only the other values are deep-copied.
+        # The given keyword arguments are set on the copy as they are, instead of copying the original values.
+        duplicate = self.__class__.__new__(self.__class__)    # registers the new vnum
+        memo[id(self)] = duplicate
+        for name, value in util.object_vars(self).items():
+            if name in replaced or name in ("vnum", "_names_index"):
+                continue
+            if type(value) not in _immutable_types:
+                value = copy.deepcopy(value, memo)
+            setattr(duplicate, name, value)
+        for name, value in replaced.items():
+            setattr(duplicate, name, value)
+        MudObjRegistry.name_changed(duplicate, None)
+        mud_context.driver.register_periodicals(duplicate)
+        return duplicate
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Any:
+        # objects that are copied along with another one (such as the inventory of a clone) are clones as well
+        return self._duplicate(memo)
 
     def wiz_clone(self, actor: 'Living') -> 'MudObject':
         """clone the thing (performed by a wizard)"""
@@ -414,6 +1128,7 @@ class Item(MudObject):
     Regular items cannot contain other things, so it makes to sense
     to check containment.
     """
+    __slots__ = ("contained_in", "default_verb", "value", "rent", "weight", "takeable")
 
     def __init__(self, name: str, title: str = "", *, descr: str = "", short_descr: str = "") -> None:
         self.contained_in = None   # type: Optional[ContainingType]
@@ -548,7 +1263,7 @@ class Item(MudObject):
         items = [i for i in collection if i.name == name]
         if not items:
             # try the aliases or titles
-            items = [i for i in collection if name in i.aliases or i.title.lower() == name]
+            items = [i for i in collection if name in (i._aliases or ()) or i.title.lower() == name]
         return items[0] if items else None
 
     def clone(self) -> 'Item':
@@ -562,13 +1277,7 @@ class Item(MudObject):
                 raise ValueError("can't clone something that has other stuff in it")
         except ActionRefused:
             pass
-        # avoid deepcopying the location
-        location, self.location = self.location, None
-        duplicate = copy.deepcopy(self)
-        self.location = duplicate.location = location
-        MudObjRegistry.track_vnum(duplicate, fix_clones=True)   # deepcopy resets initially given vnum so hand out a new one
-        mud_context.driver.register_periodicals(duplicate)
-        return duplicate
+        return self._duplicate({}, contained_in=self.contained_in)    # don't copy the location
 
 
 class Weapon(Item):
@@ -576,14 +1285,120 @@ class Weapon(Item):
     An item that can be wielded by a Living (i.e. present in a weapon itemslot),
     and that can be used to attack another Living.
     """
-    pass
+    __slots__ = ()
 
 
 class Armour(Item):
     """
     An item that can be worn by a Living (i.e. present in an armour itemslot)
     """
-    pass
+    __slots__ = ()
+
+
+_dynamic_appearance = {}   # type: Dict[type, bool]
+
+
+def _has_dynamic_appearance(obj: MudObject) -> bool:
+    # does the object compute its title or short description itself (such as Boxlike)? Then they can change unnoticed.
+    cls = obj.__class__
+    dynamic = _dynamic_appearance.get(cls)
+    if dynamic is None:
+        dynamic = _dynamic_appearance[cls] = \
+            cls.title is not MudObject.title or cls.short_description is not MudObject.short_description    # type: ignore
+    return dynamic
+
+
+class _RenderedLook:
+    """
+    The description of a location (see Location.look), as far as it doesn't depend on who's looking.
+    Also remembers the paragraphs it produced for the viewers that already looked.
+    """
+    __slots__ = ("stamp", "dynamic", "short_paragraphs", "long_paragraphs", "item_sentences",
+                 "living_names", "living_titles", "living_descriptions", "viewers")
+
+    def __init__(self, location: 'Location', stamp: Tuple[Any, ...]) -> None:
+        self.stamp = stamp
+        self.dynamic = any(_has_dynamic_appearance(obj) for obj in itertools.chain(location.items, location.livings))
+        self.viewers = {}   # type: Dict[Tuple[int, bool], List[str]]
+        header = "<location>[" + location.name + "]</>"
+        show_exits = location.exits and mud_context.config.show_exits_in_look
+        # the short form
+        self.short_paragraphs = [header]
+        if show_exits:
+            self.short_paragraphs.append("Exits: " + ", ".join(sorted(set(location.exits.keys()))))
+        if location.items:
+            item_names = sorted(item.name for item in location.items)
+            self.short_paragraphs.append("You see: " + lang.join(item_names))
+        self.living_names = sorted(living.name for living in location.livings)
+        # the normal (long) form
+        self.long_paragraphs = [header]
+        if location.description:
+            self.long_paragraphs.append(location.description)
+        if show_exits:
+            exits_seen = set()  # type: Set[Exit]
+            exit_paragraph = []  # type: List[str]
+            for exit_name in sorted(location.exits):
+                exit = location.exits[exit_name]
+                if exit not in exits_seen:
+                    exits_seen.add(exit)
+                    exit_paragraph.append(exit.short_description)
+            self.long_paragraphs.append(" ".join(exit_paragraph))
+        self.item_sentences = sorted({item.short_description for item in location.items if item.short_description})
+        items_without_short_descr = [item for item in location.items if not item.short_description]
+        if items_without_short_descr:
+            titles = sorted([lang.a(item.title) for item in items_without_short_descr])
+            self.item_sentences.append("You see " + lang.join(titles) + ".")
+        self.living_titles = sorted(living.title for living in location.livings if not living.short_description)
+        self.living_descriptions = {}   # type: Dict[str, int]   # how many livings have this short description
+        for living in location.livings:
+            if living.short_description:
+                self.living_descriptions[living.short_description] = self.living_descriptions.get(living.short_description, 0) + 1
+
+    def paragraphs(self, location: 'Location', exclude_living: Optional['Living'], short: bool) -> List[str]:
+        if exclude_living is not None and exclude_living not in location.livings:
+            exclude_living = None
+        key = (exclude_living.vnum if exclude_living else 0, short)
+        paragraphs = self.viewers.get(key)
+        if paragraphs is None:
+            paragraphs = self.short_for(exclude_living) if short else self.long_for(exclude_living)
+            if not self.dynamic:
+                self.viewers[key] = paragraphs
+        return list(paragraphs)
+
+    def short_for(self, exclude_living: Optional['Living']) -> List[str]:
+        paragraphs = list(self.short_paragraphs)
+        living_names = self.living_names
+        if exclude_living:
+            living_names = list(living_names)
+            living_names.remove(exclude_living.name)
+        if living_names:
+            paragraphs.append("Present here: " + lang.join(living_names))
+        return paragraphs
+
+    def long_for(self, exclude_living: Optional['Living']) -> List[str]:
+        paragraphs = list(self.long_paragraphs)
+        titles = self.living_titles
+        descriptions = self.living_descriptions
+        if exclude_living:
+            if exclude_living.short_description:
+                if descriptions[exclude_living.short_description] == 1:
+                    descriptions = dict(descriptions)
+                    del descriptions[exclude_living.short_description]
+            else:
+                titles = list(titles)
+                titles.remove(exclude_living.title)
+        items_and_livings = list(self.item_sentences)
+        if titles:
+            titles_str = lang.join(titles)
+            if len(titles) > 1:
+                titles_str += " are here."
+            else:
+                titles_str += " is here."
+            items_and_livings.append(lang.capital(titles_str))
+        items_and_livings.extend(sorted(descriptions))
+        if items_and_livings:
+            paragraphs.append(" ".join(items_and_livings))
+        return paragraphs
 
 
 class Location(MudObject):
@@ -592,16 +1407,76 @@ class Location(MudObject):
     Has connections ('exits') to other Locations.
     You can test for containment with 'in': item in loc, npc in loc
     """
+    __slots__ = ("exits", "_livings", "_items", "_wiretap", "_version", "_rendered_look")
+
     def __init__(self, name: str, descr: str="") -> None:
         self.name = name
         self.livings = set()  # type: Set[Living] # set of livings in this location
         self.items = set()    # type: Set[Item] # set of all items in the room
         self.exits = {}       # type: Dict[str, Exit] # dictionary of all exits: exit_direction -> Exit object with target & descr
+        self._wiretap = None  # type: Optional[pubsub.Topic]
+        self._version = next(_versions)
+        self._rendered_look = None   # type: Optional[_RenderedLook]
         super().__init__(name, descr=descr)
         self.name = name      # make sure we preserve the case; base object overwrites it in lowercase
 
+    @property
+    def version(self) -> Tuple[int, int, int]:
+        """
+        A stamp that changes whenever the livings, items, exits, or the custom verbs in this location change.
+        (Exits should be added with add_exits or Exit.bind, or call changed() after changing the exits directly)
+        """
+        return self._version, self._livings.version, self._items.version
+
+    def changed(self) -> None:
+        """Give the location a new version stamp, to signal a change that isn't tracked automatically"""
+        self._version = next(_versions)
+
+    def _reindex(self) -> None:
+        super()._reindex()
+        self._version = next(_versions)
+
+    @property
+    def livings(self) -> NameIndexedSet['Living']:
+        return self._livings
+
+    @livings.setter
+    def livings(self, livings: Iterable['Living']) -> None:
+        self._livings = NameIndexedSet(livings)     # type: NameIndexedSet[Living]
+
+    @property
+    def items(self) -> NameIndexedSet[Item]:
+        return self._items
+
+    @items.setter
+    def items(self, items: Iterable[Item]) -> None:
+        self._items = NameIndexedSet(items)     # type: NameIndexedSet[Item]
+
     def __contains__(self, obj: Union['Living', Item]) -> bool:
-        return obj in self.livings or obj in self.items
+        return obj in self._livings or obj in self._items
+
+    def has_custom_verb(self, verb: str) -> bool:
+        """Is the verb a custom verb of this location, or of one of the livings, items or exits in it?"""
+        return verb in (self._verbs or ()) or self._livings.has_verb(verb) or self._items.has_verb(verb) \
+            or any(verb in (exit._verbs or ()) for exit in self.exits.values())
+
+    def custom_verbs(self) -> Dict[str, str]:
+        """The custom verbs of this location and the livings, items and exits in it (verb -> help text)"""
+        verbs = dict(self._verbs or {})
+        verbs.update(self._livings.verbs())
+        verbs.update(self._items.verbs())
+        for exit in self.exits.values():
+            verbs.update(exit._verbs or {})
+        return verbs
+
+    def custom_verbs_with_prefix(self, prefix: str) -> Set[str]:
+        """The custom verbs of this location and the livings, items and exits in it, that start with the given prefix"""
+        verbs = {verb for verb in self._verbs or () if verb.startswith(prefix)}
+        verbs.update(self._livings.verbs_with_prefix(prefix))
+        verbs.update(self._items.verbs_with_prefix(prefix))
+        for exit in self.exits.values():
+            verbs.update(verb for verb in exit._verbs or () if verb.startswith(prefix))
+        return verbs
 
     def init_inventory(self, objects: Iterable[Union[Item, 'Living']]) -> None:
         """Set the location's initial item and livings 'inventory'"""
@@ -618,6 +1493,7 @@ class Location(MudObject):
         self.livings.clear()
         self.items.clear()
         self.exits.clear()
+        self.changed()
 
     def add_exits(self, exits: Iterable['Exit']) -> None:
         """Adds every exit from the sequence as an exit to this room."""
@@ -627,8 +1503,8 @@ class Location(MudObject):
             # the exit may have aliases defined that it wants to be known as also.
 
     def get_wiretap(self) -> pubsub.Topic:
-        """get a wiretap for this location"""
-        return pubsub.topic(("wiretap-location", "%s#%d" % (self.name, self.vnum)))
+        """get a wiretap for this location (it is created when it's needed for the first time)"""
+        return _wiretap(self, "wiretap-location")
 
     def tell(self, room_msg: str, exclude_living: 'Living'=None, specific_targets: Set[Union[ParsedWhoType]]=None,
              specific_target_msg: str="") -> None:
@@ -648,9 +1524,8 @@ class Location(MudObject):
                 living.tell(specific_target_msg)
             else:
                 living.tell(room_msg)
-        if room_msg:
-            tap = self.get_wiretap()
-            tap.send((self.name, room_msg))
+        if room_msg and self._wiretap:
+            self._wiretap.send((self.name, room_msg))
 
     def message_nearby_locations(self, message: str) -> None:
         """
@@ -693,61 +1568,18 @@ class Location(MudObject):
         return (e.target for e in self.exits.values())
 
     def look(self, exclude_living: 'Living'=None, short: bool=False) -> Sequence[str]:
-        """returns a list of paragraph strings describing the surroundings, possibly excluding one living from the description list"""
-        paragraphs = ["<location>[" + self.name + "]</>"]
-        if short:
-            if self.exits and mud_context.config.show_exits_in_look:
-                paragraphs.append("Exits: " + ", ".join(sorted(set(self.exits.keys()))))
-            if self.items:
-                item_names = sorted(item.name for item in self.items)
-                paragraphs.append("You see: " + lang.join(item_names))
-            if self.livings:
-                living_names = sorted(living.name for living in self.livings if living != exclude_living)
-                if living_names:
-                    paragraphs.append("Present here: " + lang.join(living_names))
-            return paragraphs
-        # normal (long) output
-        if self.description:
-            paragraphs.append(self.description)
-        if self.exits and mud_context.config.show_exits_in_look:
-            exits_seen = set()  # type: Set[Exit]
-            exit_paragraph = []  # type: List[str]
-            for exit_name in sorted(self.exits):
-                exit = self.exits[exit_name]
-                if exit not in exits_seen:
-                    exits_seen.add(exit)
-                    exit_paragraph.append(exit.short_description)
-            paragraphs.append(" ".join(exit_paragraph))
-        items_and_livings = []  # type: List[str]
-        items_with_short_descr = [item for item in self.items if item.short_description]
-        items_without_short_descr = [item for item in self.items if not item.short_description]
-        uniq_descriptions = set()
-        if items_with_short_descr:
-            for item in items_with_short_descr:
-                uniq_descriptions.add(item.short_description)
-        items_and_livings.extend(uniq_descriptions)
-        if items_without_short_descr:
-            titles = sorted([lang.a(item.title) for item in items_without_short_descr])
-            items_and_livings.append("You see " + lang.join(titles) + ".")
-        livings_with_short_descr = [living for living in self.livings if living != exclude_living and living.short_description]
-        livings_without_short_descr = [living for living in self.livings if living != exclude_living and not living.short_description]
-        if livings_without_short_descr:
-            titles = sorted(living.title for living in livings_without_short_descr)
-            if titles:
-                titles_str = lang.join(titles)
-                if len(titles) > 1:
-                    titles_str += " are here."
-                else:
-                    titles_str += " is here."
-                items_and_livings.append(lang.capital(titles_str))
-        uniq_descriptions = set()
-        if livings_with_short_descr:
-            for living in livings_with_short_descr:
-                uniq_descriptions.add(living.short_description)
-        items_and_livings.extend(uniq_descriptions)
-        if items_and_livings:
-            paragraphs.append(" ".join(items_and_livings))
-        return paragraphs
+        """
+        returns a list of paragraph strings describing the surroundings, possibly excluding one living from the description list.
+        The description is reused until something in the location changes (see version), only excluding the viewer
+        is done per viewer.  The title and short description changes of the things here are noticed too,
+        except when they're dynamic (computed by the object itself): then the description is made anew every time.
+        """
+        stamp = (self.version, self.name, self.description, bool(self.exits) and mud_context.config.show_exits_in_look)
+        rendered = self._rendered_look
+        if rendered is None or rendered.stamp != stamp:
+            rendered = _RenderedLook(self, stamp)
+            self._rendered_look = None if rendered.dynamic else rendered
+        return rendered.paragraphs(self, exclude_living, short)
 
     def search_living(self, name: str) -> Optional['Living']:
         """
@@ -758,7 +1590,7 @@ class Location(MudObject):
         result = [living for living in self.livings if living.name == name]
         if not result:
             # try titles and aliases
-            result = [living for living in self.livings if name in living.aliases or living.title.lower() == name]
+            result = [living for living in self.livings if name in (living._aliases or ()) or living.title.lower() == name]
         return result[0] if result else None
 
     def insert(self, obj: Union['Living', Item], actor: Optional['Living']) -> None:
@@ -882,6 +1714,9 @@ class Location(MudObject):
 
 
 class Stats:
+    __slots__ = ("gender", "level", "xp", "hp", "maxhp_dice", "ac", "attack_dice", "alignment",
+                 "bodytype", "language", "weight", "size", "race")
+
     def __init__(self) -> None:
         self.gender = 'n'
         self.level = 0
@@ -898,7 +1733,7 @@ class Stats:
         self.race = ""      # the name of the race of this creature
 
     def __repr__(self):
-        return "<Stats: %s>" % vars(self)
+        return "<Stats: %s>" % util.object_vars(self)
 
     @classmethod
     def from_race(cls: type, race: builtins.str, gender: builtins.str='n') -> 'Stats':
@@ -927,6 +1762,11 @@ class Living(MudObject):
     They are always inside a Location (Limbo when not specified yet).
     They also have an inventory object, and you can test for containment with item in living.
     """
+    __slots__ = ("stats", "soul", "location", "privileges", "aggressive", "money", "default_verb", "__inventory",
+                 "previous_commandline", "_previous_parse", "teleported_from", "following", "is_pet", "_wiretap",
+                 "gender", "subjective", "possessive", "objective")
+    parse_cache_size = 0    # the number of parsed command lines the soul remembers (0 = no parse cache)
+
     def __init__(self, name: str, gender: str, *, race: str="human",
                  title: str="", descr: str="", short_descr: str="") -> None:
         if race:
@@ -934,18 +1774,19 @@ class Living(MudObject):
         else:
             self.stats = Stats()
         self.init_gender(gender)
-        self.soul = Soul()
+        self.soul = Soul(self.parse_cache_size)
         self.location = _limbo  # type: Location  # set transitional location
         self.privileges = set()  # type: Set[str] # probably only used for Players though
         self.aggressive = False
         self.money = 0.0  # the currency is determined by util.MoneyFormatter set in the driver
         self.default_verb = "examine"
-        self.__inventory = set()   # type: Set[Item]
+        self.__inventory = NameIndexedSet()     # type: NameIndexedSet[Item]
         self.previous_commandline = ""
-        self._previous_parse = ParseResult("")
+        self._previous_parse = _nothing_parsed
         self.teleported_from = None   # type: Optional[Location]   # used by teleport/return commands
         self.following = None   # type: Optional[Living]
         self.is_pet = False   # set this to True if creature is/becomes someone's pet
+        self._wiretap = None  # type: Optional[pubsub.Topic]
         super().__init__(name, title=title, descr=descr, short_descr=short_descr)
 
     def init_gender(self, gender: str) -> None:
@@ -973,6 +1814,11 @@ class Living(MudObject):
     def inventory(self) -> FrozenSet[Item]:
         return frozenset(self.__inventory)
 
+    @property
+    def inventory_names(self) -> NameIndexedSet[Item]:
+        """the inventory with its name index. Don't change it, use insert and remove instead."""
+        return self.__inventory
+
     def insert(self, item: Union['Living', Item], actor: Optional['Living']) -> None:
         """Add an item to the inventory."""
         assert item is not None
@@ -1015,12 +1861,9 @@ class Living(MudObject):
     @util.authorized("wizard")
     def wiz_clone(self, actor: 'Living', make_clone: bool=True) -> 'Living':
         if make_clone:
-            # avoid deepcopying the location
-            location, self.location = self.location, _limbo
-            duplicate = copy.deepcopy(self)
-            self.location = location
-            MudObjRegistry.track_vnum(duplicate, fix_clones=True)   # deepcopy overwrites initially given vnum so make a new one
-            mud_context.driver.register_periodicals(duplicate)
+            # don't copy the location and the things that refer to other objects, and give the clone its own soul
+            duplicate = self._duplicate({}, location=_limbo, soul=Soul(self.parse_cache_size), _previous_parse=_nothing_parsed,
+                                        teleported_from=None, following=None, _wiretap=None)
         else:
             duplicate = self
         actor.tell("Cloned into: " + repr(duplicate) + " (spawned in current location)")
@@ -1049,8 +1892,8 @@ class Living(MudObject):
             actor.tell("Money in possession: %s." % ctx.driver.moneyfmt.display(self.money))
 
     def get_wiretap(self) -> pubsub.Topic:
-        """get a wiretap for this living"""
-        return pubsub.topic(("wiretap-living", "%s#%d" % (self.name, self.vnum)))
+        """get a wiretap for this living (it is created when it's needed for the first time)"""
+        return _wiretap(self, "wiretap-living")
 
     def tell(self, message: str, *, end: bool=False, format: bool=True) -> 'Living':
         """
@@ -1066,8 +1909,8 @@ class Living(MudObject):
         Note: end and format parameters are ignored for Livings but may be
         useful when this function is called on a subclass such as Player.
         """
-        tap = self.get_wiretap()
-        tap.send((self.name, str(message)))
+        if self._wiretap:
+            self._wiretap.send((self.name, str(message)))
         return self
 
     def tell_later(self, message: str) -> None:
@@ -1091,7 +1934,7 @@ class Living(MudObject):
             spec_msg = message.format(actor=self.title, Actor=lang.capital(self.title), target="you", Target="You")
             self.location.tell(room_msg, exclude_living=self, specific_targets={target}, specific_target_msg=spec_msg)
 
-    def parse(self, commandline: str, external_verbs: Set[str]=set()) -> ParseResult:
+    def parse(self, commandline: str, external_verbs: TypingContainer[str]=frozenset()) -> ParseResult:
         """Parse the commandline into something that can be processed by the soul (ParseResult)"""
         if commandline == "again":
             # special case, repeat previous command
@@ -1121,7 +1964,7 @@ class Living(MudObject):
         """remember the previously parsed data, soul uses this to reference back to earlier items/livings"""
         self.soul.remember_previous_parse(self._previous_parse)
 
-    def do_socialize(self, cmdline: str, external_verbs: Set[str]=set()) -> None:
+    def do_socialize(self, cmdline: str, external_verbs: TypingContainer[str]=frozenset()) -> None:
         """
         Perform a command line with a socialize/soul verb on the living's behalf.
         It only performs soul emotes, no custom command functions!
@@ -1148,18 +1991,18 @@ class Living(MudObject):
         that initiate a dialog (generators)
         This function is not used in the processing of player commands!
         """
-        command_verbs = ctx.driver.current_verbs(self)
+        command_verbs = ctx.driver.commands.get(self.privileges)
         try:
-            self.do_socialize(cmdline, command_verbs)
+            self.do_socialize(cmdline, ctx.driver.recognised_verbs(self))
         except NonSoulVerb as nx:
             parsed = nx.parsed
             if parsed.verb in command_verbs:
-                func = ctx.driver.commands.get(self.privileges)[parsed.verb]
+                func = command_verbs[parsed.verb]
                 if getattr(func, "is_generator", False):
                     raise TaleError("can't let a npc perform a dialog command")
                 func(self, parsed, ctx)
                 if func.enable_notify_action:
-                    pending_actions.send(lambda actor=self: actor.location._notify_action_all(parsed, actor))
+                    notify_location(LocationNotificationKind.ACTION, self, self.location, parsed=parsed)
 
     def do_socialize_cmd(self, parsed: ParseResult) -> None:
         """
@@ -1169,7 +2012,7 @@ class Living(MudObject):
         who, actor_message, room_message, target_message = self.soul.process_verb_parsed(self, parsed)
         self.tell(actor_message)
         self.location.tell(room_message, self, who, target_message)
-        pending_actions.send(lambda actor=self: actor.location._notify_action_all(parsed, actor))
+        notify_location(LocationNotificationKind.ACTION, self, self.location, parsed=parsed)
         if parsed.verb in verbdefs.AGGRESSIVE_VERBS:
             # usually monsters immediately attack,
             # other npcs may choose to attack or to ignore it
@@ -1195,26 +2038,25 @@ class Living(MudObject):
         try:
             if parsed.qualifier:
                 raise ParseError("That action doesn't support qualifiers.")  # for now, quals are only supported on soul-verbs (emotes).
-            custom_verbs = set(ctx.driver.current_custom_verbs(self))
-            if parsed.verb in custom_verbs:
+            if ctx.driver.is_custom_verb(self, parsed.verb):
                 if self.location.handle_verb(parsed, self):       # note: can't deal with async dialogs
-                    pending_actions.send(lambda actor=self: actor.location._notify_action_all(parsed, actor))
+                    notify_location(LocationNotificationKind.ACTION, self, self.location, parsed=parsed)
                     return
                 else:
                     raise ParseError("That custom verb is not understood by the environment.")
             if parsed.verb in self.location.exits:
                 ctx.driver.go_through_exit(self, parsed.verb)
                 return
-            command_verbs = set(ctx.driver.current_verbs(self))
+            command_verbs = ctx.driver.commands.get(self.privileges)
             if parsed.verb in command_verbs:
-                func = ctx.driver.commands.get(self.privileges)[parsed.verb]
+                func = command_verbs[parsed.verb]
                 if getattr(func, "is_generator", False):
                     dialog = func(self, parsed, ctx)
                     async_dialogs.send((ctx.conn, dialog))    # enqueue as async, and continue
                     return
                 func(self, parsed, ctx)
                 if func.enable_notify_action:
-                    pending_actions.send(lambda actor=self: actor.location._notify_action_all(parsed, actor))
+                    notify_location(LocationNotificationKind.ACTION, self, self.location, parsed=parsed)
                 return
             raise ParseError("Command not understood.")
         except Exception as x:
@@ -1263,19 +2105,15 @@ class Living(MudObject):
                     message = "%s leaves." % lang.capital(self.title)
                 original_location.tell(message, exclude_living=self)
             # queue event
-            if is_player:
-                pending_actions.send(lambda who=self, where=target: original_location.notify_player_left(who, where))
-            else:
-                pending_actions.send(lambda who=self, where=target: original_location.notify_npc_left(who, where))
+            notify_location(LocationNotificationKind.PLAYER_LEFT if is_player else LocationNotificationKind.NPC_LEFT,
+                            self, original_location, target)
         else:
             target.insert(self, actor)
         if not silent:
             target.tell("%s arrives." % lang.capital(self.title), exclude_living=self)
         # queue event
-        if is_player:
-            pending_actions.send(lambda who=self, where=original_location: target.notify_player_arrived(who, where))
-        else:
-            pending_actions.send(lambda who=self, where=original_location: target.notify_npc_arrived(who, where))
+        notify_location(LocationNotificationKind.PLAYER_ARRIVED if is_player else LocationNotificationKind.NPC_ARRIVED,
+                        self, target, original_location)
 
     def search_item(self, name: str, include_inventory: bool=True,
                     include_location: bool=True, include_containers_in_inventory: bool=True) -> Optional[Item]:
@@ -1412,6 +2250,8 @@ class Container(Item):
     Allows insert and remove, and examine its contents, as opposed to an Item
     You can test for containment with 'in': item in bag
     """
+    __slots__ = ("__inventory",)
+
     def init(self) -> None:
         self.__inventory = set()   # type: Set[Item]
 
@@ -1467,6 +2307,8 @@ class Exit(MudObject):
     The exit's direction is stored as its name attribute (if more than one, the rest are aliases).
     Note that the exit's origin is not stored in the exit object.
     """
+    __slots__ = ("target", "_target_str", "enter_msg")
+
     def __init__(self, directions: Union[str, Sequence[str]], target_location: Union[str, Location],
                  short_descr: str, long_descr: str="", *, enter_msg: str="") -> None:
         assert isinstance(target_location, (Location, str)), "target must be a Location or a string"
@@ -1502,7 +2344,7 @@ class Exit(MudObject):
     @property
     def names(self):
         """a list of all the names of this direction (name followed by aliases)"""
-        return [self.name] + list(self.aliases)
+        return [self.name] + list(self._aliases or ())
 
     @classmethod
     def connect(cls, from_loc: Location, directions: Union[str, Sequence[str]], short_descr: str, long_descr: str,
@@ -1521,11 +2363,12 @@ class Exit(MudObject):
     def bind(self, location: Location) -> None:
         """Binds the exit to a location."""
         assert isinstance(location, Location)
-        directions = self.aliases | {self.name}
+        directions = {self.name}.union(self._aliases or ())
         for direction in directions:
             if direction in location.exits:
                 raise LocationIntegrityError("exit already exists: '%s' in %s" % (direction, location), direction, self, location)
             location.exits[direction] = self
+        location.changed()
 
     def _bind_target(self, game_zones_module: ModuleType) -> None:
         """
@@ -1576,6 +2419,8 @@ class Door(Exit):
     Because a single door is still only one-way, you have to create a second -linked- door to go back.
     This is easily done by the ``reverse_door`` method.
     """
+    __slots__ = ("locked", "opened", "__description_prefix", "key_code", "linked_door")
+
     def __init__(self, directions: Union[str, Sequence[str]], target_location: Union[str, Location],
                  short_descr: str, long_descr: str="", *, enter_msg: str="",
                  locked: bool=False, opened: bool=False, key_code: str="") -> None:
@@ -1752,6 +2597,8 @@ class Door(Exit):
 
 class Key(Item):
     """A key which has a unique code. It can be used to open a matching Door. Set the door or code using the key_for method."""
+    __slots__ = ("key_code",)
+
     def init(self) -> None:
         self.key_code = ""
 
@@ -1771,19 +2618,27 @@ class Soul:
     The 'soul' of a Living (most importantly, a Player).
     Handles the high level verb actions and allows for social player interaction.
     Verbs that actually do something in the environment (not purely social messages) are implemented elsewhere.
+    It can remember the results of the most recently parsed command lines (parse_cache_size), these are reused
+    as long as the surroundings and inventory of the player, and the verbs it can use, remain the same.
     """
 
     _quoted_message_regex = re.compile(r"('(?P<msg1>.*)')|(\"(?P<msg2>.*)\")")  # greedy single-or-doublequoted string match
     _skip_words = {"and", "&", "at", "to", "before", "in", "into", "on", "off", "onto",
                    "the", "with", "from", "after", "before", "under", "above", "next"}
 
-    def __init__(self) -> None:
-        self.__previously_parsed = ParseResult("")
+    _pronouns = {"them", "him", "her", "it"}
+    __slots__ = ("__previously_parsed", "parse_cache_size", "_parse_cache")
+
+    def __init__(self, parse_cache_size: int=0) -> None:
+        self.__previously_parsed = _nothing_parsed
+        self.parse_cache_size = parse_cache_size
+        # command string -> (version stamp, external verbs token, verbs table, result, result was a NonSoulVerb)
+        self._parse_cache = None   # type: Optional[OrderedDict[str, Tuple[Any, Any, Any, ParseResult, bool]]]
 
     def is_verb(self, verb: str) -> bool:
         return verb in verbdefs.VERBS
 
-    def process_verb(self, player: Living, commandstring: str, external_verbs: Set[str]=set()) \
+    def process_verb(self, player: Living, commandstring: str, external_verbs: TypingContainer[str]=frozenset()) \
             -> Tuple[str, Tuple[Set[ParsedWhoType], str, str, str]]:
         """
         Parse a command string and return a tuple containing the main verb (tickle, ponder, ...)
@@ -1809,16 +2664,15 @@ class Soul:
         """
         if not player:
             raise TaleError("no player in process_verb_parsed")
-        verbdata = verbdefs.VERBS.get(parsed.verb)
-        if not verbdata:
+        template = verbdefs.get_template(parsed.verb)
+        if not template:
             raise UnknownVerbException(parsed.verb, [], parsed.qualifier)
+        if not template.actions:
+            raise TaleError("invalid vtype " + str(template.vtype))    # verbdefs.FULL is not used yet anyway
+        if template.needs_person and not parsed.who_info:
+            raise ParseError("The verb %s needs a person." % parsed.verb)
 
-        message = parsed.message
-        adverb = parsed.adverb
-
-        vtype = verbdata[0]
-        if not message and verbdata[1] and len(verbdata[1]) > 1:
-            message = verbdata[1][1]  # get the message from the verbs table
+        message = parsed.message or template.message
         if message:
             if message.startswith("'"):
                 # use the message without single quotes around it
@@ -1828,141 +2682,107 @@ class Soul:
                 message = " " + message
         else:
             msg = message = ""
-        if not adverb:
-            if verbdata[1]:
-                adverb = verbdata[1][0]    # normal-adverb
-            else:
-                adverb = ""
-        where = ""
+        how = self.spacify(parsed.adverb or template.adverb)
+        where = template.where  # type: Union[str, verbdefs.TemplateType]  # specific bodyparts string from verbs table
         if parsed.bodypart:
             where = " " + verbdefs.BODY_PARTS[parsed.bodypart]
-        elif not parsed.bodypart and verbdata[1] and len(verbdata[1]) > 2 and verbdata[1][2]:
-            where = " " + verbdata[1][2]  # replace bodyparts string by specific one from verbs table
-        how = self.spacify(adverb)
 
-        def result_messages(action: str, action_room: str) -> Tuple[Set[ParsedWhoType], str, str, str]:
-            action = action.strip()
-            action_room = action_room.strip()
-            if parsed.qualifier:
-                qual_action, qual_room, use_room_default = verbdefs.ACTION_QUALIFIERS[parsed.qualifier]
-                action_room = qual_room % action_room if use_room_default else qual_room % action
-                action = qual_action % action
-            # construct message seen by player
-            targetnames = [self.who_replacement(player, target, player) for target in parsed.who_info]
-            player_msg = action.replace(" \nWHO", " " + lang.join(targetnames))
-            player_msg = player_msg.replace(" \nYOUR", " your")
-            player_msg = player_msg.replace(" \nMY", " your")
-            # construct message seen by room
-            targetnames = [self.who_replacement(player, target, None) for target in parsed.who_info]
-            room_msg = action_room.replace(" \nWHO", " " + lang.join(targetnames))
-            room_msg = room_msg.replace(" \nYOUR", " " + player.possessive)
-            room_msg = room_msg.replace(" \nMY", " " + player.objective)
-            # construct message seen by targets
-            target_msg = action_room.replace(" \nWHO", " you")
-            target_msg = target_msg.replace(" \nYOUR", " " + player.possessive)
-            target_msg = target_msg.replace(" \nPOSS", " your")
-            target_msg = target_msg.replace(" \nIS", " are")
-            target_msg = target_msg.replace(" \nSUBJ", " you")
-            target_msg = target_msg.replace(" \nMY", " " + player.objective)
-            # fix up POSS, IS, SUBJ in the player and room messages
-            if parsed.who_count == 1:
-                only_living = parsed.who_1
-                subjective = getattr(only_living, "subjective", "it")  # if no subjective attr, use "it"
-                player_msg = player_msg.replace(" \nIS", " is")
-                player_msg = player_msg.replace(" \nSUBJ", " " + subjective)
-                player_msg = player_msg.replace(" \nPOSS", " " + Soul.poss_replacement(player, only_living, player))
-                room_msg = room_msg.replace(" \nIS", " is")
-                room_msg = room_msg.replace(" \nSUBJ", " " + subjective)
-                room_msg = room_msg.replace(" \nPOSS", " " + Soul.poss_replacement(player, only_living, None))
-            else:
-                targetnames_player = lang.join([Soul.poss_replacement(player, living, player) for living in parsed.who_info])
-                targetnames_room = lang.join([Soul.poss_replacement(player, living, None) for living in parsed.who_info])
-                player_msg = player_msg.replace(" \nIS", " are")
-                player_msg = player_msg.replace(" \nSUBJ", " they")
-                player_msg = player_msg.replace(" \nPOSS", " " + lang.possessive(targetnames_player))
-                room_msg = room_msg.replace(" \nIS", " are")
-                room_msg = room_msg.replace(" \nSUBJ", " they")
-                room_msg = room_msg.replace(" \nPOSS", " " + lang.possessive(targetnames_room))
-            # add fullstops at the end
-            player_msg = lang.fullstop("You " + player_msg)
-            room_msg = lang.capital(lang.fullstop(player.title + " " + room_msg))
-            target_msg = lang.capital(lang.fullstop(player.title + " " + target_msg))
-            if player in parsed.who_info:
-                who = set(parsed.who_info)
-                who.remove(player)  # the player should not be part of the remaining targets.
-                whof = set(who)
-            else:
-                whof = set(parsed.who_info)
-            return whof, player_msg, room_msg, target_msg
-
-        # construct the action string
-        action = None
-        if vtype == verbdefs.DEUX:
-            action = verbdata[2]
-            action_room = verbdata[3]
-            if not self.check_person(action, parsed):
-                raise ParseError("The verb %s needs a person." % parsed.verb)
-            action = action.replace(" \nWHERE", where)
-            action_room = action_room.replace(" \nWHERE", where)
-            action = action.replace(" \nWHAT", message)
-            action = action.replace(" \nMSG", msg)
-            action_room = action_room.replace(" \nWHAT", message)
-            action_room = action_room.replace(" \nMSG", msg)
-            action = action.replace(" \nHOW", how)
-            action_room = action_room.replace(" \nHOW", how)
-            return result_messages(action, action_room)
-        elif vtype == verbdefs.QUAD:
-            if parsed.who_info:
-                action = verbdata[4]
-                action_room = verbdata[5]
-            else:
-                action = verbdata[2]
-                action_room = verbdata[3]
-            action = action.replace(" \nWHERE", where)
-            action_room = action_room.replace(" \nWHERE", where)
-            action = action.replace(" \nWHAT", message)
-            action = action.replace(" \nMSG", msg)
-            action_room = action_room.replace(" \nWHAT", message)
-            action_room = action_room.replace(" \nMSG", msg)
-            action = action.replace(" \nHOW", how)
-            action_room = action_room.replace(" \nHOW", how)
-            return result_messages(action, action_room)
-        elif vtype == verbdefs.FULL:
-            raise TaleError("vtype verbdefs.FULL")  # doesn't matter, verbdefs.FULL is not used yet anyway
-        elif vtype == verbdefs.DEFA:
-            action = parsed.verb + "$ \nHOW \nAT"
-        elif vtype == verbdefs.PREV:
-            action = parsed.verb + "$" + self.spacify(verbdata[2]) + " \nWHO \nHOW"
-        elif vtype == verbdefs.PHYS:
-            action = parsed.verb + "$" + self.spacify(verbdata[2]) + " \nWHO \nHOW \nWHERE"
-        elif vtype == verbdefs.SHRT:
-            action = parsed.verb + "$" + self.spacify(verbdata[2]) + " \nHOW"
-        elif vtype == verbdefs.PERS:
-            action = verbdata[3] if parsed.who_count else verbdata[2]
-        elif vtype == verbdefs.SIMP:
-            action = verbdata[2]
+        player_template, room_template = template.actions[bool(parsed.who_info)]
+        action = template.fill(player_template, how, where, message, msg)
+        action_room = template.fill(room_template, how, where, message, msg)
+        if parsed.qualifier:
+            qual_action, qual_room, use_room_default = verbdefs.ACTION_QUALIFIERS[parsed.qualifier]
+            action_room = self._qualify(qual_room, action_room if use_room_default else action)
+            action = self._qualify(qual_action, action)
+        # construct message seen by player, room and targets
+        targetnames_player = targetnames_room = poss_player = poss_room = ""
+        if verbdefs.WHO in template.escapes:
+            targetnames_player = lang.join([self.who_replacement(player, target, player) for target in parsed.who_info])
+            targetnames_room = lang.join([self.who_replacement(player, target, None) for target in parsed.who_info])
+        if parsed.who_count == 1:
+            only_living = parsed.who_1
+            subjective = " " + getattr(only_living, "subjective", "it")  # if no subjective attr, use "it"
+            is_ = " is"
+            if verbdefs.POSS in template.escapes:
+                poss_player = " " + Soul.poss_replacement(player, only_living, player)
+                poss_room = " " + Soul.poss_replacement(player, only_living, None)
         else:
-            raise TaleError("invalid vtype " + vtype)
-
-        if parsed.who_info and len(verbdata) > 3:
-            action = action.replace(" \nAT", self.spacify(verbdata[3]) + " \nWHO")
+            subjective = " they"
+            is_ = " are"
+            if verbdefs.POSS in template.escapes:
+                targetnames = [Soul.poss_replacement(player, living, player) for living in parsed.who_info]
+                poss_player = " " + lang.possessive(lang.join(targetnames))
+                targetnames = [Soul.poss_replacement(player, living, None) for living in parsed.who_info]
+                poss_room = " " + lang.possessive(lang.join(targetnames))
+        # the values for the WHO, YOUR, MY, POSS, IS and SUBJ escapes
+        player_msg = template.render(action, (" " + targetnames_player, " your", " your", poss_player, is_, subjective))
+        room_msg = template.render(action_room, (" " + targetnames_room, " " + player.possessive, " " + player.objective,
+                                                 poss_room, is_, subjective))
+        target_msg = template.render(action_room, (" you", " " + player.possessive, " " + player.objective, " your", " are", " you"))
+        # add fullstops at the end
+        player_msg = lang.fullstop("You " + player_msg)
+        room_msg = lang.capital(lang.fullstop(player.title + " " + room_msg))
+        target_msg = lang.capital(lang.fullstop(player.title + " " + target_msg))
+        if player in parsed.who_info:
+            who = set(parsed.who_info)
+            who.remove(player)  # the player should not be part of the remaining targets.
+            whof = set(who)
         else:
-            action = action.replace(" \nAT", "")
-
-        if not self.check_person(action, parsed):
-            raise ParseError("The verb %s needs a person." % parsed.verb)
+            whof = set(parsed.who_info)
+        return whof, player_msg, room_msg, target_msg
 
-        action = action.replace(" \nHOW", how)
-        action = action.replace(" \nWHERE", where)
-        action = action.replace(" \nWHAT", message)
-        action = action.replace(" \nMSG", msg)
-        action_room = action
-        action = action.replace("$", "")
-        action_room = action_room.replace("$", "s")
-        return result_messages(action, action_room)
-
-    def parse(self, player: Living, cmd: str, external_verbs: Set[str]=set()) -> ParseResult:
-        """Parse a command string, returns a ParseResult object."""
+    @staticmethod
+    def _qualify(qualifier_format: str, action: List[Union[str, int]]) -> List[Union[str, int]]:
+        """wraps a filled verb template action in an action qualifier format string (such as 'pretends to %s')"""
+        before, _, after = qualifier_format.partition("%s")
+        action = list(action)
+        action[0] = before + action[0]      # type: ignore
+        action[-1] = action[-1] + after     # type: ignore
+        return action
+
+    def parse(self, player: Living, cmd: str, external_verbs: TypingContainer[str]=frozenset()) -> ParseResult:
+        """
+        Parse a command string, returns a ParseResult object.
+        If the parse cache is enabled, and the same command string was parsed before in the same situation,
+        a copy of the earlier result is returned (or raised, if it was a NonSoulVerb) without parsing again.
+        """
+        if not self.parse_cache_size:
+            return self._parse(player, cmd, external_verbs)
+        verbs_token = getattr(external_verbs, "parse_cache_token", None)
+        if verbs_token is None:
+            if external_verbs:
+                return self._parse(player, cmd, external_verbs)  # can't tell if the verbs are the same next time
+            verbs_token = ()
+        if not self._pronouns.isdisjoint(word.rstrip(",") for word in cmd.split()):
+            return self._parse(player, cmd, external_verbs)     # pronouns depend on the previous parse
+        stamp = (player.location.version, player.inventory_names.version)
+        verbs_table = (verbdefs.COMPILED_VERBS, len(verbdefs.VERBS))
+        if self._parse_cache is None:
+            self._parse_cache = OrderedDict()
+        cached = self._parse_cache.get(cmd)
+        if cached is not None:
+            cached_stamp, cached_token, cached_verbs_table, result, non_soul = cached
+            if cached_stamp == stamp and (cached_token is verbs_token or cached_token == verbs_token) \
+                    and cached_verbs_table[0] is verbs_table[0] and cached_verbs_table[1] == verbs_table[1]:
+                self._parse_cache.move_to_end(cmd)
+                if non_soul:
+                    raise NonSoulVerb(result.copy())
+                return result.copy()
+        try:
+            result = self._parse(player, cmd, external_verbs)
+            non_soul = False
+        except NonSoulVerb as x:
+            result = x.parsed
+            non_soul = True
+        self._parse_cache[cmd] = (stamp, verbs_token, verbs_table, result.copy(), non_soul)
+        self._parse_cache.move_to_end(cmd)
+        if len(self._parse_cache) > self.parse_cache_size:
+            self._parse_cache.popitem(last=False)
+        if non_soul:
+            raise NonSoulVerb(result)
+        return result
+
+    def _parse(self, player: Living, cmd: str, external_verbs: TypingContainer[str]=frozenset()) -> ParseResult:
         qualifier = ""
         message_verb = False  # does the verb expect a message?
         external_verb = False  # is it a non-soul verb?
@@ -2004,8 +2824,7 @@ class Soul:
             # note: don't add verb to arg_words
         elif words[0] in verbdefs.VERBS:
             verb = words.pop(0)
-            verbdata = verbdefs.VERBS[verb][2]
-            message_verb = "\nMSG" in verbdata or "\nWHAT" in verbdata
+            message_verb = verbdefs.get_template(verb).message_verb     # type: ignore
             # note: don't add verb to arg_words
         elif player.location.exits:
             # check if the words are the name of a room exit.
@@ -2034,20 +2853,14 @@ class Soul:
             unparsed = unparsed[len(verb):].lstrip()
         include_flag = True
         collect_message = False
-        all_livings = {}  # livings in the room (including player) by name + aliases
-        all_items = {}  # all items in the room or player's inventory, by name + aliases
-        for living in player.location.livings:
-            all_livings[living.name] = living
-            for alias in living.aliases:
-                all_livings[alias] = living
-        for item in player.location.items:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
-        for item in player.inventory:
-            all_items[item.name] = item
-            for alias in item.aliases:
-                all_items[alias] = item
+        all_livings = player.location.livings   # livings in the room (including player), indexed by name + aliases
+        inventory = player.inventory_names      # the player's inventory has precedence over the items in the room
+        room_items = player.location.items
+
+        def find_item(name: str) -> Optional[Item]:
+            item = inventory.find(name)
+            return room_items.find(name) if item is None else item
+
         previous_word = None
         words_enumerator = enumerate(words)
         for index, word in words_enumerator:
@@ -2091,7 +2904,7 @@ class Soul:
             if word in verbdefs.BODY_PARTS:
                 if bodypart:
                     raise ParseError("You can't do that both %s and %s." % (verbdefs.BODY_PARTS[bodypart], verbdefs.BODY_PARTS[word]))
-                if (word not in all_items and word not in all_livings) or previous_word == "my":
+                if (find_item(word) is None and not all_livings.has_name(word)) or previous_word == "my":
                     bodypart = word
                     arg_words.append(word)
                     continue
@@ -2125,21 +2938,21 @@ class Soul:
                 adverb = word
                 arg_words.append(word)
                 continue
-            if word in all_livings:
-                living = all_livings[word]
+            named_living = all_livings.find(word)
+            if named_living is not None:
                 if include_flag:
-                    who_info[living].sequence = who_sequence
-                    who_info[living].previous_word = previous_word
+                    who_info[named_living].sequence = who_sequence
+                    who_info[named_living].previous_word = previous_word
                     who_sequence += 1
-                    who_list.append(living)
-                elif living in who_info:
-                    del who_info[living]
-                    who_list.remove(living)
+                    who_list.append(named_living)
+                elif named_living in who_info:
+                    del who_info[named_living]
+                    who_list.remove(named_living)
                 arg_words.append(word)
                 previous_word = None
                 continue
-            if word in all_items:
-                item = all_items[word]
+            item = find_item(word)
+            if item is not None:
                 if include_flag:
                     who_info[item].sequence = who_sequence
                     who_info[item].previous_word = previous_word
@@ -2165,7 +2978,7 @@ class Soul:
                         next(words_enumerator)
                         wordcount -= 1
                     continue
-            item_or_living, full_name, wordcount = self.check_name_with_spaces(words, index, all_livings, all_items, {})
+            item_or_living, full_name, wordcount = self.match_name_with_spaces(words, index, [all_livings, inventory, room_items])
             if item_or_living:
                 while wordcount > 1:
                     next(words_enumerator)
@@ -2190,12 +3003,10 @@ class Soul:
             if word not in self._skip_words:
                 # unrecognized word, check if it could be a person's name or an item. (prefix)
                 if not who_list:
-                    for name in all_livings:
-                        if name.startswith(word):
-                            raise ParseError("Perhaps you meant %s?" % name)
-                    for name in all_items:
-                        if name.startswith(word):
-                            raise ParseError("Perhaps you meant %s?" % name)
+                    for names in (all_livings, room_items, inventory):
+                        prefixed_name = names.first_name_with_prefix(word)
+                        if prefixed_name:
+                            raise ParseError("Perhaps you meant %s?" % prefixed_name)
                 if not external_verb:
                     if not verb:
                         raise UnknownVerbException(word, words, qualifier)
@@ -2316,6 +3127,22 @@ class Soul:
             return False
         return True
 
+    def match_name_with_spaces(self, words: Sequence[str], startindex: int, indexes: Sequence[NameIndexedSet]) \
+            -> Tuple[Optional[ParsedWhoType], str, int]:
+        """
+        Searches for a name used in sentence where the name consists of multiple words (separated by space).
+        Like check_name_with_spaces, but uses the word tries of the name indexes (in the order given)
+        instead of trying ever longer names.
+        The return tuple is (matched_object, matched_name, number of words used in match).
+        If nothing is found, a tuple (None, "", 0) is returned.
+        """
+        best = None, "", 0      # type: Tuple[Optional[ParsedWhoType], str, int]
+        for names in indexes:
+            match = names.match_words(words, startindex)
+            if match[0] is not None and (best[0] is None or match[2] < best[2]):
+                best = match    # type: ignore
+        return best
+
     def check_name_with_spaces(self, words: Sequence[str], startindex: int, all_livings: Dict[str, Living],
                                all_items: Dict[str, Item], all_exits: Dict[str, Exit]) \
             -> Tuple[Optional[ParsedWhoType], str, int]:
@@ -2347,3 +3174,5 @@ class Soul:
 
 _limbo = Location("Limbo", "The intermediate or transitional place or state. There's only nothingness. "
                            "Living beings end up here if they're not in a proper location yet.")
+_location_notifier = LocationNotifier()
+location_notifications.subscribe(_location_notifier)
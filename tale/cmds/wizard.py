@@ -7,8 +7,10 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 
 import datetime
 import gc
+import heapq
 import importlib
 import inspect
+import itertools
 import os
 import platform
 import sys
@@ -226,8 +228,8 @@ def do_teleport(player: Player, parsed: base.ParseResult, ctx: util.Context) ->
 '!teleport .module.path.to.creature' teleports that creature to your location.
 '!teleport_to .module.path.to.object' teleports you to that location or creature's location.
 '!teleport_to zones.zonename.locationname' teleports you to the given location in a zone from the story.
-'!teleport playername' teleports that player to your location.
-'!teleport_to playername' teleports you to the location of that player.
+'!teleport playername' teleports that player (or else, a creature with that name) to your location.
+'!teleport_to playername' teleports you to the location of that player (or else, of a creature with that name).
 '!teleport_to @start' teleports you to the starting location for wizards."""
     if not parsed.args:
         raise ActionRefused("Teleport what to where?")
@@ -265,7 +267,11 @@ def do_teleport(player: Player, parsed: base.ParseResult, ctx: util.Context) ->
         else:
             target = ctx.driver.search_player(args[0])
             if not target:
-                raise ActionRefused("%s isn't here." % args[0])
+                # not a player, try the other creatures in the world
+                livings = base.MudObjRegistry.by_name(args[0], base.Living)
+                target = next((living for living in livings if living.location is not base._limbo), None)
+                if not target:
+                    raise ActionRefused("%s isn't here." % args[0])
             if teleport_self:
                 teleport_to(player, target.location)
             else:
@@ -388,7 +394,7 @@ def do_debug(player: Player, parsed: base.ParseResult, ctx: util.Context) -> Non
         except (TaleFlowControlException, TaleError):
             pass
     # now, normal non-private attributes
-    for varname, value in sorted(vars(obj).items()):
+    for varname, value in sorted(util.object_vars(obj).items()):
         if not varname.startswith('_'):
             txt.append("<dim>.</>%s<dim>:</> %r" % (varname, value))
     player.tell("\n".join(txt), format=False)
@@ -465,17 +471,24 @@ def do_server(player: Player, parsed: base.ParseResult, ctx: util.Context) -> No
         txt.append("Game time:      %s" % ctx.clock)
     txt.append("Players:        %d" % len(ctx.driver.all_players))
     txt.append("Deferreds:      %d" % len(driver.deferreds))
+    if config.server_tick_budget > 0:
+        txt.append("Tick overloads: %d  (budget %.2f sec, %d deferreds carried over)"
+                   % (driver.tick_overloads, config.server_tick_budget, len(driver.overdue_deferreds)))
     txt.append("Loop tick:      %.1f sec" % config.server_tick_time)
     if config.server_tick_method == TickMethod.TIMER:
         avg_loop_duration = sum(driver.server_loop_durations) / len(driver.server_loop_durations)
         txt.append("Loop duration:  %.2f sec. (avg)" % avg_loop_duration)
     elif config.server_tick_method == TickMethod.COMMAND:
         txt.append("Loop duration:  n/a (command driven)")
+    if driver.tick_profiler.enabled:
+        tick_stats = driver.tick_profiler.phase_timings["total"].stats()
+        txt.append("Tick duration:  %.1f / %.1f / %.1f ms. (p50/p95/p99, see !profile)"
+                   % (tick_stats["p50"] * 1000, tick_stats["p95"] * 1000, tick_stats["p99"] * 1000))
     txt.append("Number of objects:")
-    txt.append("  locations: %d" % len(list(base.MudObjRegistry.all_locations.keys())))
-    txt.append("  livings:   %d" % len(list(base.MudObjRegistry.all_livings.keys())))
-    txt.append("  items:     %d" % len(list(base.MudObjRegistry.all_items.keys())))
-    txt.append("  exits:     %d" % len(list(base.MudObjRegistry.all_exits.keys())))
+    txt.append("  locations: %d" % len(base.MudObjRegistry.all_locations))
+    txt.append("  livings:   %d" % len(base.MudObjRegistry.all_livings))
+    txt.append("  items:     %d" % len(base.MudObjRegistry.all_items))
+    txt.append("  exits:     %d" % len(base.MudObjRegistry.all_exits))
     txt.append("  python:    %d" % len(gc.get_objects()))
     player.tell("\n".join(txt), format=False)
 
@@ -490,27 +503,106 @@ def do_events(player: Player, parsed: base.ParseResult, ctx: util.Context) -> No
     player.tell("Deferreds (%d, showing %d):   (server tick: %.1f sec)  P = periodical" %
                 (len(driver.deferreds), num_shown, config.server_tick_time), end=True)
     txt = ["<ul>  due   <dim>|</><ul>P<dim>|</><ul> function            <dim>|</><ul> owner                       </>"]
-    for d in sorted(driver.deferreds)[:50]:
+    for d in heapq.nsmallest(50, driver.deferreds):
         txt.append("%-7s <dim>|</>%s<dim>|</> %-20s<dim>|</> %s"
                    % (d.when_due(ctx.clock, realtime=True), "*" if d.periodical else " ", d.action, d.owner))
     txt.append("")
     player.tell("\n".join(txt), format=False)
 
 
+@wizcmd("profile")
+def do_profile(player: Player, parsed: base.ParseResult, ctx: util.Context) -> None:
+    """Show the server tick profile: durations of the tick phases, slowest deferreds, and pubsub events per topic.
+'profile json' gives a machine readable dump, 'profile reset' clears the statistics,
+'profile on' and 'profile off' switch the profiler on or off."""
+    profiler = ctx.driver.tick_profiler
+    arg = parsed.args[0] if parsed.args else ""
+    if arg == "reset":
+        profiler.reset()
+        player.tell("Tick profile statistics have been reset.")
+        return
+    elif arg in ("on", "off"):
+        profiler.enabled = arg == "on"
+        player.tell("Tick profiler is %s." % ("enabled" if profiler.enabled else "disabled"))
+        return
+    elif arg == "json":
+        player.tell(profiler.dump_json(), format=False)
+        return
+    elif arg:
+        raise ParseError("Invalid argument. Use json, reset, on or off.")
+    player.tell("<bright>Server tick profile</> (since %s, profiler is %s)."
+                % (datetime.datetime.fromtimestamp(profiler.started).replace(microsecond=0),
+                   "enabled" if profiler.enabled else "disabled"), end=True)
+    txt = ["<ul> phase      <dim>|</><ul>   count<dim>|</><ul>p50 ms<dim>|</><ul>p95 ms<dim>|</><ul>p99 ms<dim>|</><ul>max ms</>"]
+    for phase, histogram in profiler.phase_timings.items():
+        stats = histogram.stats()
+        txt.append(" %-10s <dim>|</>%8d<dim>|</>%6.1f<dim>|</>%6.1f<dim>|</>%6.1f<dim>|</>%6.1f"
+                   % (phase, stats["count"], stats["p50"] * 1000, stats["p95"] * 1000, stats["p99"] * 1000, stats["max"] * 1000))
+    txt.append("")
+    txt.append("<ul> slowest deferreds                        <dim>|</><ul>   count<dim>|</><ul>avg ms<dim>|</><ul>max ms</>")
+    for info in profiler.slowest_deferreds(10):
+        txt.append(" %-40.40s <dim>|</>%8d<dim>|</>%6.1f<dim>|</>%6.1f"
+                   % (info["owner"] + "." + info["action"], info["count"], info["total"] / info["count"] * 1000, info["max"] * 1000))
+    txt.append("")
+    txt.append("<ul> pubsub topic                             <dim>|</><ul>  events</>")
+    pubsub_counts = profiler.pubsub_counts()
+    for topicname in sorted(pubsub_counts, key=lambda t: pubsub_counts[t], reverse=True)[:10]:
+        txt.append(" %-40.40s <dim>|</>%8d" % (topicname, pubsub_counts[topicname]))
+    txt.append("")
+    player.tell("\n".join(txt), format=False)
+
+
 @wizcmd("pubsub")
 def do_pubsub(player: Player, parsed: base.ParseResult, ctx: util.Context) -> None:
-    """Give an overview of the pubsub topics."""
+    """Give an overview of the pubsub topics, and the subscribers that are slow to process their events.
+Use 'pubsub reset' to reset the statistics, or 'pubsub topicname' for the subscriber statistics of a topic."""
+    if parsed.args == ["reset"]:
+        pubsub.reset_stats()
+        player.tell("Pubsub statistics have been reset.")
+        return
+    if parsed.args:
+        stats_by_name = {str(name): stats for name, stats in pubsub.stats().items()}
+        wanted_topic = parsed.unparsed.strip()
+        if wanted_topic not in stats_by_name:
+            raise ActionRefused("There's no topic with that name.")
+        topic_stats = stats_by_name[wanted_topic]
+        player.tell("<bright>Pubsub topic '%s'.</> %d sent, %d processed, %d pending, %d not yet, %d dropped." %
+                    (wanted_topic, topic_stats["sent"], topic_stats["processed"], topic_stats["pending"],
+                     topic_stats["notyet"], topic_stats["dropped"]))
+        txt = ["<ul>  subscriber                              <dim>|</><ul> events <dim>|</>"
+               "<ul>avg msec<dim>|</><ul>max msec<dim>|</><ul>slow</>"]
+        for name, subber_stats in sorted(topic_stats["subscribers"].items(), key=lambda item: -item[1]["total_time"]):
+            txt.append("%-40.40s <dim>|</> %6d <dim>|</> %6.3f <dim>|</> %6.3f <dim>|</> %d" %
+                       (name, subber_stats["events"], subber_stats["avg_time"] * 1000, subber_stats["max_time"] * 1000,
+                        subber_stats["slow_events"]))
+        txt.append("")
+        player.tell("\n".join(txt), format=False)
+        return
     pending = pubsub.pending()
+    all_stats = pubsub.stats()
     player.tell("<bright>Pending pubsub messages overview.</> Active topics (from %d total):" % len(pending))
     total_pending = 0
-    txt = ["<ul>  topic                                            <dim>|</><ul>#pending<dim>|</><ul>idle sec.<dim>|</><ul>subs</>"]
+    txt = ["<ul>  topic                                            <dim>|</><ul>#pending<dim>|</><ul>idle sec.<dim>|</>"
+           "<ul>subs<dim>|</><ul>  sent<dim>|</><ul>processed</>"]
     for topic in sorted(pending, key=lambda t: str(t)):
         num_pending, idle_time, subbers = pending[topic]
         total_pending += num_pending
         if num_pending or subbers or idle_time < 10:
-            txt.append("%-50.50s <dim>|</>  %3d   <dim>|</>  %4d   <dim>|</> %d" % (topic, num_pending, int(idle_time), subbers))
+            sent = all_stats[topic]["sent"] if topic in all_stats else 0
+            processed = all_stats[topic]["processed"] if topic in all_stats else 0
+            txt.append("%-50.50s <dim>|</>  %3d   <dim>|</>  %4d   <dim>|</> %3d<dim>|</>%6d<dim>|</> %d" %
+                       (topic, num_pending, int(idle_time), subbers, sent, processed))
     txt.append(("total pending:  " + str(total_pending)).rjust(56))
     txt.append("")
+    slow = pubsub.slow_subscribers()
+    if slow:
+        txt.append("<bright>Slow subscribers</> (more than %.1f msec per event):" % (pubsub.slow_subscriber_threshold * 1000))
+        txt.append("<ul>  topic                        <dim>|</><ul>  subscriber                    <dim>|</>"
+                   "<ul>max msec<dim>|</><ul>slow events</>")
+        for topicname, name, subber_stats in slow:
+            txt.append("%-30.30s <dim>|</> %-30.30s <dim>|</> %6.1f <dim>|</> %d" %
+                       (topicname, name, subber_stats["max_time"] * 1000, subber_stats["slow_events"]))
+        txt.append("")
     player.tell("\n".join(txt), format=False)
 
 
@@ -538,11 +630,8 @@ def do_force(player: Player, parsed: base.ParseResult, ctx: util.Context) -> Non
     # re-parse and execute the actual command for the target, from the viewpoint of the current player!
     # This duplicates some code from the driver (which executes it on the player's behalf)
     # but here we execute it on the target's behalf (and not support all possibilities)
-    custom_verbs = set(ctx.driver.current_custom_verbs(target))
-    command_verbs = set(ctx.driver.current_verbs(target))
-    all_verbs = custom_verbs | command_verbs
     try:
-        target_parsed = target.parse(cmd, all_verbs)
+        target_parsed = target.parse(cmd, ctx.driver.recognised_verbs(target))
         # simple soul emote, deal with it by socializing
         # async: topic_pending_actions.send(lambda: target.do_socialize_cmd(target_parsed))
         target.do_socialize_cmd(target_parsed)
@@ -642,7 +731,8 @@ def do_ban_unban_player(player: Player, parsed: base.ParseResult, ctx: util.Cont
 def do_show_vnum(player: Player, parsed: base.ParseResult, ctx: util.Context) -> None:
     """Show the vnum of a location (.) or an object/living,
     or when you provide a vnum as arg, show the object(s) with that vnum.
-    Special arguments: items/livings/locations/exits to show the known vnums of that class of objects.
+    Special arguments: items/livings/locations/exits to show the known vnums of that class of objects
+    (100 at a time, add a vnum to continue the list from that vnum onwards).
     """
     if not parsed.args:
         raise ParseError("From what should I show the vnum?")
@@ -652,28 +742,37 @@ def do_show_vnum(player: Player, parsed: base.ParseResult, ctx: util.Context) ->
     elif parsed.who_count:
         obj = parsed.who_1
     elif name in {"items", "livings", "locations", "exits"}:
+        try:
+            start_vnum = int(parsed.args[1]) if len(parsed.args) > 1 else 0
+        except ValueError as x:
+            raise ActionRefused(str(x))
         player.tell("All known " + name + ": (limiting to 100)", end=True)
         count = 0
+        listing = base.MudObjRegistry.listing(getattr(base.MudObjRegistry, "all_" + name), start_vnum)
         if name == "items":
-            for vnum, item in list(base.MudObjRegistry.all_items.items())[:100]:
+            for vnum, item in itertools.islice(listing, 100):
                 location = "%s, #%d" % (item.location.name, item.location.vnum) if item.location else ""
                 player.tell("%d - %s  (%s)" % (vnum, item.name, location), end=True)
                 count += 1
         elif name == "livings":
-            for vnum, living in list(base.MudObjRegistry.all_livings.items())[:100]:
+            for vnum, living in itertools.islice(listing, 100):
                 location = "%s, #%d" % (living.location.name, living.location.vnum) if living.location else ""
                 is_player = "[player]" if isinstance(living, Player) else ""
                 player.tell("%d - %s  %s (%s)" % (vnum, living.name, is_player, location), end=True)
                 count += 1
         elif name == "locations":
-            for vnum, loc in list(base.MudObjRegistry.all_locations.items())[:100]:
+            for vnum, loc in itertools.islice(listing, 100):
                 player.tell("%d - %s" % (vnum, loc.name), end=True)
                 count += 1
         elif name == "exits":
-            for vnum, exit in list(base.MudObjRegistry.all_exits.items())[:100]:
+            for vnum, exit in itertools.islice(listing, 100):
                 player.tell("%d - %s, target: %s" % (vnum, exit.name, exit.target.name), end=True)
                 count += 1
-        player.tell("Count: %d" % count)
+        next_vnum = next(listing, (None, None))[0]
+        if next_vnum is None:
+            player.tell("Count: %d" % count)
+        else:
+            player.tell("Count: %d  (there's more, continue with: vnum %s %d)" % (count, name, next_vnum))
         return
     else:
         try:
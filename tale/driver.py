@@ -10,6 +10,7 @@ import datetime
 import heapq
 import importlib
 import inspect
+import itertools
 import os
 import pathlib
 import pkgutil
@@ -17,22 +18,23 @@ import random
 import sys
 import threading
 import time
-from functools import total_ordering
+from functools import total_ordering, lru_cache
 from types import ModuleType
-from typing import Sequence, Union, Tuple, Any, Dict, Callable, Iterable, Generator, Set, List, MutableSequence, Optional
+from typing import Sequence, Union, Tuple, Any, Dict, Callable, Iterable, Iterator, Generator, Set, FrozenSet, List, \
+    MutableSequence, Optional
 
 import appdirs
 
 from . import __version__ as tale_version_str, _check_required_libraries
-from . import mud_context, errors, util, cmds, player, pubsub, charbuilder, lang, verbdefs, vfs, base
+from . import mud_context, errors, util, cmds, player, pubsub, charbuilder, lang, verbdefs, vfs, base, profiler, replay
 from .story import TickMethod, GameMode, MoneyType, StoryBase
 from .tio import DEFAULT_SCREEN_WIDTH
 from .races import playable_races
 from .errors import StoryCompleted
 
 
-topic_pending_actions = pubsub.topic("driver-pending-actions")
-topic_pending_tells = pubsub.topic("driver-pending-tells")
+topic_pending_actions = base.pending_actions
+topic_pending_tells = base.pending_tells
 topic_async_dialogs = pubsub.topic("driver-async-dialogs")
 
 
@@ -43,6 +45,9 @@ class Commands:
     def __init__(self) -> None:
         self.commands_per_priv = {"": {}}    # type: Dict[str, Dict[str, Callable]]
         self.no_soul_parsing = set()   # type: Set[str]
+        # the merged command tables, help texts and prefix indexes, per set of privileges:
+        self._cache = {}    # type: Dict[FrozenSet[str], Tuple[Dict[str, Callable], Dict[str, str], util.PrefixIndex]]
+        self._spelling = {}     # type: Dict[FrozenSet[str], util.SpellingIndex]  # created when they're needed
 
     def add(self, verb: str, func: Callable, privilege: str="") -> None:
         self.validatefunc(func)
@@ -50,12 +55,15 @@ class Commands:
             if verb in commands:
                 raise ValueError("command defined more than once: " + verb)
         self.commands_per_priv.setdefault(privilege, {})[verb] = func
+        self._cache.clear()
+        self._spelling.clear()
 
     def override(self, verb: str, func: Callable, privilege: str="") -> Callable:
         self.validatefunc(func)
         if verb in self.commands_per_priv[privilege]:
             existing = self.commands_per_priv[privilege][verb]
             self.commands_per_priv[privilege][verb] = func
+            self._cache.clear()
             return existing
         raise LookupError("command not defined: " + verb)
 
@@ -64,16 +72,46 @@ class Commands:
             raise ValueError("the function '%s' is not a proper command function (did you forget the decorator?)" % func.__name__)
 
     def get(self, privileges: Iterable[str]) -> Dict[str, Callable]:
-        result = dict(self.commands_per_priv[""])  # always include the cmds for empty privilege
-        for priv in privileges:
-            if priv in self.commands_per_priv:
-                result.update(self.commands_per_priv[priv])
-        return result
+        """The commands available with the given privileges. The result is shared, don't modify it."""
+        return self._merged(privileges)[0]
+
+    def helptexts(self, privileges: Iterable[str]) -> Dict[str, str]:
+        """The help texts of the commands available with the given privileges. The result is shared, don't modify it."""
+        return self._merged(privileges)[1]
+
+    def with_prefix(self, privileges: Iterable[str], prefix: str) -> List[str]:
+        """The sorted verbs of the commands available with the given privileges, that start with the given prefix."""
+        return self._merged(privileges)[2].with_prefix(prefix)
+
+    def by_spelling(self, privileges: Iterable[str], word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        The verbs of the commands available with the given privileges, that are within the edit distance
+        of the given (misspelled) word, as (distance, verb) tuples.
+        """
+        key = privileges if isinstance(privileges, frozenset) else frozenset(privileges)
+        spelling = self._spelling.get(key)
+        if spelling is None:
+            spelling = self._spelling[key] = util.SpellingIndex(self._merged(key)[0], max_distance=2)
+        return spelling.suggest(word, max_distance)
+
+    def _merged(self, privileges: Iterable[str]) -> Tuple[Dict[str, Callable], Dict[str, str], util.PrefixIndex]:
+        key = privileges if isinstance(privileges, frozenset) else frozenset(privileges)
+        merged = self._cache.get(key)
+        if merged is None:
+            commands = dict(self.commands_per_priv[""])  # always include the cmds for empty privilege
+            for priv in key:
+                if priv in self.commands_per_priv:
+                    commands.update(self.commands_per_priv[priv])
+            helptexts = {verb: (func.__doc__ or "") for verb, func in commands.items()}
+            merged = self._cache[key] = commands, helptexts, util.PrefixIndex(commands)
+        return merged
 
     def adjust_available_commands(self, server_mode: GameMode) -> None:
         # disable commands flagged with the given game_mode
         # disable soul verbs flagged with override
         # mark non-soul commands
+        self._cache.clear()
+        self._spelling.clear()
         for commands in self.commands_per_priv.values():
             for cmd, func in list(commands.items()):
                 disabled_mode = getattr(func, "disabled_in_mode", None)
@@ -85,6 +123,57 @@ class Commands:
                     self.no_soul_parsing.add(cmd)
 
 
+class RecognisedVerbs:
+    """
+    The verbs that a player can use next to the soul verbs: the commands for the player's privileges,
+    and the custom verbs of the player, its inventory and its surroundings. Supports only the 'in' test,
+    so the parser can check verbs without copying and merging all those verb dicts on every command.
+    """
+    __slots__ = ("driver", "player", "commands")
+
+    def __init__(self, driver: 'Driver', player: player.Player, commands: Optional[Dict[str, Callable]]=None) -> None:
+        self.driver = driver
+        self.player = player
+        self.commands = driver.commands.get(player.privileges) if commands is None else commands
+
+    def __contains__(self, verb: object) -> bool:
+        return verb in self.commands or (isinstance(verb, str) and self.driver.is_custom_verb(self.player, verb))
+
+    def __bool__(self) -> bool:
+        return True
+
+    @property
+    def parse_cache_token(self) -> Dict[str, Callable]:
+        # the parse cache of the soul can reuse results while this remains the same object.
+        # (the custom verbs are covered by the version stamps of the player's surroundings and inventory)
+        return self.commands
+
+
+@lru_cache(maxsize=4096)
+def _accepts_ctx(function: Callable) -> bool:
+    # inspecting the signature is slow, so the result is cached per (unbound) function
+    return "ctx" in inspect.signature(function).parameters
+
+
+class DispatchDescriptor:
+    """
+    The resolved action of a Deferred: the actual callable, if it wants a 'ctx' argument,
+    and if it is a function decorated with @call_periodically.
+    It is created once, the first time the deferred is called, and is never serialized.
+    """
+    __slots__ = ("func", "wants_ctx", "marked_periodical")
+
+    def __init__(self, func: Callable) -> None:
+        self.func = func
+        self.wants_ctx = _accepts_ctx(getattr(func, "__func__", func))
+        self.marked_periodical = hasattr(func, "_tale_periodically")
+
+    @property
+    def still_periodical(self) -> bool:
+        """a function that was decorated with @call_periodically, can be switched off later"""
+        return not self.marked_periodical or bool(self.func._tale_periodically)     # type: ignore
+
+
 @total_ordering
 class Deferred:
     """
@@ -97,6 +186,9 @@ class Deferred:
     The due time is given in Game Time, not in real/wall time!
     Note that the vargs/kwargs should be serializable or savegames are impossible!
     """
+    __slots__ = ("due_gametime", "owner", "action", "vargs", "kwargs", "periodical", "_dispatch")
+    serialized_attributes = ("due_gametime", "owner", "action", "vargs", "kwargs", "periodical")
+
     def __init__(self, due_gametime: datetime.datetime, action: Callable, vargs: Sequence[Any], kwargs: Dict[str, Any],
                  *, periodical: Tuple[float, float]=None) -> None:
         assert isinstance(due_gametime, datetime.datetime)
@@ -126,6 +218,7 @@ class Deferred:
         self.vargs = vargs
         self.kwargs = kwargs
         self.periodical = periodical
+        self._dispatch = None   # type: Optional[DispatchDescriptor]
 
     def __eq__(self, other):
         if self.__class__ == other.__class__:
@@ -149,40 +242,274 @@ class Deferred:
             secs = int(secs / game_clock.times_realtime)
         return datetime.timedelta(seconds=secs)
 
-    def __call__(self, *args: Any, **kwargs: Any) -> None:
-        self.kwargs = self.kwargs or {}
-        if callable(self.action):
-            func = self.action
-        else:
+    def resolve(self) -> DispatchDescriptor:
+        """Obtain the actual function to call. The result is cached in the deferred."""
+        if self._dispatch is None:
             # deferred action is stored as the name of the function to call,
             # so we need to obtain the actual function from the owner object.
             if isinstance(self.owner, str):
                 if self.owner.startswith("module:"):
                     # the owner refers to a module
-                    self.owner = sys.modules[self.owner[7:]]
+                    owner = sys.modules[self.owner[7:]]     # type: Any
                 else:
                     raise RuntimeError("invalid owner specifier: " + self.owner)
-            func = getattr(self.owner, self.action)
-        if self.periodical and hasattr(func, "_tale_periodically") and not func._tale_periodically:     # type: ignore
-            return  # no longer marked as periodical
-        if "ctx" in inspect.signature(func).parameters:
-            self.kwargs["ctx"] = kwargs["ctx"]  # add a 'ctx' keyword argument to the call for convenience
-        func(*self.vargs, **self.kwargs)
-        if self.periodical and (not hasattr(func, "_tale_periodically") or func._tale_periodically):    # type: ignore
+            else:
+                owner = self.owner
+            self._dispatch = DispatchDescriptor(getattr(owner, self.action))
+        return self._dispatch
+
+    def invoke(self, ctx: util.Context) -> bool:
+        """
+        Calls the action. For periodicals, a new due time is calculated.
+        Returns True if the deferred has to be put back in the queue, it is up to the caller to do that.
+        """
+        dispatch = self.resolve()
+        if self.periodical and not dispatch.still_periodical:
+            return False   # no longer marked as periodical
+        if dispatch.wants_ctx:
+            # add a 'ctx' keyword argument to the call for convenience
+            if self.kwargs:
+                dispatch.func(*self.vargs, ctx=ctx, **self.kwargs)
+            else:
+                dispatch.func(*self.vargs, ctx=ctx)
+        elif self.kwargs:
+            dispatch.func(*self.vargs, **self.kwargs)
+        else:
+            dispatch.func(*self.vargs)
+        if self.periodical and dispatch.still_periodical:
             # reschedule the same call!
             assert self.periodical[0] > 0 and self.periodical[1] > 0
             due = random.uniform(self.periodical[0], self.periodical[1])
-            self.due_gametime = mud_context.driver.game_clock.plus_realtime(datetime.timedelta(seconds=due))
-            if "ctx" in self.kwargs:
-                del self.kwargs["ctx"]    # will be passed in again next call by driver, and required to remove because not serializable
-            mud_context.driver._enqueue_deferred(self)  # reschedule!
+            clock = ctx.clock if ctx.clock is not None else mud_context.driver.game_clock
+            self.due_gametime = clock.plus_realtime(datetime.timedelta(seconds=due))
+            return True
             # note: when owner is deleted/destroyed, it must make sure that any deferreds from it are removed from the queue!
+        # our lifetime has ended, remove references asap:
+        del self.owner
+        del self.action
+        del self.kwargs
+        del self.vargs
+        self._dispatch = None
+        return False
+
+    def __call__(self, *args: Any, **kwargs: Any) -> None:
+        if self.invoke(kwargs["ctx"]):
+            mud_context.driver._enqueue_deferred(self)  # reschedule!
+
+
+class DeferredScheduler:
+    """
+    Base class for the scheduler that holds the pending Deferreds of the driver.
+    It is not thread safe by itself; the driver guards it with its deferreds_lock.
+    """
+    def push(self, deferred: Deferred) -> None:
+        raise NotImplementedError("implement this in subclass")
+
+    def pop_due(self, now: datetime.datetime) -> List[Deferred]:
+        """Removes and returns all deferreds that are due at the given game time, in order of their due time."""
+        raise NotImplementedError("implement this in subclass")
+
+    def remove_owner(self, owner: Any) -> None:
+        """Removes all deferreds that belong to the given owner object."""
+        raise NotImplementedError("implement this in subclass")
+
+    def clear(self) -> None:
+        raise NotImplementedError("implement this in subclass")
+
+    def __len__(self) -> int:
+        raise NotImplementedError("implement this in subclass")
+
+    def __iter__(self) -> Iterator[Deferred]:
+        """Iterates over all pending deferreds (in no particular order)"""
+        raise NotImplementedError("implement this in subclass")
+
+
+class HeapqDeferredScheduler(DeferredScheduler):
+    """
+    Simple scheduler that keeps the deferreds in a heapq.
+    Removing the deferreds of an owner is O(n) because the heap has to be rebuilt.
+    """
+    def __init__(self) -> None:
+        self.heap = []   # type: List[Deferred]
+
+    def push(self, deferred: Deferred) -> None:
+        heapq.heappush(self.heap, deferred)
+
+    def pop_due(self, now: datetime.datetime) -> List[Deferred]:
+        due = []
+        while self.heap and self.heap[0].due_gametime <= now:
+            due.append(heapq.heappop(self.heap))
+        return due
+
+    def remove_owner(self, owner: Any) -> None:
+        self.heap = [d for d in self.heap if d.owner is not owner]
+        heapq.heapify(self.heap)
+
+    def clear(self) -> None:
+        self.heap = []
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __iter__(self) -> Iterator[Deferred]:
+        return iter(self.heap)
+
+
+class TimingWheelDeferredScheduler(DeferredScheduler):
+    """
+    Hierarchical timing wheel, keyed on game time ticks of a fixed resolution.
+    Every level has 64 slots, a slot on level N spans 64**N ticks. Deferreds that
+    are too far in the future for the wheels sit in an overflow slot.
+    When time advances, the level 0 slots are swept and the higher level slots are
+    cascaded down into the lower levels as their time comes near.
+    A per-owner index makes removing the deferreds of an owner O(1) per deferred.
+    """
+    slot_bits = 6
+    num_slots = 1 << slot_bits
+    num_levels = 4
+    origin = datetime.datetime(1, 1, 1)
+
+    def __init__(self, resolution: datetime.timedelta=datetime.timedelta(seconds=1)) -> None:
+        self.resolution = resolution
+        self.clear()
+
+    def clear(self) -> None:
+        self.wheels = [[{} for _ in range(self.num_slots)] for _ in range(self.num_levels)]  # type: List[List[Dict[int, Deferred]]]
+        self.level_counts = [0] * self.num_levels
+        self.overflow = {}     # type: Dict[int, Deferred]  # too far in the future to fit in the wheels
+        self.expired = {}      # type: Dict[int, Deferred]  # already due when they were added
+        self.current_tick = None   # type: Optional[int]   # the first tick that hasn't been swept yet
+        self.slot_of = {}      # type: Dict[int, Tuple[Dict[int, Deferred], int]]  # id(deferred) -> (slot, level)
+        self.by_owner = {}     # type: Dict[int, Dict[int, Deferred]]  # id(owner) -> deferreds of that owner
+
+    def set_resolution(self, resolution: datetime.timedelta, now: Optional[datetime.datetime]=None) -> None:
+        """
+        Change the duration of a single tick, and optionally the current game time that the wheel starts at.
+        (if not given, the due time of the first deferred that is added is used for that).
+        Only possible while the scheduler is empty.
+        """
+        if self.slot_of:
+            raise errors.TaleError("can't change the timing wheel resolution when it contains deferreds")
+        if resolution <= datetime.timedelta(0):
+            raise ValueError("resolution must be positive")
+        self.resolution = resolution
+        self.current_tick = None if now is None else self._tick_of(now)
+
+    def _tick_of(self, moment: datetime.datetime) -> int:
+        return (moment - self.origin) // self.resolution
+
+    def __len__(self) -> int:
+        return len(self.slot_of)
+
+    def __iter__(self) -> Iterator[Deferred]:
+        for owner_deferreds in list(self.by_owner.values()):
+            yield from list(owner_deferreds.values())
+
+    def push(self, deferred: Deferred) -> None:
+        owner_deferreds = self.by_owner.setdefault(id(deferred.owner), {})
+        owner_deferreds[id(deferred)] = deferred
+        tick = self._tick_of(deferred.due_gametime)
+        if self.current_tick is None:
+            self.current_tick = tick
+        self._place(deferred, tick)
+
+    def _place(self, deferred: Deferred, tick: int) -> None:
+        assert self.current_tick is not None, "the current tick is set by the first push"
+        delta = tick - self.current_tick
+        if delta < 0:
+            slot, level = self.expired, -1
+        else:
+            for level in range(self.num_levels):
+                if delta < 1 << (self.slot_bits * (level + 1)):
+                    slot = self.wheels[level][(tick >> (self.slot_bits * level)) & (self.num_slots - 1)]
+                    self.level_counts[level] += 1
+                    break
+            else:
+                slot, level = self.overflow, self.num_levels
+        slot[id(deferred)] = deferred
+        self.slot_of[id(deferred)] = (slot, level)
+
+    def _unlink(self, deferred: Deferred) -> None:
+        slot, level = self.slot_of.pop(id(deferred))
+        del slot[id(deferred)]
+        if 0 <= level < self.num_levels:
+            self.level_counts[level] -= 1
+        owner_deferreds = self.by_owner[id(deferred.owner)]
+        del owner_deferreds[id(deferred)]
+        if not owner_deferreds:
+            del self.by_owner[id(deferred.owner)]
+
+    def remove_owner(self, owner: Any) -> None:
+        for deferred in list(self.by_owner.get(id(owner), {}).values()):
+            self._unlink(deferred)
+
+    def _cascade(self, level: int) -> None:
+        # move the deferreds of the current slot on the given level, down into the lower levels
+        assert self.current_tick is not None
+        if level == self.num_levels:
+            slot = self.overflow
         else:
-            # our lifetime has ended, remove references asap:
-            del self.owner
-            del self.action
-            del self.kwargs
-            del self.vargs
+            slot = self.wheels[level][(self.current_tick >> (self.slot_bits * level)) & (self.num_slots - 1)]
+            self.level_counts[level] -= len(slot)
+        deferreds = list(slot.values())
+        slot.clear()
+        for deferred in deferreds:
+            self._place(deferred, self._tick_of(deferred.due_gametime))
+
+    def pop_due(self, now: datetime.datetime) -> List[Deferred]:
+        # deferreds that were added with a tick before the current tick, are not always due yet
+        # (the very first deferred that is added determines the starting tick)
+        due = [d for d in self.expired.values() if d.due_gametime <= now]
+        for deferred in due:
+            self._unlink(deferred)
+        now_tick = self._tick_of(now)
+        if self.current_tick is None or not self.slot_of:
+            self.current_tick = now_tick
+        mask = self.num_slots - 1
+        while self.current_tick <= now_tick:
+            # skip ahead to the next slot boundary if the lower levels are empty
+            skip_level = 0
+            while skip_level < self.num_levels and not self.level_counts[skip_level]:
+                skip_level += 1
+            if skip_level == self.num_levels and not self.overflow:
+                self.current_tick = now_tick
+                break
+            if skip_level > 0:
+                boundary = (self.current_tick | ((1 << (self.slot_bits * skip_level)) - 1)) + 1
+                if boundary > now_tick:
+                    # nothing can become due before that boundary
+                    self.current_tick = now_tick
+                    break
+                self.current_tick = boundary
+                self._cascade_at_boundary()
+                continue
+            slot = self.wheels[0][self.current_tick & mask]
+            if self.current_tick == now_tick:
+                # the final tick might only be partially due
+                swept = [d for d in slot.values() if d.due_gametime <= now]
+            else:
+                swept = list(slot.values())
+            for deferred in swept:
+                self._unlink(deferred)
+            due.extend(swept)
+            if self.current_tick == now_tick:
+                break
+            self.current_tick += 1
+            if not self.current_tick & mask:
+                self._cascade_at_boundary()
+        due.sort(key=lambda d: d.due_gametime)
+        return due
+
+    def _cascade_at_boundary(self) -> None:
+        # the current tick just crossed into a new level 1 slot (or higher), cascade those slots down, highest level first.
+        assert self.current_tick is not None
+        levels = []
+        for level in range(1, self.num_levels + 1):
+            if self.current_tick & ((1 << (self.slot_bits * level)) - 1):
+                break
+            levels.append(level)
+        for level in reversed(levels):
+            self._cascade(level)
 
 
 class Driver(pubsub.Listener):
@@ -191,14 +518,22 @@ class Driver(pubsub.Listener):
     Reads story file and config, initializes game state.
     Handles main game loop, player connections, and loading/saving of game state.
     """
+    deferred_scheduler = TimingWheelDeferredScheduler     # type: Callable[[], DeferredScheduler]
+
     def __init__(self) -> None:
         self.unbound_exits = []    # type: List[base.Exit]
-        self.deferreds = []   # type: List[Deferred]  # heapq
+        self.deferreds = self.deferred_scheduler()   # type: DeferredScheduler
         self.deferreds_lock = threading.Lock()
+        self.overdue_deferreds = []   # type: List[Deferred]  # due deferreds that didn't fit in the tick budget
+        self.tick_overloads = 0       # how many times the tick budget was exceeded
+        self.server_ticks = 0         # number of server ticks done so far
+        self.random_seed = None       # type: Optional[int]   # seed the random generator with this (for deterministic replays)
+        self.command_recorder = None  # type: Optional[replay.CommandRecorder]
         self.server_started = datetime.datetime.now().replace(microsecond=0)
         self.server_loop_durations = collections.deque(maxlen=10)    # type: MutableSequence[float]
+        self.tick_profiler = profiler.TickProfiler()
         self.commands = Commands()
-        self.all_players = {}   # type: Dict[str, player.PlayerConnection]  # maps playername to player connection object
+        self.all_players = {}   # type: Dict[str, player.PlayerConnection]  # maps (lowercase) playername to player connection object
         self.zones = None       # type: ModuleType
         self.moneyfmt = None    # type: Optional[util.MoneyFormatter]
         self.resources = None   # type: vfs.VirtualFileSystem
@@ -222,6 +557,10 @@ class Driver(pubsub.Listener):
     def start(self, game_file_or_path: str) -> None:
         """Start the driver from a parsed set of arguments"""
         _check_required_libraries()
+        if self.command_recorder and self.random_seed is None:
+            self.random_seed = self.command_recorder.seed
+        if self.random_seed is not None:
+            random.seed(self.random_seed)
         gamepath = pathlib.Path(game_file_or_path)
         if gamepath.is_dir():
             # cd into the game directory (we can import it then), and load its config and zones
@@ -268,6 +607,7 @@ class Driver(pubsub.Listener):
                 cmds.clear_registered_commands()
         self.commands.adjust_available_commands(self.story.config.server_mode)
         self.game_clock = util.GameDateTime(self.story.config.epoch or self.server_started, self.story.config.gametime_to_realtime)
+        self._configure_deferred_scheduler()
         self.moneyfmt = None
         if self.story.config.money_type != MoneyType.NOTHING:
             self.moneyfmt = util.MoneyFormatter.create_for(self.story.config.money_type)
@@ -303,6 +643,8 @@ class Driver(pubsub.Listener):
             x._bind_target(self.zones)
         self.unbound_exits = []
         sys.excepthook = util.excepthook  # install custom verbose crash reporter
+        if self.command_recorder:
+            self.command_recorder.start(self)
         self.start_main_loop()   # doesn't exit! (unless game is killed)
         self._stop_driver()
 
@@ -317,8 +659,8 @@ class Driver(pubsub.Listener):
         # (it may or may not run in a background thread depending on the driver mode)
         # The wrapper is for error handling only.
         self._stop_mainloop = False
-        num_critical_errors = 0
-        time_of_last_critical_error = 0.0
+        self._num_critical_errors = 0
+        self._time_of_last_critical_error = 0.0
         while not self._stop_mainloop:
             try:
                 self.main_loop(conn)
@@ -333,20 +675,23 @@ class Driver(pubsub.Listener):
                     print(x)
                     continue
             except Exception:
-                # other exceptions are logged but don't break the server loop (hopefully the game can continue)
-                # @todo only print it to the player that caused the error (if possible) + to the error log
-                num_critical_errors += 1
-                last, time_of_last_critical_error = time_of_last_critical_error, time.time()
-                if time_of_last_critical_error - last > 1.0:
-                    num_critical_errors = 1  # reset critical error count due to low frequency
-                if num_critical_errors > 10:
-                    msg = "aborting driver main loop due to excessive number of critical errors"
-                    sys.stderr.write(msg + "\n\n")
-                    self._stop_driver()
-                    raise errors.TaleError(msg)
-                print("ERROR IN DRIVER MAINLOOP:\n", "".join(util.format_traceback()), file=sys.stderr)
-                for conn in self.all_players.values():
-                    conn.critical_error()
+                self._main_loop_critical_error()
+
+    def _main_loop_critical_error(self) -> None:
+        # other exceptions are logged but don't break the server loop (hopefully the game can continue)
+        # @todo only print it to the player that caused the error (if possible) + to the error log
+        self._num_critical_errors += 1
+        last, self._time_of_last_critical_error = self._time_of_last_critical_error, time.time()
+        if self._time_of_last_critical_error - last > 1.0:
+            self._num_critical_errors = 1  # reset critical error count due to low frequency
+        if self._num_critical_errors > 10:
+            msg = "aborting driver main loop due to excessive number of critical errors"
+            sys.stderr.write(msg + "\n\n")
+            self._stop_driver()
+            raise errors.TaleError(msg)
+        print("ERROR IN DRIVER MAINLOOP:\n", "".join(util.format_traceback()), file=sys.stderr)
+        for conn in self.all_players.values():
+            conn.critical_error()
 
     def main_loop(self, conn: Optional[player.PlayerConnection]):
         raise NotImplementedError
@@ -361,8 +706,40 @@ class Driver(pubsub.Listener):
             conn.write_output()
             conn.destroy()
         self.all_players.clear()
+        if self.command_recorder:
+            self.command_recorder.close()
         time.sleep(0.1)
 
+    def _answer_dialog(self, conn: player.PlayerConnection) -> bool:
+        """
+        Continue the async dialog that waits for input of the player, with the line the player entered.
+        Returns False if the validator rejected the answer (the question is asked again).
+        (The answer is recorded in the command log, unless it's not echoed such as a password.)
+        """
+        dialog, validator, echo_input = self.waiting_for_input.pop(conn)
+        answer = response = conn.player.get_pending_input()[0]
+        recorder = self.command_recorder
+        if recorder and echo_input and conn.player.name in recorder.known_players:
+            output_before = conn.player._output.text()
+        else:
+            recorder = None
+        try:
+            if validator:
+                try:
+                    response = validator(response)
+                except ValueError as x:
+                    prompt = conn.last_output_line
+                    conn.io.dont_echo_next_cmd = not echo_input
+                    conn.output(str(x) or "That is not a valid answer.")
+                    conn.output_no_newline(prompt)   # print the input prompt again
+                    self.waiting_for_input[conn] = (dialog, validator, echo_input)   # reschedule
+                    return False
+            self._continue_dialog(conn, dialog, response)
+            return True
+        finally:
+            if recorder:
+                recorder.answer(self.server_ticks, conn.player, answer, output_before)
+
     def _continue_dialog(self, conn: player.PlayerConnection, dialog: Generator, message: str) -> None:
         # Notice that the try...except structure is very similar to
         # the one in _server_loop_process_player_input
@@ -434,40 +811,53 @@ class Driver(pubsub.Listener):
             print("\n")
 
     def _rename_player(self, player: player.Player, name_info: charbuilder.PlayerNaming) -> None:
-        conn = self.all_players[player.name]
-        del self.all_players[player.name]
-        old_wiretap = player.get_wiretap()
-        old_wiretap.destroy()
-        self.all_players[name_info.name] = conn
+        conn = self.all_players.pop(player.name)
+        base.destroy_wiretap(player)   # it has the old name
         name_info.apply_to(player)
+        self.all_players[player.name] = conn
 
     def _server_loop_process_player_input(self, conn: player.PlayerConnection) -> None:
         p = conn.player
         assert p.input_is_available.is_set()
         for cmd in p.get_pending_input():
-            if not cmd:
-                continue
-            try:
-                p.tell("\n")
-                self._process_player_command(cmd, conn)
-                p.remember_previous_parse()
+            if cmd and self._execute_player_command(cmd, conn):
                 # to avoid flooding/abuse, we stop the loop after processing one command.
                 break
-            except errors.UnknownVerbException as x:
-                if x.verb in {"north", "east", "south", "west",
-                              "northeast", "northwest", "southeast", "southwest",
-                              "north east", "north west", "south east", "south west",
-                              "up", "down"}:
-                    p.tell("You can't go in that direction.")
+
+    def _execute_player_command(self, cmd: str, conn: player.PlayerConnection) -> bool:
+        """Process a single command line of the player and tell them about parse errors. Returns True if the command was executed."""
+        p = conn.player
+        recorder = self.command_recorder
+        if recorder:
+            output_before = recorder.before_command(self.server_ticks, p)
+        try:
+            p.tell("\n")
+            self._process_player_command(cmd, conn)
+            p.remember_previous_parse()
+            return True
+        except errors.UnknownVerbException as x:
+            if x.verb in {"north", "east", "south", "west",
+                          "northeast", "northwest", "southeast", "southwest",
+                          "north east", "north west", "south east", "south west",
+                          "up", "down"}:
+                p.tell("You can't go in that direction.")
+            else:
+                p.tell("The verb `%s' is unrecognized." % x.verb)
+                if x.verb[0].isupper():
+                    p.tell("Just type in lowercase (`%s')." % x.verb.lower())
                 else:
-                    p.tell("The verb `%s' is unrecognized." % x.verb)
-                    if x.verb[0].isupper():
-                        p.tell("Just type in lowercase (`%s')." % x.verb.lower())
-            except errors.ActionRefused as x:
-                p.remember_previous_parse()
-                p.tell(str(x))
-            except errors.ParseError as x:
-                p.tell(str(x))
+                    suggestions = self.suggest_verbs(p, x.verb)
+                    if suggestions:
+                        p.tell("Did you mean %s?" % lang.join(["`%s'" % s for s in suggestions], conj="or"))
+        except errors.ActionRefused as x:
+            p.remember_previous_parse()
+            p.tell(str(x))
+        except errors.ParseError as x:
+            p.tell(str(x))
+        finally:
+            if recorder:
+                recorder.command(self.server_ticks, p, cmd, output_before)
+        return False
 
     def _server_tick(self) -> None:
         """
@@ -478,29 +868,31 @@ class Driver(pubsub.Listener):
         4) write buffered output
         5) verify validity and idle state of connected players
         6) remove idle wiretaps
+        The duration of each of these phases is recorded in the tick profiler.
         """
+        tick_profiler = self.tick_profiler if self.tick_profiler.enabled else None
+        timer = time.perf_counter
+        tick_start = timer()
+        self.server_ticks += 1
         self.game_clock.add_realtime(datetime.timedelta(seconds=self.story.config.server_tick_time))
         ctx = util.Context(self, self.game_clock, self.story.config, None)
+        phase_end = timer()
+        if tick_profiler:
+            tick_profiler.add_phase("clock", phase_end - tick_start)
 
-        due_deferreds = []
-        with self.deferreds_lock:
-            while self.deferreds:
-                deferred = self.deferreds[0]
-                if deferred.due_gametime > self.game_clock.clock:
-                    break
-                due_deferreds.append(heapq.heappop(self.deferreds))
-        for deferred in due_deferreds:
-            try:
-                deferred(ctx=ctx)  # call the deferred and provide a context object
-            except StoryCompleted:
-                raise    # handled elsewhere (IF)
-            except Exception:
-                print("\n* Exception while executing deferred action {0}:".format(deferred), file=sys.stderr)
-                print("".join(util.format_traceback()), file=sys.stderr)
-                print("(Please report this problem)", file=sys.stderr)
-        del due_deferreds
+        phase_start = phase_end
+        self._run_due_deferreds(ctx, True, tick_profiler)
+        phase_end = timer()
+        if tick_profiler:
+            tick_profiler.add_phase("deferreds", phase_end - phase_start)
 
+        phase_start = phase_end
         pubsub.sync()
+        phase_end = timer()
+        if tick_profiler:
+            tick_profiler.add_phase("pubsub", phase_end - phase_start)
+
+        phase_start = phase_end
         for name, conn in list(self.all_players.items()):
             if conn.player and conn.io and conn.player.location:
                 self.disconnect_idling(conn)
@@ -508,17 +900,79 @@ class Driver(pubsub.Listener):
             else:
                 # disconnect corrupt player connection
                 self.disconnect_player(conn)
+        phase_end = timer()
+        if tick_profiler:
+            tick_profiler.add_phase("players", phase_end - phase_start)
+
         # clean up idle wiretap topics
-        topicinfo = pubsub.pending()
-        for topicname in topicinfo:
-            if isinstance(topicname, tuple) and topicname[0].startswith("wiretap-"):
-                events, idle_time, subbers = topicinfo[topicname]
-                if events == 0 and not subbers and idle_time > 30:
-                    pubsub.topic(topicname).destroy()
+        phase_start = phase_end
+        base.destroy_idle_wiretaps(30)
+        if tick_profiler:
+            phase_end = timer()
+            tick_profiler.add_phase("wiretaps", phase_end - phase_start)
+            tick_profiler.add_phase("total", phase_end - tick_start)
+
+    def _run_due_deferreds(self, ctx: util.Context, check_queue: bool, tick_profiler: Optional[profiler.TickProfiler]) -> None:
+        """
+        Run the deferreds that were carried over from a previous tick, and the ones that are due now (if check_queue is True).
+        If the story has a tick budget and it runs out, the remaining deferreds are carried over to the next iteration
+        of the main loop, so that player commands can be processed in between.
+        """
+        timer = time.perf_counter
+        budget = self.story.config.server_tick_budget
+        deadline = timer() + budget if budget > 0 else None
+        with self.deferreds_lock:
+            # carried over deferreds were due earlier, so they go first
+            due_deferreds, self.overdue_deferreds = self.overdue_deferreds, []
+            if check_queue:
+                due_deferreds.extend(self.deferreds.pop_due(self.game_clock.clock))
+        rescheduled = []   # type: List[Deferred]
+        try:
+            for index, deferred in enumerate(due_deferreds):
+                if deadline and index > 0 and timer() > deadline:
+                    with self.deferreds_lock:
+                        self.overdue_deferreds = due_deferreds[index:]
+                    self.tick_overloads += 1
+                    break
+                # remember these because the deferred clears them when it's done
+                owner, action = deferred.owner, deferred.action
+                deferred_start = timer()
+                try:
+                    if deferred.invoke(ctx):  # call the deferred and provide a context object
+                        rescheduled.append(deferred)
+                except StoryCompleted:
+                    raise    # handled elsewhere (IF)
+                except Exception:
+                    print("\n* Exception while executing deferred action {0}:".format(deferred), file=sys.stderr)
+                    print("".join(util.format_traceback()), file=sys.stderr)
+                    print("(Please report this problem)", file=sys.stderr)
+                if tick_profiler:
+                    tick_profiler.add_deferred(owner, action, timer() - deferred_start)
+        finally:
+            if rescheduled:
+                with self.deferreds_lock:
+                    for deferred in rescheduled:
+                        self.deferreds.push(deferred)
+
+    def _run_overdue_deferreds(self) -> None:
+        """
+        Continue running the deferreds that didn't fit in the budget of the previous server tick.
+        The main loops call this in between server ticks, after processing player input.
+        """
+        if self.overdue_deferreds:
+            ctx = util.Context(self, self.game_clock, self.story.config, None)
+            self._run_due_deferreds(ctx, False, self.tick_profiler if self.tick_profiler.enabled else None)
 
     def disconnect_idling(self, conn: player.PlayerConnection) -> None:
         raise NotImplementedError
 
+    def notify_player_input(self, player: player.Player) -> None:
+        """
+        Called when a line of input has been stored for the player.
+        Driver modes that don't block on the player's own input event can use this to wake up their main loop.
+        """
+        pass
+
     def disconnect_player(self, conn: player.PlayerConnection) -> None:
         raise NotImplementedError
 
@@ -538,7 +992,6 @@ class Driver(pubsub.Listener):
         # We pass in all 'external verbs' (non-soul verbs) so it will do the
         # parsing for us even if it's a verb the soul doesn't recognise by itself.
         command_verbs = self.commands.get(player.privileges)
-        custom_verbs = set(self.current_custom_verbs(player))
         try:
             if _verb in self.commands.no_soul_parsing:
                 # don't use the soul to parse it further
@@ -546,8 +999,7 @@ class Driver(pubsub.Listener):
                 raise errors.NonSoulVerb(base.ParseResult(_verb, unparsed=_rest.strip()))
             else:
                 # Parse the command by using the soul.
-                all_verbs = set(command_verbs) | custom_verbs
-                parsed = player.parse(cmd, external_verbs=all_verbs)
+                parsed = player.parse(cmd, external_verbs=RecognisedVerbs(self, player, command_verbs))
             # If parsing went without errors, it's a soul verb, handle it as a socialize action
             player.turns += 1
             player.do_socialize_cmd(parsed)
@@ -564,11 +1016,11 @@ class Driver(pubsub.Listener):
                 # If it's not a normal verb, abort with "please be more specific".
                 parse_error = "That doesn't make much sense."
                 handled = False
-                if parsed.verb in custom_verbs:
+                if self.is_custom_verb(player, parsed.verb):
                     # @todo note: can't deal with yields directly, use errors.AsyncDialog in handle_verb to initiate a dialog
                     handled = player.location.handle_verb(parsed, player)
                     if handled:
-                        topic_pending_actions.send(lambda actor=player: actor.location._notify_action_all(parsed, actor))
+                        base.notify_location(base.LocationNotificationKind.ACTION, player, player.location, parsed=parsed)
                     else:
                         parse_error = "Please be more specific."
                 if not handled:
@@ -585,7 +1037,7 @@ class Driver(pubsub.Listener):
                         else:
                             func(player, parsed, ctx)
                         if func.enable_notify_action:       # type: ignore
-                            topic_pending_actions.send(lambda actor=player: actor.location._notify_action_all(parsed, actor))
+                            base.notify_location(base.LocationNotificationKind.ACTION, player, player.location, parsed=parsed)
                     else:
                         raise errors.ParseError(parse_error)
             except errors.RetrySoulVerb:
@@ -639,40 +1091,66 @@ class Driver(pubsub.Listener):
     def current_custom_verbs(self, player: player.Player) -> Dict[str, str]:
         """returns dict of the currently recognised custom verbs (verb->helptext mapping)"""
         verbs = player.verbs.copy()
-        verbs.update(player.location.verbs)
-        for living in player.location.livings:
-            verbs.update(living.verbs)
-        for item in player.inventory:
-            verbs.update(item.verbs)
-        for item in player.location.items:
-            verbs.update(item.verbs)
-        for exit in set(player.location.exits.values()):
-            verbs.update(exit.verbs)
+        verbs.update(player.location.custom_verbs())
+        verbs.update(player.inventory_names.verbs())
         return verbs
 
     def current_verbs(self, player: player.Player) -> Dict[str, str]:
         """return a dict of all currently recognised verbs, and their help text"""
-        normal_verbs = self.commands.get(player.privileges)
-        verbs = {v: (f.__doc__ or "") for v, f in normal_verbs.items()}
+        verbs = dict(self.commands.helptexts(player.privileges))
         verbs.update(self.current_custom_verbs(player))
         return verbs
 
+    def verbs_with_prefix(self, player: player.Player, prefix: str) -> Set[str]:
+        """the currently recognised verbs that start with the given prefix (without building the dict of all verbs)"""
+        verbs = set(self.commands.with_prefix(player.privileges, prefix))
+        verbs.update(verb for verb in player.verbs if verb.startswith(prefix))
+        verbs.update(player.location.custom_verbs_with_prefix(prefix))
+        verbs.update(player.inventory_names.verbs_with_prefix(prefix))
+        return verbs
+
+    def suggest_verbs(self, player: player.Player, word: str, amount: int=5) -> List[str]:
+        """
+        Suggest corrections for a misspelled verb: the closest commands, soul verbs, custom verbs, exits and
+        names of the things that the player can see. These are looked up in spelling indexes,
+        only the few custom verbs and exits in the player's surroundings are compared one by one.
+        """
+        max_distance = 1 if len(word) <= 4 else 2
+        location = player.location
+        suggestions = self.commands.by_spelling(player.privileges, word, max_distance)
+        suggestions.extend(verbdefs.verbs_by_spelling(word, max_distance))
+        for names in (location.livings, location.items, player.inventory_names):
+            suggestions.extend(names.names_by_spelling(word, max_distance))
+        for name in itertools.chain(player.verbs, location.custom_verbs_with_prefix(""), location.exits):
+            distance = util.edit_distance(word, name, max_distance)
+            if distance <= max_distance:
+                suggestions.append((distance, name))
+        result = []     # type: List[str]
+        for distance, name in sorted(suggestions):
+            if name not in result and name != word:
+                result.append(name)
+                if len(result) >= amount:
+                    break
+        return result
+
+    def is_custom_verb(self, player: player.Player, verb: str) -> bool:
+        """is the verb currently a custom verb for the player (without building the dict of all custom verbs)"""
+        return verb in player.verbs or player.inventory_names.has_verb(verb) or player.location.has_custom_verb(verb)
+
+    def recognised_verbs(self, player: player.Player) -> 'RecognisedVerbs':
+        """the command verbs and custom verbs the player can use right now, to pass to the parser as external verbs"""
+        return RecognisedVerbs(self, player)
+
     def show_motd(self, player: player.Player, notify_no_motd: bool=False) -> None:
         raise NotImplementedError
 
     def search_player(self, name: str) -> Optional[player.Player]:
         """
-        Look through all the logged in players for one with the given name.
+        Look through all the logged in players for one with the given name (case insensitive).
         Returns None if no one is known with that name.
         """
-        name = name.lower()
-        conn = self.all_players.get(name)
-        if not conn:
-            for pname, conn in self.all_players.items():
-                if name == pname.lower():
-                    break
-            return None
-        return conn.player
+        conn = self.all_players.get(name.lower())     # all_players is keyed on the (lowercase) player names
+        return conn.player if conn else None
 
     def do_wait(self, duration: datetime.timedelta) -> Tuple[bool, str]:
         # let time pass, duration is in game time (not real time).
@@ -746,7 +1224,7 @@ class Driver(pubsub.Listener):
         if "ctx" in deferred.kwargs:
             raise errors.TaleError("you cannot enqueue a Deferred that already has a 'ctx' kwarg (serialization issues)")
         with self.deferreds_lock:
-            heapq.heappush(self.deferreds, deferred)
+            self.deferreds.push(deferred)
 
     def pubsub_event(self, topicname: pubsub.TopicNameType, event: Union[Callable, Tuple[player.PlayerConnection, str]]) -> None:
         if topicname == "driver-pending-actions":
@@ -762,18 +1240,43 @@ class Driver(pubsub.Listener):
                 raise TypeError("event must be tuple here")
             assert type(conn) is player.PlayerConnection
             assert inspect.isgenerator(dialog)
-            self._continue_dialog(conn, dialog, "")     # type: ignore
+            if conn in self.all_players.values():     # (another driver in the same process has its own players)
+                self._continue_dialog(conn, dialog, "")     # type: ignore
         else:
             raise ValueError("unknown topic: " + str(topicname))
 
-    def remove_deferreds(self, owner: str) -> None:
+    def pubsub_events(self, topicname: pubsub.TopicNameType, events: List[Callable]) -> None:
+        if topicname in ("driver-pending-actions", "driver-pending-tells"):
+            for event in events:
+                event()
+        else:
+            for event in events:
+                self.pubsub_event(topicname, event)
+
+    def remove_deferreds(self, owner: Any) -> None:
         with self.deferreds_lock:
-            self.deferreds = [d for d in self.deferreds if d.owner is not owner]
-            heapq.heapify(self.deferreds)
+            self.deferreds.remove_owner(owner)
+            if self.overdue_deferreds:
+                self.overdue_deferreds = [d for d in self.overdue_deferreds if d.owner is not owner]
+
+    def _configure_deferred_scheduler(self) -> None:
+        # let a timing wheel tick span the amount of game time that passes in one server tick
+        if isinstance(self.deferreds, TimingWheelDeferredScheduler) and not self.deferreds:
+            if self.story.config.server_tick_method == TickMethod.COMMAND:
+                factor = 1
+            else:
+                factor = self.story.config.gametime_to_realtime
+            tick_seconds = self.story.config.server_tick_time * factor
+            resolution = datetime.timedelta(seconds=tick_seconds) if tick_seconds > 0 else self.deferreds.resolution
+            self.deferreds.set_resolution(resolution, self.game_clock.clock)
 
     def register_periodicals(self, obj: base.MudObject) -> None:
         for func, period in util.get_periodicals(obj).items():
             assert len(period) == 3
+            if self.random_seed is not None:
+                # the initial delay was drawn when the class was defined, which may be before the random generator
+                # was seeded. Draw it again so that a recorded game replays the same.
+                period = (random.uniform(0.1, period[1]), period[1], period[2])
             mud_context.driver.defer(period, func)
 
     @property
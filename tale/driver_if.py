@@ -83,7 +83,7 @@ class IFDriver(driver.Driver):
         all_livings = [l for l in base.MudObjRegistry.all_livings.values() if l.location]
         all_exits = list(base.MudObjRegistry.all_exits.values())
         savedata = serializer.serialize(self.story.config, player, all_items, all_livings, all_locations, all_exits,
-                                        self.deferreds, self.game_clock)
+                                        sorted(list(self.deferreds) + self.overdue_deferreds), self.game_clock)
         del all_locations, all_exits, all_items, all_livings
         self.user_resources[util.storyname_to_filename(self.story.config.name) + ".savegame"] = savedata
         player.tell("Game saved.")
@@ -188,6 +188,8 @@ class IFDriver(driver.Driver):
             conn.input_direct("\n" + prompt)   # blocks  (note: cannot use yield here)
         player.tell("\n")
         self.story.init_player(player)
+        if self.command_recorder:
+            self.command_recorder.enter(self.server_ticks, player)
         player.look(short=False)  # force a 'look' command to get our bearings
         conn.write_output()
 
@@ -223,7 +225,10 @@ class IFDriver(driver.Driver):
                 has_input = True
             elif self.story.config.server_tick_method == TickMethod.TIMER:
                 # server tick goes on a timer, wait a limited time for player input before going on
-                input_wait_time = max(0.01, self.story.config.server_tick_time - loop_duration)
+                if self.overdue_deferreds:
+                    input_wait_time = 0.0    # only check for input, and continue with the overdue deferreds
+                else:
+                    input_wait_time = max(0.01, self.story.config.server_tick_time - loop_duration)
                 has_input = conn.player.input_is_available.wait(input_wait_time)
             else:
                 raise ValueError("invalid tick method")
@@ -236,19 +241,8 @@ class IFDriver(driver.Driver):
                         continue
                     if conn in self.waiting_for_input:
                         # this connection is processing direct input, rather than regular commands
-                        dialog, validator, echo_input = self.waiting_for_input.pop(conn)
-                        response = conn.player.get_pending_input()[0]
-                        if validator:
-                            try:
-                                response = validator(response)
-                            except ValueError as x:
-                                prompt = conn.last_output_line
-                                conn.io.dont_echo_next_cmd = not echo_input
-                                conn.output(str(x) or "That is not a valid answer.")
-                                conn.output_no_newline(prompt)   # print the input prompt again
-                                self.waiting_for_input[conn] = (dialog, validator, echo_input)   # reschedule
-                                continue
-                        self._continue_dialog(conn, dialog, response)
+                        if not self._answer_dialog(conn):
+                            continue
                     else:
                         # normal command processing
                         self._server_loop_process_player_input(conn)
@@ -279,6 +273,8 @@ class IFDriver(driver.Driver):
                 if now - previous_server_tick >= self.story.config.server_tick_time:
                     self._server_tick()
                     previous_server_tick = now
+                else:
+                    self._run_overdue_deferreds()
                 if self.story.config.server_tick_method == TickMethod.COMMAND:
                     # Even though the server tick may be skipped, the pubsub events
                     # should be processed every player command no matter what.
@@ -392,7 +388,9 @@ class IFDriver(driver.Driver):
 
             saved_deferreds = deserializer.recreate_classes(state.pop("deferreds"), objects_finder)
             assert all(isinstance(d, driver.Deferred) for d in saved_deferreds)
-            self.deferreds = []
+            self.deferreds.clear()
+            self.overdue_deferreds = []
+            self._configure_deferred_scheduler()
             for d in saved_deferreds:
                 self._enqueue_deferred(d)
 
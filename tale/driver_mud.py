@@ -5,10 +5,12 @@ Mud driver (multi user server).
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
+import asyncio
+import collections
 import time
 import socket
 import threading
-from typing import Union, Generator, Dict, Tuple, Optional, Any
+from typing import Union, Generator, Dict, Tuple, Optional, Any, List
 
 from .story import GameMode
 from . import accounts
@@ -20,7 +22,7 @@ from . import lang
 from . import pubsub
 from . import util
 from .player import PlayerConnection, Player
-from .tio.mud_browser_io import TaleMudWsgiApp
+from .tio.mud_browser_io import TaleMudWsgiApp, MudHttpIo, AsyncMudHttpIo
 
 
 class MudDriver(driver.Driver):
@@ -33,6 +35,9 @@ class MudDriver(driver.Driver):
         self.game_mode = GameMode.MUD
         self.restricted = restricted   # restricted mud mode? (no new players allowed)
         self.mud_accounts = None   # type: accounts.MudAccounts
+        # players that have input waiting (in order of arrival), and the condition the main loop blocks on:
+        self._input_ready = collections.OrderedDict()     # type: Dict[Player, None]
+        self._input_ready_condition = threading.Condition()
 
     def start_main_loop(self):
         # Driver runs as main thread, wsgi webserver runs in background thread
@@ -44,6 +49,10 @@ class MudDriver(driver.Driver):
         wsgi_thread.daemon = True
         wsgi_thread.start()
         self.print_game_intro(None)
+        self._print_server_url(wsgi_server)
+        self._main_loop_wrapper(None)   # this doesn't return!
+
+    def _print_server_url(self, wsgi_server: Any) -> None:
         if self.restricted:
             print("\n* Restricted mode: no new players allowed *\n")
         protocol = "https" if wsgi_server.use_ssl else "http"
@@ -57,7 +66,6 @@ class MudDriver(driver.Driver):
             if hostname.startswith("127.0"):
                 hostname = "localhost"
             print("Access the game on this web server url (ipv4):   %s://%s:%d/tale/" % (protocol, hostname, port), end="\n\n")
-        self._main_loop_wrapper(None)   # this doesn't return!
 
     def show_motd(self, player: Player, notify_no_motd: bool=False) -> None:
         """Prints the Message-Of-The-Day file, if present."""
@@ -75,6 +83,32 @@ class MudDriver(driver.Driver):
             player.tell("There's currently no message-of-the-day.", end=True)
             player.tell("\n")
 
+    def notify_player_input(self, player: Player) -> None:
+        # called from the web server threads when a player entered something; wakes up the main loop.
+        with self._input_ready_condition:
+            self._input_ready[player] = None
+            self._input_ready_condition.notify()
+
+    def wakeup_main_loop(self) -> None:
+        """Wake up the main loop even though there's no player input (for instance, to start a new dialog right away)"""
+        with self._input_ready_condition:
+            self._input_ready_condition.notify()
+
+    def wait_for_player_input(self, timeout: float) -> List[Player]:
+        """
+        Blocks until at least one player has input available, or the timeout (seconds) expires.
+        Returns the players that have input waiting, in order of arrival, and resets the ready queue.
+        """
+        with self._input_ready_condition:
+            if not self._input_ready:
+                self._input_ready_condition.wait(timeout)
+            ready = list(self._input_ready)
+            self._input_ready.clear()
+        return ready
+
+    def create_player_io(self, connection: PlayerConnection) -> MudHttpIo:
+        return MudHttpIo(connection)
+
     def do_check_savefile_free(self, player: Player) -> bool:
         raise errors.ActionRefused("Currently, saving is not supported in MUD mode.")
 
@@ -88,8 +122,7 @@ class MudDriver(driver.Driver):
         connect_name = "<connecting_%d>" % id(connection)  # unique temporary name
         new_player = Player(connect_name, "n", race="elemental", descr="This player is still connecting to the game.")
         connection.player = new_player
-        from .tio.mud_browser_io import MudHttpIo
-        connection.io = MudHttpIo(connection)
+        connection.io = self.create_player_io(connection)
         self.all_players[new_player.name] = connection
         connection.clear_screen()
         self.print_game_intro(connection)
@@ -98,9 +131,11 @@ class MudDriver(driver.Driver):
         if len(self.mud_accounts.all_accounts(having_privilege="wizard")) == 0:
             # there is no wizard, create a dialog to construct the initial admin user
             driver.topic_async_dialogs.send((connection, self._login_dialog_mud_create_admin(connection)))
+            self.wakeup_main_loop()
             return connection
         # create the login dialog
         driver.topic_async_dialogs.send((connection, self._login_dialog_mud(connection)))
+        self.wakeup_main_loop()
         return connection
 
     def disconnect_idling(self, conn: PlayerConnection) -> None:
@@ -125,6 +160,8 @@ class MudDriver(driver.Driver):
         else:
             raise TypeError("connection or player object expected")
         assert self.all_players[name] is conn
+        if self.command_recorder:
+            self.command_recorder.leave(self.server_ticks, conn.player)
         if conn.player.location:
             conn.player.tell_others("{Actor} suddenly shimmers and fades from sight. %s left the game."
                                     % lang.capital(conn.player.subjective))
@@ -260,9 +297,11 @@ class MudDriver(driver.Driver):
             existing_player.tell("<it><rev>You are kicked from the game. Your account is now logged in from elsewhere.</>")
             existing_player.tell("\n")
             state = {}
-            for name, value in vars(existing_player).items():
+            for name, value in util.object_vars(existing_player).items():
                 if not name.startswith("_") and name not in ("vnum", "soul", "input_is_available", "teleported_from", "transcript"):
                     state[name] = value
+            state["name"] = existing_player.name
+            state["aliases"] = set(existing_player.aliases)
             state["title"] = existing_player.title
             state["description"] = existing_player.description
             state["short_description"] = existing_player.short_description
@@ -294,6 +333,8 @@ class MudDriver(driver.Driver):
         if prompt:
             yield "input", "\n" + prompt
         self.story.init_player(conn.player)
+        if self.command_recorder:
+            self.command_recorder.enter(self.server_ticks, conn.player)
         self.mud_accounts.save_story_data(conn.player.name, conn.player.story_data)
         conn.output("\n")
         self.show_motd(conn.player, True)
@@ -329,71 +370,162 @@ class MudDriver(driver.Driver):
         The game loop, for the multiplayer MUD mode.
         Until the server is shut down, it processes player input, and prints the resulting output.
         """
-        loop_duration = 0.0
         previous_server_tick = 0.0
         while not self._stop_mainloop:
-            pubsub.sync("driver-async-dialogs")
-            for conn in self.all_players.values():
-                conn.write_output()
-                if conn not in self.waiting_for_input:
-                    conn.write_input_prompt()
-
-            # server tick goes on a timer
-            wait_time = max(0.01, self.story.config.server_tick_time - loop_duration)
-            while wait_time > 0:
-                if any(conn.player.input_is_available.is_set() for conn in self.all_players.values()):
-                    # there was player input, abort the wait loop and deal with it
-                    break
-                sub_wait = min(0.1, wait_time)  # keep things responsive
-                time.sleep(sub_wait)
-                wait_time -= sub_wait
-
-            loop_start = time.time()
-            for conn in list(self.all_players.values()):
-                if conn.player.input_is_available.is_set():
-                    conn.need_new_input_prompt = True
-                    try:
-                        if conn in self.waiting_for_input:
-                            # this connection is processing direct input, rather than regular commands
-                            dialog, validator, echo_input = self.waiting_for_input.pop(conn)
-                            response = conn.player.get_pending_input()[0]
-                            if validator:
-                                try:
-                                    response = validator(response)
-                                except ValueError as x:
-                                    prompt = conn.last_output_line
-                                    conn.io.dont_echo_next_cmd = not echo_input
-                                    conn.output(str(x) or "That is not a valid answer.")
-                                    conn.output_no_newline(prompt)   # print the input prompt again
-                                    self.waiting_for_input[conn] = (dialog, validator, echo_input)   # reschedule
-                                    continue
-                            self._continue_dialog(conn, dialog, response)
-                        else:
-                            # normal command processing
-                            self._server_loop_process_player_input(conn)
-                    except (KeyboardInterrupt, EOFError):
-                        continue
-                    except errors.SessionExit:
-                        self.story.goodbye(conn.player)
-                        driver.topic_pending_tells.send(lambda conn=conn: self.disconnect_player(conn))
-                    except Exception:
-                        tb = "".join(util.format_traceback())
-                        txt = "\n<bright><rev>* internal error (please report this):</>\n" + tb
-                        conn.player.tell(txt, format=False)
-                        conn.player.tell("<rev><it>Please report this problem.</>")
+            self._main_loop_write_output()
+            ready_players = self.wait_for_player_input(self._main_loop_wait_time(previous_server_tick))
+            previous_server_tick = self._main_loop_process(ready_players, previous_server_tick)
+
+    def _main_loop_write_output(self) -> None:
+        pubsub.sync("driver-async-dialogs")
+        for conn in self.all_players.values():
+            conn.write_output()
+            if conn not in self.waiting_for_input:
+                conn.write_input_prompt()
+
+    def _main_loop_wait_time(self, previous_server_tick: float) -> float:
+        # Block until a player entered something, or until the next server tick is due.
+        # (deferreds are only executed in the server tick, so that is also the earliest moment one can be due)
+        # If there are overdue deferreds left from the previous tick, only check for input and continue with those.
+        if self.overdue_deferreds:
+            return 0.0
+        return max(0.01, previous_server_tick + self.story.config.server_tick_time - time.time())
+
+    def _main_loop_process(self, ready_players: List[Player], previous_server_tick: float) -> float:
+        """Process the input of the players that have entered something, and do the server tick if it is due."""
+        loop_start = time.time()
+        for player in ready_players:
+            conn = self.all_players.get(player.name)
+            if conn is None or conn.player is not player or not player.input_is_available.is_set():
+                continue    # player disconnected in the meantime, or input was already consumed
+            conn.need_new_input_prompt = True
             try:
-                pubsub.sync("driver-pending-tells")
-                # server TICK
-                now = time.time()
-                if now - previous_server_tick >= self.story.config.server_tick_time:
-                    self._server_tick()
-                    previous_server_tick = now
-                loop_duration = time.time() - loop_start
-                self.server_loop_durations.append(loop_duration)
-            except errors.StoryCompleted:
-                print("StoryCompleted raised! But that should never happen in a MUD!")
+                if conn in self.waiting_for_input:
+                    # this connection is processing direct input, rather than regular commands
+                    self._answer_dialog(conn)
+                else:
+                    # normal command processing
+                    self._server_loop_process_player_input(conn)
+            except (KeyboardInterrupt, EOFError):
+                continue
+            except errors.SessionExit:
+                self.story.goodbye(conn.player)
+                driver.topic_pending_tells.send(lambda conn=conn: self.disconnect_player(conn))
+            except Exception:
+                tb = "".join(util.format_traceback())
+                txt = "\n<bright><rev>* internal error (please report this):</>\n" + tb
+                conn.player.tell(txt, format=False)
+                conn.player.tell("<rev><it>Please report this problem.</>")
+        try:
+            pubsub.sync("driver-pending-tells")
+            # server TICK
+            now = time.time()
+            if now - previous_server_tick >= self.story.config.server_tick_time:
+                self._server_tick()
+                previous_server_tick = now
+            else:
+                self._run_overdue_deferreds()
+            loop_duration = time.time() - loop_start
+            self.server_loop_durations.append(loop_duration)
+        except errors.StoryCompleted:
+            print("StoryCompleted raised! But that should never happen in a MUD!")
+            for conn in self.all_players.values():
                 conn.player.tell("<rev>StoryCompleted event in MUD mode - should NOT happen</> - Please report this error")
-                raise
+            raise
+        return previous_server_tick
+
+
+class AsyncioMudDriver(MudDriver):
+    """
+    Mud driver that runs the game loop, the web server (including the event streams to the browsers)
+    and the deferreds on a single asyncio event loop, instead of using a thread per connection.
+    Player input wakes up the game loop directly. Everything runs in the event loop's thread,
+    so the game code doesn't have to deal with concurrent access from the web server threads.
+    """
+    def __init__(self, restricted=False) -> None:
+        super().__init__(restricted)
+        self._input_event = None    # type: Optional[asyncio.Event]
+        self._event_loop = None     # type: Optional[asyncio.AbstractEventLoop]
+
+    def start_main_loop(self):
+        # Driver and wsgi webserver both run on the asyncio event loop in the main thread
+        accounts_db_file = self.user_resources.validate_path("useraccounts.sqlite")
+        self.mud_accounts = accounts.MudAccounts(accounts_db_file)
+        base._limbo.init_inventory([LimboReaper()])  # add the grim reaper to Limbo
+        self._event_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._event_loop)
+        self._input_event = asyncio.Event()
+        try:
+            self._event_loop.run_until_complete(self._async_main())
+        except KeyboardInterrupt:
+            # a ctrl-c will exit the server
+            print("* break - stopping server loop")
+            self._stop_driver()
+        finally:
+            self._event_loop.close()
+
+    async def _async_main(self) -> None:
+        wsgi_server = TaleMudWsgiApp.create_async_app_server(self, use_ssl=False, ssl_certs=None)    # you can enable SSL here
+        await wsgi_server.start()
+        self.print_game_intro(None)
+        self._print_server_url(wsgi_server)
+        self._stop_mainloop = False
+        self._num_critical_errors = 0
+        self._time_of_last_critical_error = 0.0
+        try:
+            while not self._stop_mainloop:
+                try:
+                    await self.async_main_loop()
+                except Exception:
+                    self._main_loop_critical_error()
+        finally:
+            wsgi_server.close()
+
+    def create_player_io(self, connection: PlayerConnection) -> MudHttpIo:
+        return AsyncMudHttpIo(connection)
+
+    def notify_player_input(self, player: Player) -> None:
+        # called from the web server on the event loop when a player entered something; wakes up the main loop.
+        self._input_ready[player] = None
+        self.wakeup_main_loop()
+
+    def wakeup_main_loop(self) -> None:
+        if self._input_event:
+            self._input_event.set()
+
+    async def async_wait_for_player_input(self, timeout: float) -> List[Player]:
+        """
+        Waits until at least one player has input available, or the timeout (seconds) expires,
+        while the web server keeps running on the event loop.
+        Returns the players that have input waiting, in order of arrival, and resets the ready queue.
+        """
+        input_event = self._input_event
+        assert input_event is not None, "the main loop creates the input event"
+        if self._input_ready or timeout <= 0:
+            await asyncio.sleep(0)    # give the web server a chance to run
+        else:
+            try:
+                await asyncio.wait_for(input_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        input_event.clear()
+        ready = list(self._input_ready)
+        self._input_ready.clear()
+        return ready
+
+    def main_loop(self, conn: Optional[PlayerConnection]) -> None:
+        raise RuntimeError("the asyncio mud driver runs async_main_loop on the event loop")
+
+    async def async_main_loop(self) -> None:
+        """
+        The game loop, for the multiplayer MUD mode on the asyncio event loop.
+        Until the server is shut down, it processes player input, and prints the resulting output.
+        """
+        previous_server_tick = 0.0
+        while not self._stop_mainloop:
+            self._main_loop_write_output()
+            ready_players = await self.async_wait_for_player_input(self._main_loop_wait_time(previous_server_tick))
+            previous_server_tick = self._main_loop_process(ready_players, previous_server_tick)
 
 
 class LimboReaper(base.Living):
@@ -0,0 +1,165 @@
+"""
+Replay driver: replays a recorded command log (see replay.py) without any I/O, as fast as possible.
+Gives the throughput in commands per second, and checks if the output matches the recording.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import datetime
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from . import base
+from . import driver
+from . import errors
+from . import pubsub
+from . import replay
+from . import util
+from .driver_mud import LimboReaper
+from .player import Player, PlayerConnection
+from .story import GameMode
+from .tio.iobase import IoAdapterBase
+
+
+class ReplayIo(IoAdapterBase):
+    """I/O adapter that discards all output. The output is checked on the player's text buffer instead."""
+    def __init__(self, player_connection: PlayerConnection) -> None:
+        super().__init__(player_connection)
+        self.supports_blocking_input = False
+
+    def render_output(self, paragraphs: Sequence[Tuple[str, bool]], **params: Any) -> str:
+        return ""
+
+    def pause(self, unpause: bool=False) -> None:
+        pass
+
+
+class ReplayDriver(driver.Driver):
+    """
+    Replays the commands from a command log on the story, in the same server ticks as they were recorded.
+    The random generator is seeded with the seed of the recording, and the game clock starts
+    at the same time as well, so the replay should produce exactly the same output.
+    """
+    max_mismatches_shown = 10
+
+    def __init__(self, logfile: str) -> None:
+        super().__init__()
+        self.header, self.events = replay.read_log(logfile)
+        self.game_mode = GameMode(self.header["game_mode"])
+        self.random_seed = self.header["seed"]
+        self.server_started = datetime.datetime.strptime(self.header["server_started"], "%Y-%m-%dT%H:%M:%S")
+        self.results = {}   # type: Dict[str, Any]
+
+    def start_main_loop(self) -> None:
+        if self.story.config.name != self.header["story"]:
+            raise errors.TaleError("the command log was recorded on another story: " + self.header["story"])
+        self._stop_mainloop = False
+        if self.game_mode == GameMode.MUD:
+            base._limbo.init_inventory([LimboReaper()])  # the mud driver adds the grim reaper to Limbo as well
+        num_commands = num_errors = 0
+        mismatches = []     # type: List[Tuple[int, str, Optional[str]]]
+        start = time.perf_counter()
+        for event in self.events:
+            while self.server_ticks < event["tick"]:
+                self._server_tick()
+            name = event["player"]
+            if "enter" in event:
+                self._enter_player(name, event["enter"])
+                continue
+            conn = self.all_players.get(name)
+            if "leave" in event:
+                if conn:
+                    self.disconnect_player(conn)
+                continue
+            if not conn:
+                raise errors.TaleError("command log contains a command for unknown player " + name)
+            # like the game loop does: continue the dialogs that commands started, before processing the next command
+            pubsub.sync("driver-async-dialogs")
+            conn.write_output()
+            output_before = conn.player._output.text()
+            try:
+                if "answer" in event:
+                    if conn in self.waiting_for_input:
+                        conn.player.store_input_line(event["answer"])
+                        self._answer_dialog(conn)
+                else:
+                    num_commands += 1
+                    self._execute_player_command(event["cmd"], conn)
+            except errors.SessionExit:
+                self.story.goodbye(conn.player)
+            except errors.StoryCompleted:
+                pass
+            except Exception:
+                num_errors += 1
+                conn.player.tell("\n<bright><rev>* internal error (please report this):</>\n" + "".join(util.format_traceback()),
+                                 format=False)
+            if replay.output_checksum(output_before, conn.player) != event["output"]:
+                mismatches.append((event["tick"], name, event.get("cmd", event.get("answer"))))
+            pubsub.sync("driver-pending-tells")
+        duration = time.perf_counter() - start
+        self.results = {
+            "story": self.story.config.name,
+            "recorded_with": self.header["tale_version"],
+            "commands": num_commands,
+            "ticks": self.server_ticks,
+            "duration": duration,
+            "commands_per_second": num_commands / duration if duration else 0.0,
+            "errors": num_errors,
+            "output_mismatches": len(mismatches),
+            "first_mismatches": mismatches[:self.max_mismatches_shown]
+        }
+        self.print_results()
+
+    def print_results(self) -> None:
+        results = self.results
+        print("Replayed %d commands in %d ticks in %.3f seconds: %.1f commands per second." %
+              (results["commands"], results["ticks"], results["duration"], results["commands_per_second"]))
+        if results["errors"]:
+            print("%d commands crashed with an internal error." % results["errors"])
+        if results["output_mismatches"]:
+            print("The output of %d commands didn't match the recording (recorded with Tale %s). First ones:" %
+                  (results["output_mismatches"], results["recorded_with"]))
+            for tick, name, cmd in results["first_mismatches"]:
+                print("   tick %d, %s: %s" % (tick, name, cmd))
+        else:
+            print("All output matched the recording.")
+
+    def _enter_player(self, name: str, info: Dict[str, Any]) -> None:
+        player = Player(name, info["gender"], race=info["race"])
+        player.title = info["title"]
+        player.privileges = set(info["privileges"])
+        player.money = info["money"]
+        conn = PlayerConnection(player)
+        conn.io = ReplayIo(conn)
+        self.all_players[name] = conn
+        location = self._find_location(info["location"], info["location_vnum"])
+        if location:
+            player.move(location, silent=True)
+        self.story.init_player(player)
+
+    @staticmethod
+    def _find_location(name: Optional[str], vnum: Optional[int]) -> Optional[base.Location]:
+        # object vnums are only the same if the story creates its objects in exactly the same order as when recording,
+        # so we check the name as well, and fall back to the first location with the same name.
+        location = base.MudObjRegistry.all_locations.get(vnum) if vnum is not None else None
+        if location and location.name == name:
+            return location
+        for location in base.MudObjRegistry.all_locations.values():
+            if location.name == name:
+                return location
+        return None
+
+    def connect_player(self, player_io_type: str, line_delay: int) -> PlayerConnection:
+        raise errors.TaleError("players can't connect to a replay")
+
+    def disconnect_player(self, conn: PlayerConnection) -> None:
+        if self.all_players.get(conn.player.name) is conn:
+            del self.all_players[conn.player.name]
+        conn.destroy()
+
+    def disconnect_idling(self, conn: PlayerConnection) -> None:
+        pass    # the replay runs much faster than real time; leaving players are in the command log
+
+    def main_loop(self, conn: Optional[PlayerConnection]) -> None:
+        raise errors.TaleError("the replay driver has no main loop")
@@ -29,19 +29,32 @@ def run_from_cmdline(cmdline: Sequence[str]) -> None:
     parser.add_argument('-i', '--gui', help='gui interface', action='store_true')
     parser.add_argument('-w', '--web', help='web browser interface', action='store_true')
     parser.add_argument('-r', '--restricted', help='restricted mud mode; do not allow new players', action='store_true')
+    parser.add_argument('-a', '--asyncio', help='run the mud server on a single asyncio event loop', action='store_true')
+    parser.add_argument('--record', type=str, help='record all player commands to this command log file')
+    parser.add_argument('--replay', type=str, help='replay the commands from this command log file (no i/o, as fast as possible)')
     parser.add_argument('-z', '--wizard', help='force wizard mode on if story character (for debug purposes)', action='store_true')
     args = parser.parse_args(cmdline)
     try:
         # select the correct driver type, configure it, and start the story.
         game_mode = GameMode(args.mode)
-        if game_mode == GameMode.IF:
+        if args.replay:
+            from .driver_replay import ReplayDriver
+            driver = ReplayDriver(args.replay)  # type: Driver
+        elif game_mode == GameMode.IF:
             from .driver_if import IFDriver
-            driver = IFDriver(screen_delay=args.delay, gui=args.gui, web=args.web, wizard_override=args.wizard)   # type: Driver
+            driver = IFDriver(screen_delay=args.delay, gui=args.gui, web=args.web, wizard_override=args.wizard)
         elif game_mode == GameMode.MUD:
-            from .driver_mud import MudDriver
-            driver = MudDriver(args.restricted)
+            if args.asyncio:
+                from .driver_mud import AsyncioMudDriver
+                driver = AsyncioMudDriver(args.restricted)
+            else:
+                from .driver_mud import MudDriver
+                driver = MudDriver(args.restricted)
         else:
             raise ValueError("invalid game mode")
+        if args.record:
+            from .replay import CommandRecorder
+            driver.command_recorder = CommandRecorder(args.record)
         driver.start(args.game)
     except:
         if args.gui:
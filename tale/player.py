@@ -28,6 +28,8 @@ class Player(base.Living, pubsub.Listener):
     Player controlled entity.
     Has a Soul for social interaction.
     """
+    parse_cache_size = 16
+
     def __init__(self, name: str, gender: str, *, race: str="human", descr: str="", short_descr: str="") -> None:
         title = lang.capital(name)
         super().__init__(name, gender, race=race, title=title, descr=descr, short_descr=short_descr)
@@ -161,6 +163,8 @@ class Player(base.Living, pubsub.Listener):
             self.transcript.write("\n\n>> %s\n" % cmd)
         self.input_is_available.set()
         self.last_input_time = time.time()
+        if mud_context.driver:
+            mud_context.driver.notify_player_input(self)
 
     @property
     def idle_time(self) -> float:
@@ -217,20 +221,20 @@ class Player(base.Living, pubsub.Listener):
         """
         assert keyword
         keyword = keyword.lower()
-        desc = self.location.extra_desc.get(keyword)
+        desc = self.location.get_extradesc(keyword)
         if desc:
             return desc
         for item in self.location.items:
-            desc = item.extra_desc.get(keyword)
+            desc = item.get_extradesc(keyword)
             if desc:
                 return desc
         for living in self.location.livings:
-            desc = living.extra_desc.get(keyword)
+            desc = living.get_extradesc(keyword)
             if desc:
                 return desc
         if include_inventory:
             for item in self.inventory:
-                desc = item.extra_desc.get(keyword)
+                desc = item.get_extradesc(keyword)
                 if desc:
                     return desc
         if include_containers_in_inventory:
@@ -241,7 +245,7 @@ class Player(base.Living, pubsub.Listener):
                     continue    # no access to inventory, just skip this item silently
                 else:
                     for item in inventory:
-                        desc = item.extra_desc.get(keyword)
+                        desc = item.get_extradesc(keyword)
                         if desc:
                             return desc
         return ""
@@ -287,6 +291,10 @@ class TextBuffer:
         self.paragraphs = []  # type: List[TextBuffer.Paragraph]
         self.in_paragraph = False
 
+    def text(self) -> str:
+        """the text that is currently in the buffer (doesn't clear the buffer)"""
+        return "".join(paragraph.text() for paragraph in self.paragraphs)
+
     def p(self) -> None:
         """Paragraph terminator. Start new paragraph on next line."""
         if not self.in_paragraph:
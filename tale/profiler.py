@@ -0,0 +1,108 @@
+"""
+Low overhead instrumentation of the driver's server tick.
+Records the durations of the various phases of the tick,
+and of the individual deferred actions that were executed.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import collections
+import json
+import time
+from typing import Any, Dict, List, MutableSequence, Tuple
+
+from . import pubsub
+
+
+__all__ = ["RollingHistogram", "TickProfiler"]
+
+
+class RollingHistogram:
+    """Keeps the most recent duration samples, to calculate percentiles over them."""
+    def __init__(self, size: int=1000) -> None:
+        self.samples = collections.deque(maxlen=size)    # type: MutableSequence[float]
+        self.count = 0      # total number of samples ever added
+
+    def add(self, duration: float) -> None:
+        self.samples.append(duration)
+        self.count += 1
+
+    def stats(self) -> Dict[str, float]:
+        """returns the count, p50, p95, p99 and max of the samples (durations in seconds)"""
+        if not self.samples:
+            return {"count": self.count, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            "count": self.count,
+            "p50": ordered[min(last, len(ordered) * 50 // 100)],
+            "p95": ordered[min(last, len(ordered) * 95 // 100)],
+            "p99": ordered[min(last, len(ordered) * 99 // 100)],
+            "max": ordered[last]
+        }
+
+
+class TickProfiler:
+    """
+    Collects the timings of the server tick phases, and of the deferred actions that were called.
+    The pubsub events per topic are taken from the pubsub topics themselves.
+    """
+    phases = ("clock", "deferreds", "pubsub", "players", "wiretaps", "total")
+
+    def __init__(self, histogram_size: int=1000) -> None:
+        self.enabled = True
+        self.histogram_size = histogram_size
+        self.reset()
+
+    def reset(self) -> None:
+        self.started = time.time()
+        self.phase_timings = {phase: RollingHistogram(self.histogram_size) for phase in self.phases}
+        self.deferred_timings = {}  # type: Dict[Tuple[str, str], List[float]]  # (owner, action) -> [count, total, max]
+
+    def add_phase(self, phase: str, duration: float) -> None:
+        self.phase_timings[phase].add(duration)
+
+    def add_deferred(self, owner: Any, action: str, duration: float) -> None:
+        key = (self.owner_name(owner), action)
+        timing = self.deferred_timings.get(key)
+        if timing is None:
+            self.deferred_timings[key] = [1, duration, duration]
+        else:
+            timing[0] += 1
+            timing[1] += duration
+            if duration > timing[2]:
+                timing[2] = duration
+
+    @staticmethod
+    def owner_name(owner: Any) -> str:
+        if isinstance(owner, str):
+            return owner
+        name = getattr(owner, "name", None)
+        if name:
+            return "%s '%s'" % (owner.__class__.__name__, name)
+        return owner.__class__.__name__
+
+    def slowest_deferreds(self, amount: int=10) -> List[Dict[str, Any]]:
+        """the deferred actions with the highest maximum duration"""
+        slowest = sorted(self.deferred_timings.items(), key=lambda item: item[1][2], reverse=True)[:amount]
+        return [{"owner": owner, "action": action, "count": count, "total": total, "max": maximum}
+                for (owner, action), (count, total, maximum) in slowest]
+
+    @staticmethod
+    def pubsub_counts() -> Dict[str, int]:
+        """number of events processed per pubsub topic"""
+        return {str(topic.name): topic.events_processed for topic in list(pubsub.all_topics.values())}
+
+    def as_dict(self, num_deferreds: int=10) -> Dict[str, Any]:
+        """machine readable summary of all statistics (durations are in seconds)"""
+        return {
+            "since": self.started,
+            "enabled": self.enabled,
+            "phases": {phase: histogram.stats() for phase, histogram in self.phase_timings.items()},
+            "slowest_deferreds": self.slowest_deferreds(num_deferreds),
+            "pubsub_events": self.pubsub_counts()
+        }
+
+    def dump_json(self, num_deferreds: int=10) -> str:
+        return json.dumps(self.as_dict(num_deferreds), indent=2, sort_keys=True)
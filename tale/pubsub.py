@@ -28,19 +28,30 @@ Currently defined pubsub topics used by the Tale driver:
   ("wiretap-living", <living name>)
       Used by the wiretapper on a living
 
+  The wiretap topics are only created when something wants to tap the location
+  or living (via get_wiretap), and the driver destroys them again when they're idle.
+
+The driver-pending-actions and driver-pending-tells topics are bounded topics:
+their events are delivered in a single batch per sync (via pubsub_events),
+and they sync by themselves when too many events are queued up.
+
 """
 
+import enum
 import threading
 import time
 import weakref
-from typing import Dict, List, Tuple, Union, Optional, Set, Any
+from typing import Dict, List, Tuple, Union, Optional, Set, Any, Callable, Hashable
 
 TopicNameType = Union[str, Tuple]
 
-__all__ = ["topic", "unsubscribe_all", "Listener"]
+__all__ = ["topic", "bounded_topic", "unsubscribe_all", "Listener", "Overflow", "stats", "slow_subscribers", "reset_stats"]
 
 all_topics = {}  # type: Dict[TopicNameType, Topic]
 __topic_lock = threading.Lock()
+# reverse index: id(subscriber) -> (the weakref to the subscriber that is used in all topics, the topics it is subscribed to)
+subscriptions = {}  # type: Dict[int, Tuple[weakref.ReferenceType[Listener], Set[Topic]]]
+slow_subscriber_threshold = 0.005   # a subscriber that takes longer than this (seconds) to process an event, is slow
 
 
 class Listener:
@@ -49,20 +60,78 @@ class Listener:
         """override this event receive method in a subclass"""
         raise NotImplementedError("implement this in subclass")
 
+    def pubsub_events(self, topicname: TopicNameType, events: List[Any]) -> Any:
+        """
+        Receive a batch of events at once (from a bounded topic).
+        The default implementation calls pubsub_event for each of them,
+        override this in a subclass if you can process the whole batch more efficiently.
+        """
+        results = []
+        for event in events:
+            try:
+                results.append(self.pubsub_event(topicname, event))
+            except Listener.NotYet:
+                pass
+        return results
+
     class NotYet(Exception):
         """raise this from pubsub_event to signal that you don't want to consume the event just yet"""
         pass
 
 
+class SubscriberStats:
+    """Delivery statistics of a subscriber on a topic."""
+    __slots__ = ("events", "total_time", "max_time", "slow_events")
+
+    def __init__(self) -> None:
+        self.events = 0
+        self.total_time = 0.0
+        self.max_time = 0.0     # per event
+        self.slow_events = 0    # events that took longer than the slow subscriber threshold
+
+    def add(self, num_events: int, duration: float) -> None:
+        self.events += num_events
+        self.total_time += duration
+        duration /= num_events
+        if duration > self.max_time:
+            self.max_time = duration
+        if duration > slow_subscriber_threshold:
+            self.slow_events += num_events
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "events": self.events,
+            "total_time": self.total_time,
+            "avg_time": self.total_time / self.events if self.events else 0.0,
+            "max_time": self.max_time,
+            "slow_events": self.slow_events
+        }
+
+
+def subscriber_name(subscriber: Listener) -> str:
+    """the name of the subscriber as it appears in the statistics"""
+    name = getattr(subscriber, "name", None)
+    return "%s %s" % (type(subscriber).__name__, name) if name else type(subscriber).__name__
+
+
 class Topic:
     """
     A pubsub topic to send/receive events. You get these from the topic function.
     """
     def __init__(self, name: TopicNameType) -> None:
         self.name = name
-        self.subscribers = set()  # type: Set[weakref.ReferenceType[Listener]]
+        # the subscribers, with their delivery statistics on this topic:
+        self.subscribers = {}  # type: Dict[weakref.ReferenceType[Listener], SubscriberStats]
         self.events = []  # type: List[Any]
         self.last_event = time.time()  # type: float
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.events_sent = 0
+        self.events_processed = 0
+        self.events_notyet = 0      # deliveries that a subscriber refused with NotYet
+        for subber_ref in self.subscribers:
+            self.subscribers[subber_ref] = SubscriberStats()
 
     @property
     def idle_time(self) -> float:
@@ -70,6 +139,10 @@ class Topic:
 
     def destroy(self) -> None:
         self.sync()
+        for subber_ref in list(self.subscribers):
+            subber = subber_ref()
+            if subber is not None:
+                _subscribed_topics(subber).discard(self)
         del all_topics[self.name]
         self.name = "<defunct>"
         del self.subscribers
@@ -78,13 +151,21 @@ class Topic:
     def subscribe(self, subscriber: Listener) -> None:
         if not isinstance(subscriber, Listener):
             raise TypeError("subscriber must be a Listener")
-        self.subscribers.add(weakref.ref(subscriber))
+        subber_ref, topics = subscriptions.get(id(subscriber)) or _add_subscriber(subscriber)
+        if subber_ref not in self.subscribers:
+            self.subscribers[subber_ref] = SubscriberStats()
+        topics.add(self)
 
     def unsubscribe(self, subscriber: Listener) -> None:
-        self.subscribers.discard(weakref.ref(subscriber))
+        subscription = subscriptions.get(id(subscriber))
+        if subscription:
+            subber_ref, topics = subscription
+            self.subscribers.pop(subber_ref, None)
+            topics.discard(self)
 
     def send(self, event: Any, synchronous: bool=False) -> Optional[List[Any]]:
         self.events.append(event)
+        self.events_sent += 1
         self.last_event = time.time()
         if synchronous:
             return self.sync()
@@ -92,6 +173,7 @@ class Topic:
 
     def sync(self) -> List[Any]:
         events, self.events = self.events, []
+        self.events_processed += len(events)
         results = []
         for event in events:
             results.extend(self.__sync_event(event))
@@ -99,17 +181,108 @@ class Topic:
 
     def __sync_event(self, event: Any) -> List[Any]:
         results = []
-        for subber_ref in self.subscribers:
+        timer = time.perf_counter
+        for subber_ref, subber_stats in list(self.subscribers.items()):   # a subscriber that dies, is removed
             subber = subber_ref()
             if subber is not None:
+                start = timer()
                 try:
                     result = subber.pubsub_event(self.name, event)
                     results.append(result)
                 except Listener.NotYet:
-                    pass
+                    self.events_notyet += 1
+                subber_stats.add(1, timer() - start)
+        return results
+
+
+class Overflow(enum.Enum):
+    """What a bounded topic does with a new event when its queue is full"""
+    DROP = "drop"           # drop the new event
+    COALESCE = "coalesce"   # replace the queued event with the same key, if any (otherwise drop the new event)
+    SYNC = "sync"           # deliver all queued events right away
+
+
+class BoundedTopic(Topic):
+    """
+    A pubsub topic with a maximum number of queued events, and what to do when that is exceeded.
+    The events are delivered as a single batch per sync, to the subscriber's pubsub_events method.
+    With the COALESCE policy, events that have the same key replace the one that is already queued,
+    also when the queue isn't full yet. The key function returns None for events that never coalesce.
+    Get these from the bounded_topic function.
+    """
+    def __init__(self, name: TopicNameType, max_events: int, overflow: Overflow,
+                 key: Optional[Callable[[Any], Optional[Hashable]]]=None) -> None:
+        if max_events < 1:
+            raise ValueError("max_events must be at least 1")
+        if overflow == Overflow.COALESCE and key is None:
+            raise ValueError("coalescing requires a key function")
+        super().__init__(name)
+        self.max_events = max_events
+        self.overflow = overflow
+        self.key = key
+        self.queued_keys = {}  # type: Dict[Hashable, int]   # event key -> index in the events list
+        self.events_dropped = 0
+
+    def send(self, event: Any, synchronous: bool=False) -> Optional[List[Any]]:
+        self.events_sent += 1
+        self.last_event = time.time()
+        if self.overflow == Overflow.COALESCE and self.key is not None:    # (coalescing topics always have a key)
+            event_key = self.key(event)
+            if event_key is not None:
+                index = self.queued_keys.get(event_key)
+                if index is not None:
+                    self.events[index] = event
+                elif len(self.events) < self.max_events:
+                    self.queued_keys[event_key] = len(self.events)
+                    self.events.append(event)
+                else:
+                    self.events_dropped += 1
+                return self.sync() if synchronous else None
+        if len(self.events) < self.max_events:
+            self.events.append(event)
+        elif self.overflow == Overflow.SYNC:
+            self.events.append(event)
+            synchronous = True
+        else:
+            self.events_dropped += 1
+        return self.sync() if synchronous else None
+
+    def sync(self) -> List[Any]:
+        events, self.events = self.events, []
+        self.queued_keys = {}
+        if not events:
+            return []
+        self.events_processed += len(events)
+        results = []
+        timer = time.perf_counter
+        for subber_ref, subber_stats in list(self.subscribers.items()):
+            subber = subber_ref()
+            if subber is not None:
+                start = timer()
+                results.append(subber.pubsub_events(self.name, events))
+                subber_stats.add(len(events), timer() - start)
         return results
 
 
+def _add_subscriber(subscriber: Listener) -> Tuple[weakref.ReferenceType, Set[Topic]]:
+    key = id(subscriber)
+
+    def subscriber_died(subber_ref: weakref.ReferenceType) -> None:
+        subscription = subscriptions.get(key)
+        if subscription and subscription[0] is subber_ref:   # the id could have been reused by a new subscriber already
+            del subscriptions[key]
+            for topic in list(subscription[1]):
+                topic.subscribers.pop(subber_ref, None)
+
+    subscription = subscriptions[key] = (weakref.ref(subscriber, subscriber_died), set())
+    return subscription
+
+
+def _subscribed_topics(subscriber: Listener) -> Set[Topic]:
+    subscription = subscriptions.get(id(subscriber))
+    return subscription[1] if subscription else set()
+
+
 def topic(name: TopicNameType) -> Topic:
     """Create a topic object (singleton). Name can be a string or a tuple."""
     with __topic_lock:
@@ -119,6 +292,19 @@ def topic(name: TopicNameType) -> Topic:
         return instance
 
 
+def bounded_topic(name: TopicNameType, max_events: int, overflow: Overflow=Overflow.DROP,
+                  key: Optional[Callable[[Any], Optional[Hashable]]]=None) -> BoundedTopic:
+    """Create a bounded topic object (singleton). Name can be a string or a tuple. See BoundedTopic."""
+    with __topic_lock:
+        if name in all_topics:
+            instance = all_topics[name]
+            if not isinstance(instance, BoundedTopic):
+                raise TypeError("topic already exists as a regular topic: " + str(name))
+            return instance
+        instance = all_topics[name] = BoundedTopic(name, max_events, overflow, key)
+        return instance
+
+
 def sync(topic: TopicNameType=None) -> List:
     """Sync all pending events (i.e. push them to the subscribers)"""
     if topic:
@@ -136,7 +322,68 @@ def pending(topicname: TopicNameType=None) -> Dict[TopicNameType, Tuple[int, flo
         return {t.name: (len(t.events), t.idle_time, len(t.subscribers)) for t in topics}
 
 
+def stats(topicname: Optional[TopicNameType]=None) -> Dict[TopicNameType, Dict[str, Any]]:
+    """
+    Return a dictionary from topic name to the statistics of that topic:
+    the number of events sent, processed, pending, refused (NotYet) and dropped (bounded topics),
+    and per subscriber: the number of events, total/average/max processing time and the number of slow events.
+    """
+    with __topic_lock:
+        topics = [all_topics[topicname]] if topicname else list(all_topics.values())
+    result = {}
+    for t in topics:
+        result[t.name] = {
+            "sent": t.events_sent,
+            "processed": t.events_processed,
+            "pending": len(t.events),
+            "notyet": t.events_notyet,
+            "dropped": getattr(t, "events_dropped", 0),
+            "subscribers": _subscriber_stats(t)
+        }
+    return result
+
+
+def _subscriber_stats(topic: Topic) -> Dict[str, Dict[str, Any]]:
+    # the statistics of the subscribers that received events, by name (subscribers with the same name are numbered)
+    result = {}     # type: Dict[str, Dict[str, Any]]
+    for subber_ref, subber_stats in list(topic.subscribers.items()):
+        subber = subber_ref()
+        if subber is not None and subber_stats.events:
+            name = unique_name = subscriber_name(subber)
+            number = 1
+            while unique_name in result:
+                number += 1
+                unique_name = "%s (%d)" % (name, number)
+            result[unique_name] = subber_stats.as_dict()
+    return result
+
+
+def slow_subscribers() -> List[Tuple[TopicNameType, str, Dict[str, Any]]]:
+    """
+    Return the subscribers that took longer than the slow_subscriber_threshold to process an event,
+    as (topic name, subscriber name, subscriber statistics) tuples. The slowest (max time) come first.
+    """
+    result = []
+    for topicname, topic_stats in stats().items():
+        for name, subscriber_stats in topic_stats["subscribers"].items():
+            if subscriber_stats["slow_events"]:
+                result.append((topicname, name, subscriber_stats))
+    return sorted(result, key=lambda info: info[2]["max_time"], reverse=True)
+
+
+def reset_stats() -> None:
+    """reset the statistics of all topics"""
+    with __topic_lock:
+        topics = list(all_topics.values())
+    for t in topics:
+        t.reset_stats()
+
+
 def unsubscribe_all(subscriber: Listener) -> None:
     """unsubscribe the given subscriber object from all topics that it may have been subscribed to."""
-    for topic in list(all_topics.values()):
-        topic.unsubscribe(subscriber)
+    subscription = subscriptions.get(id(subscriber))
+    if subscription:
+        subber_ref, topics = subscription
+        for topic in list(topics):
+            topic.subscribers.pop(subber_ref, None)
+        topics.clear()
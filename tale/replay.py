@@ -0,0 +1,132 @@
+"""
+Recording of the commands that the players enter, to be able to replay them later.
+The replay is deterministic (the random generator is seeded with the recorded seed)
+and runs without any I/O as fast as possible, so it can be used for performance regression runs.
+See driver_replay.py for the replaying driver.
+
+The log is a text file with one json object per line. The first line is the header,
+the other lines are the events: a player entering the game, a command, an answer to a question
+of an async dialog, or a player leaving the game.
+The answers that are not echoed (passwords) are not recorded, so a replay of a session in which
+a player answers such a question after entering the game, will not match the recording.
+
+'Tale' mud driver, mudlib and interactive fiction framework
+Copyright by Irmen de Jong (irmen@razorvine.net)
+"""
+
+import datetime
+import json
+import random
+import zlib
+from typing import Any, Dict, IO, Iterator, Optional, Set, Tuple
+
+from . import __version__ as tale_version_str
+from .player import Player
+
+
+__all__ = ["CommandRecorder", "read_log", "output_checksum"]
+
+LOG_FORMAT = "tale-command-log"
+LOG_VERSION = 1
+
+
+def output_checksum(output_before: str, player: Player) -> int:
+    """
+    checksum of the text that was added to the player's output buffer since output_before was taken.
+    Surrounding whitespace is ignored: the paragraph separator depends on when the buffer was last flushed.
+    """
+    output = player._output.text()
+    if output.startswith(output_before):
+        output = output[len(output_before):]
+    return zlib.crc32(output.strip().encode("utf-8"))
+
+
+def player_info(player: Player) -> Dict[str, Any]:
+    """the information needed to recreate the player when replaying"""
+    location = player.location
+    return {
+        "title": player.title,
+        "gender": player.gender,
+        "race": player.stats.race,
+        "privileges": sorted(player.privileges),
+        "money": player.money,
+        "location": location.name if location else None,
+        "location_vnum": location.vnum if location else None,
+    }
+
+
+class CommandRecorder:
+    """
+    Records every command line per player, with the server tick number it was entered in.
+    The driver seeds the random generator with the seed of the recording.
+    """
+    def __init__(self, filename: str, seed: Optional[int]=None) -> None:
+        self.filename = filename
+        self.seed = random.randrange(2**32) if seed is None else seed
+        self.file = None    # type: Optional[IO[str]]
+        self.known_players = set()     # type: Set[str]
+
+    def start(self, driver: Any) -> None:
+        """Called by the driver when the story has been loaded, just before the main loop starts."""
+        self.file = open(self.filename, "w", encoding="utf-8", buffering=1)
+        config = driver.story.config
+        self.write({
+            "format": LOG_FORMAT,
+            "version": LOG_VERSION,
+            "tale_version": tale_version_str,
+            "story": config.name,
+            "story_version": config.version,
+            "game_mode": driver.game_mode.value,
+            "seed": self.seed,
+            "server_started": driver.server_started.isoformat(),
+            "server_tick_time": config.server_tick_time,
+            "recorded": datetime.datetime.now().isoformat()
+        })
+
+    def write(self, event: Dict[str, Any]) -> None:
+        if self.file:
+            self.file.write(json.dumps(event, sort_keys=True) + "\n")
+
+    def close(self) -> None:
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def before_command(self, tick: int, player: Player) -> str:
+        """Called before the command is executed. Returns the current output of the player, to compare with afterwards."""
+        if player.name not in self.known_players:
+            self.enter(tick, player)
+        return player._output.text()
+
+    def enter(self, tick: int, player: Player) -> None:
+        """Called when the player has entered the game."""
+        self.known_players.add(player.name)
+        self.write({"tick": tick, "player": player.name, "enter": player_info(player)})
+
+    def command(self, tick: int, player: Player, cmd: str, output_before: str) -> None:
+        self.write({"tick": tick, "player": player.name, "cmd": cmd, "output": output_checksum(output_before, player)})
+
+    def answer(self, tick: int, player: Player, text: str, output_before: str) -> None:
+        """Called after the player has answered a question of an async dialog (see Driver._answer_dialog)."""
+        self.write({"tick": tick, "player": player.name, "answer": text, "output": output_checksum(output_before, player)})
+
+    def leave(self, tick: int, player: Player) -> None:
+        if player.name in self.known_players:
+            self.known_players.discard(player.name)
+            self.write({"tick": tick, "player": player.name, "leave": True})
+
+
+def read_log(filename: str) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Reads a command log file. Returns the header, and an iterator over the events."""
+    log = open(filename, encoding="utf-8")
+    header = json.loads(log.readline())
+    if header.get("format") != LOG_FORMAT or header.get("version") != LOG_VERSION:
+        log.close()
+        raise ValueError("not a (supported) command log file")
+
+    def events() -> Iterator[Dict[str, Any]]:
+        with log:
+            for line in log:
+                if line.strip():
+                    yield json.loads(line)
+    return header, events()
@@ -8,7 +8,7 @@ from .story import StoryConfig, MoneyType, GameMode, TickMethod
 from .player import Player, PlayerConnection
 from .errors import TaleError, ActionRefused
 from .driver import Deferred
-from .util import GameDateTime
+from .util import GameDateTime, object_vars
 from .shop import ShopBehavior, Shopkeeper
 import serpent
 
@@ -100,10 +100,15 @@ class TaleSerializer:
     def add_basic_properties(self, state: Dict[str, Any], obj: MudObject) -> None:
         state["__class__"] = qual_classname(obj)
         state["__base_class__"] = qual_baseclassname(obj)
+        state["name"] = obj.name
+        # (the containers are created when they're needed, don't create them just to save them)
+        state["aliases"] = obj._aliases or set()    # (a frozenset, if still shared with a prototype)
+        state["verbs"] = obj._verbs or {}
         state["title"] = obj.title
         state["descr"] = obj.description
         state["short_descr"] = obj.short_description
-        state["extra_desc"] = obj.extra_desc
+        state["extra_desc"] = dict(obj._extradesc or {})
+        state["story_data"] = obj._story_data or {}
 
     def add_inventory_property(self, state: Dict[str, Any], obj: MudObject) -> None:
         try:
@@ -120,7 +125,7 @@ class TaleSerializer:
         ser._serialize(state, out, indentlevel)
 
     def serialize_deferred(self, obj: Deferred, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
-        state = dict(vars(obj))
+        state = {name: getattr(obj, name) for name in obj.serialized_attributes}
         state["__class__"] = qual_classname(obj)
         if not isinstance(state["owner"], str):
             try:
@@ -147,7 +152,7 @@ class TaleSerializer:
         ser._serialize(state, out, indentlevel)
 
     def serialize_player(self, obj: Player, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
-        state = dict(vars(obj))
+        state = object_vars(obj)
         # remove stuff we don't want to serialize at all
         unserialized_attrs = {"subjective", "possessive", "objective", "teleported_from", "soul",
                               "input_is_available", "transcript", "last_input_time", "previous_commandline"}
@@ -174,7 +179,7 @@ class TaleSerializer:
     def serialize_item(self, obj: Item, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
         if obj.contained_in and obj not in obj.contained_in:
             raise TaleError("item {} containment inconsistency".format(obj))
-        state = dict(vars(obj))
+        state = object_vars(obj)
         # remove stuff we don't want to serialize at all
         for name in list(state):
             if name.startswith("_"):
@@ -188,7 +193,7 @@ class TaleSerializer:
     def serialize_living(self, obj: Living, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
         if obj.location and obj.location is not _limbo and obj not in obj.location:
             raise TaleError("living {} location inconsistency".format(obj))
-        state = dict(vars(obj))
+        state = object_vars(obj)
         # remove stuff we don't want to serialize at all
         unserialized_attrs = {"subjective", "possessive", "objective", "teleported_from", "soul", "previous_commandline"}
         skipped_attrs = set()
@@ -209,7 +214,7 @@ class TaleSerializer:
         ser._serialize(state, out, indentlevel)
 
     def serialize_exit(self, obj: Exit, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
-        state = dict(vars(obj))
+        state = object_vars(obj)
         # remove stuff we don't want to serialize at all
         for name in list(state):
             if name.startswith("_") and name != "_target_str":
@@ -222,15 +227,15 @@ class TaleSerializer:
         ser._serialize(state, out, indentlevel)
 
     def serialize_location(self, obj: Location, ser: serpent.Serializer, out: List[str], indentlevel: int) -> None:
-        state = dict(vars(obj))
+        state = object_vars(obj)
         # remove stuff we don't want to serialize at all
         for name in list(state):
             if name.startswith("_"):
                 del state[name]
         self.add_basic_properties(state, obj)
         # livings and items, and the exits, present in this location:
-        state["livings"] = {mudobj_ref(l) for l in state["livings"]}
-        state["items"] = {mudobj_ref(i) for i in state["items"]}
+        state["livings"] = {mudobj_ref(l) for l in obj.livings}
+        state["items"] = {mudobj_ref(i) for i in obj.items}
         state["exits"] = {mudobj_ref(e) for e in state["exits"].values()}
         ser._serialize(state, out, indentlevel)
 
@@ -307,6 +312,7 @@ class TaleDeserializer:
                    race=data.pop("race"), descr=data.pop("descr"), short_descr=data.pop("short_descr"))
         p.privileges = set(data.pop("privileges"))
         p.aliases = set(data.pop("aliases"))
+        p.verbs = data.pop("verbs")
         inv = data.pop("inventory")
         loc = data.pop("location")
         known_locs = data.pop("known_locations")
@@ -342,6 +348,7 @@ class TaleDeserializer:
         del data["vnum"]
         inv = data.pop("inventory", None)
         item.aliases = set(data.pop("aliases"))
+        item.verbs = data.pop("verbs")
         self.apply_attributes(item, data)
         return {
             "item": item,
@@ -369,6 +376,7 @@ class TaleDeserializer:
         del data["vnum"]
         del data["descr"]
         money.aliases = set(data.pop("aliases"))
+        money.verbs = data.pop("verbs")
         self.apply_attributes(money, data)
         return {
             "item": money,
@@ -390,6 +398,7 @@ class TaleDeserializer:
             living.init_names(data.pop("name"), title=data.pop("title"), descr=data.pop("descr"), short_descr=data.pop("short_descr"))
             del data["race"]
         living.aliases = set(data.pop("aliases"))
+        living.verbs = data.pop("verbs")
         living.privileges = set(data.pop("privileges"))
         inv = data.pop("inventory")
         loc = data.pop("location")
@@ -56,6 +56,7 @@ class StoryConfig:
         self.money_type = MoneyType.NOTHING  # money type modern/fantasy/nothing
         self.server_tick_method = TickMethod.COMMAND   # command (waits for player entry) or timer (async timer driven)
         self.server_tick_time = 5.0          # time between server ticks (in seconds) (usually 1.0 for 'timer' tick method)
+        self.server_tick_budget = 0.0        # max. time (seconds) for deferreds in a server tick, the rest is carried over (0=no limit)
         self.gametime_to_realtime = 1        # meaning: game time is X times real time (only used with "timer" tick method) (>=0)
         self.max_wait_hours = 2              # the max. number of hours (gametime) the player is allowed to wait (>=0)
         self.display_gametime = False        # enable/disable display of the game time at certain moments
@@ -65,7 +65,11 @@ class HttpIo(iobase.IoAdapterBase):
         self.__html_to_browser = []    # type: List[str]   # the lines that need to be displayed in the player's browser
         self.__html_special = []       # type: List[str]   # special out of band commands (such as 'clear')
         self.__html_to_browser_lock = Lock()
-        self.__new_html_available = Event()
+        self.__new_html_available = self.create_html_available_event()
+
+    def create_html_available_event(self) -> Any:
+        """The event that signals that there is new html for the browser. Override to use another kind of event."""
+        return Event()
 
     def destroy(self) -> None:
         self.__new_html_available.set()
@@ -5,15 +5,19 @@ Webbrowser based I/O for a multi player ('mud') server.
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
+import asyncio
 import hashlib
 import http.cookies
+import io
 import random
 import sys
 import time
 import socket
+import traceback
 from html import escape as html_escape
 from socketserver import ThreadingMixIn
-from typing import Dict, Iterable, Any, List, Tuple
+from typing import Dict, Iterable, Any, List, Tuple, Optional, Callable
+from urllib.parse import unquote
 from wsgiref.simple_server import make_server, WSGIServer, WSGIRequestHandler
 
 from .. import vfs
@@ -22,7 +26,7 @@ from .. import __version__ as tale_version_str
 from ..driver import Driver
 from ..player import PlayerConnection
 
-__all__ = ["MudHttpIo", "TaleMudWsgiApp"]
+__all__ = ["MudHttpIo", "AsyncMudHttpIo", "TaleMudWsgiApp", "AsyncWsgiServer"]
 
 
 class MemorySessionFactory:
@@ -70,6 +74,44 @@ class MudHttpIo(HttpIo):
         pass
 
 
+class AsyncHtmlAvailableEvent:
+    """
+    Signals that there is new html for the browser, for the asyncio web server.
+    The threading.Event-like wait() never blocks: the server awaits wait_async() instead,
+    before it takes the next chunk from the event stream. It must only be used from the event loop's thread.
+    """
+    def __init__(self) -> None:
+        self.event = asyncio.Event()
+
+    def set(self) -> None:
+        self.event.set()
+
+    def clear(self) -> None:
+        self.event.clear()
+
+    def is_set(self) -> bool:
+        return self.event.is_set()
+
+    def wait(self, timeout: Optional[float]=None) -> bool:
+        return self.event.is_set()
+
+    async def wait_async(self, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.event.is_set()
+
+
+class AsyncMudHttpIo(MudHttpIo):
+    """
+    I/O adapter for the browser interface when the mud server runs on an asyncio event loop.
+    """
+    def create_html_available_event(self) -> AsyncHtmlAvailableEvent:
+        self.html_available = AsyncHtmlAvailableEvent()
+        return self.html_available
+
+
 class TaleMudWsgiApp(TaleWsgiAppBase):
     """
     The actual wsgi app that the player's browser connects to.
@@ -89,6 +131,12 @@ class TaleMudWsgiApp(TaleWsgiAppBase):
                                   handler_class=CustomRequestHandler, server_class=CustomWsgiServer)
         return wsgi_server
 
+    @classmethod
+    def create_async_app_server(cls, driver: Driver, *,
+                                use_ssl: bool=False, ssl_certs: Optional[Tuple[str, str, str]]=None) -> 'AsyncWsgiServer':
+        wsgi_app = SessionMiddleware(cls(driver, use_ssl, ssl_certs), MemorySessionFactory())    # type: ignore
+        return AsyncWsgiServer(wsgi_app, driver.story.config.mud_host, driver.story.config.mud_port, use_ssl=use_ssl)
+
     def wsgi_handle_story(self, environ: Dict[str, Any], parameters: Dict[str, str],
                           start_response: WsgiStartResponseType) -> Iterable[bytes]:
         session = environ["wsgi.session"]
@@ -175,6 +223,172 @@ class CustomWsgiServer(ThreadingMixIn, WSGIServer):
         return super().server_bind()
 
 
+class AsyncWsgiServer:
+    """
+    A small HTTP/1.1 server that runs a wsgi app on an asyncio event loop, without any threads.
+    The wsgi app is called on the event loop itself, so it must not block.
+    Event stream responses (server-sent events) are handled specially: before the next chunk is taken
+    from the response, the server awaits the html-available signal of the player's AsyncMudHttpIo.
+    This way, idle event stream connections don't need an OS thread each.
+    """
+    request_queue_size = CustomWsgiServer.request_queue_size
+    ssl_cert_locations = CustomWsgiServer.ssl_cert_locations
+    keepalive_timeout = 60.0
+    eventsource_keepalive = 15.0
+    max_header_lines = 100
+    max_content_length = 1000000
+
+    def __init__(self, app: Callable, host: str, port: int, use_ssl: bool=False) -> None:
+        self.app = app
+        self.use_ssl = use_ssl
+        self.address_family = socket.AF_INET
+        if host and host[0] == '[' and host[-1] == ']':
+            self.address_family = socket.AF_INET6
+            host = host[1:-1]
+        self.host = host
+        self.port = port
+        self.server = None     # type: Optional[asyncio.AbstractServer]
+        self.server_address = (host, port)     # type: Tuple
+
+    async def start(self) -> None:
+        ssl_context = None
+        if self.use_ssl:
+            print("\n\nUsing SSL\n\n")
+            import ssl
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(self.ssl_cert_locations[0], self.ssl_cert_locations[1] or None, self.ssl_cert_locations[2] or None)
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, family=self.address_family,
+                                                 ssl=ssl_context, backlog=self.request_queue_size, reuse_address=True)
+        self.server_address = self.server.sockets[0].getsockname()
+
+    def close(self) -> None:
+        if self.server:
+            self.server.close()
+            self.server = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if not request:
+                    break
+                if not await self.handle_request(request, writer):
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+        """Reads a request and returns the wsgi environment for it. Returns None if the connection was closed."""
+        request_line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+        if not request_line:
+            return None
+        method, target, version = request_line.decode("iso-8859-1").split()
+        path, _, query = target.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": unquote(path, "iso-8859-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.host or "localhost",
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": version,
+            "SCRIPT_NAME": "",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "https" if self.use_ssl else "http",
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }   # type: Dict[str, Any]
+        for _ in range(self.max_header_lines):
+            raw_header = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+            header = raw_header.decode("iso-8859-1").rstrip("\r\n")
+            if not header:
+                break
+            name, _, value = header.partition(":")
+            name = name.strip().upper().replace("-", "_")
+            value = value.strip()
+            if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[name] = value
+            else:
+                key = "HTTP_" + name
+                environ[key] = environ[key] + "," + value if key in environ else value
+        else:
+            raise ValueError("too many headers")
+        content_length = int(environ.get("CONTENT_LENGTH") or 0)
+        if content_length > self.max_content_length:
+            raise ValueError("maximum content length exceeded")
+        body = await reader.readexactly(content_length) if content_length else b""
+        environ["CONTENT_LENGTH"] = str(content_length)
+        environ["wsgi.input"] = io.BytesIO(body)
+        return environ
+
+    async def handle_request(self, environ: Dict[str, Any], writer: asyncio.StreamWriter) -> bool:
+        """Runs the wsgi app for the request and writes the response. Returns True if the connection can be kept alive."""
+        response_start = []   # type: List[Any]
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info: Any=None) -> Callable:
+            response_start[:] = [status, headers]
+            return writer.write
+
+        try:
+            result = self.app(environ, start_response)
+            chunks = iter(result)
+            try:
+                first_chunk = next(chunks)
+            except StopIteration:
+                first_chunk = b""
+        except Exception:
+            print("ERROR IN WEB REQUEST:\n", "".join(traceback.format_exc()), file=sys.stderr)
+            response_start = ["500 Internal server error", [("Content-Type", "text/plain")]]
+            result = chunks = iter([])
+            first_chunk = b"Error 500: Internal server error"
+        status, headers = response_start
+        content_type = next((value for name, value in headers if name.lower() == "content-type"), "")
+        try:
+            if content_type.startswith("text/event-stream"):
+                await self.write_event_stream(environ, status, headers, first_chunk, chunks, writer)
+                return False
+            body = first_chunk + b"".join(chunks)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+        keep_alive = environ["SERVER_PROTOCOL"] == "HTTP/1.1" and environ.get("HTTP_CONNECTION", "").lower() != "close"
+        headers = [(name, value) for name, value in headers if name.lower() != "content-length"]
+        headers.append(("Content-Length", str(len(body))))
+        headers.append(("Connection", "keep-alive" if keep_alive else "close"))
+        self.write_head(writer, status, headers)
+        writer.write(body)
+        await writer.drain()
+        return keep_alive
+
+    async def write_event_stream(self, environ: Dict[str, Any], status: str, headers: List[Tuple[str, str]],
+                                 first_chunk: bytes, chunks: Iterable[bytes], writer: asyncio.StreamWriter) -> None:
+        self.write_head(writer, status, headers + [("Connection", "close")])
+        writer.write(first_chunk)
+        await writer.drain()
+        session = environ.get("wsgi.session") or {}
+        while True:
+            conn = session.get("player_connection")
+            io_adapter = conn.io if conn else None
+            if isinstance(io_adapter, AsyncMudHttpIo):
+                await io_adapter.html_available.wait_async(self.eventsource_keepalive)
+            else:
+                await asyncio.sleep(0)
+            try:
+                chunk = next(chunks)    # type: ignore
+            except StopIteration:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+    def write_head(self, writer: asyncio.StreamWriter, status: str, headers: List[Tuple[str, str]]) -> None:
+        lines = ["HTTP/1.1 " + status, "Server: Tale/" + tale_version_str]
+        lines.extend("%s: %s" % header for header in headers)
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1"))
+
+
 class SessionMiddleware:
     """Wsgi middleware that injects session cookie logic."""
 
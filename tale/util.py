@@ -5,6 +5,7 @@ Utility stuff
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
+import bisect
 import datetime
 import functools
 import inspect
@@ -13,7 +14,7 @@ import sys
 import traceback
 from decimal import Decimal
 from types import MemberDescriptorType
-from typing import List, Tuple, Dict, Union, Sequence, Any, Callable, Iterable, Type, Set
+from typing import List, Tuple, Dict, Union, Sequence, Any, Callable, Iterable, Type, Set, Optional
 
 from . import lang, mud_context
 from .errors import ParseError, ActionRefused, TaleError
@@ -418,6 +419,173 @@ def sorted_by_title(stuff: Iterable[Any]) -> Iterable[Any]:
     return sorted(stuff, key=lambda thing: thing.title.lower())
 
 
+@functools.lru_cache()
+def _slot_names(klass: type) -> Tuple[str, ...]:
+    names = []
+    for cls in klass.__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for name in ([slots] if isinstance(slots, str) else slots):
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = "_" + cls.__name__.lstrip("_") + name     # private names are mangled
+            names.append(name)
+    return tuple(names)
+
+
+def object_vars(obj: Any) -> Dict[str, Any]:
+    """
+    Returns a new dict with the attributes of the object, like vars(obj) does,
+    but including the attributes that are stored in __slots__ (if they have a value).
+    """
+    attributes = {}     # type: Dict[str, Any]
+    for name in _slot_names(obj.__class__):
+        try:
+            attributes[name] = getattr(obj, name)
+        except AttributeError:
+            pass
+    if hasattr(obj, "__dict__"):
+        attributes.update(vars(obj))
+    return attributes
+
+
+class PrefixIndex:
+    """
+    A sorted list of distinct words, to quickly find all words starting with a given prefix.
+    Uses binary search in the sorted list, O(log n), like lang.adverb_by_prefix.
+    Adding or removing a word keeps the list sorted.
+    """
+    __slots__ = ("words",)
+
+    def __init__(self, words: Iterable[str]=()) -> None:
+        self.words = sorted(set(words))
+
+    def __contains__(self, word: str) -> bool:
+        i = bisect.bisect_left(self.words, word)
+        return i < len(self.words) and self.words[i] == word
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: str) -> None:
+        i = bisect.bisect_left(self.words, word)
+        if i >= len(self.words) or self.words[i] != word:
+            self.words.insert(i, word)
+
+    def discard(self, word: str) -> None:
+        i = bisect.bisect_left(self.words, word)
+        if i < len(self.words) and self.words[i] == word:
+            del self.words[i]
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """all words starting with the given prefix, in sorted order"""
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_right(self.words, prefix + "\U0010ffff", start)
+        return self.words[start:end]
+
+    def first_with_prefix(self, prefix: str) -> Optional[str]:
+        """the first word (in sorted order) starting with the given prefix, or None"""
+        i = bisect.bisect_left(self.words, prefix)
+        if i < len(self.words) and self.words[i].startswith(prefix):
+            return self.words[i]
+        return None
+
+
+def edit_distance(word1: str, word2: str, max_distance: Optional[int]=None) -> int:
+    """
+    The number of character insertions, deletions, substitutions and transpositions of two adjacent
+    characters needed to change one word into the other (the 'optimal string alignment' distance).
+    If max_distance is given, the calculation stops as soon as the distance is known to be larger,
+    and max_distance + 1 is returned.
+    """
+    if word1 == word2:
+        return 0
+    if max_distance is None:
+        max_distance = max(len(word1), len(word2))
+    if abs(len(word1) - len(word2)) > max_distance:
+        return max_distance + 1
+    before_previous = []   # type: List[int]
+    previous = list(range(len(word2) + 1))
+    for i, char1 in enumerate(word1, start=1):
+        current = [i]
+        for j, char2 in enumerate(word2, start=1):
+            cost = 0 if char1 == char2 else 1
+            distance = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if cost and i > 1 and j > 1 and char1 == word2[j - 2] and word1[i - 2] == char2:
+                distance = min(distance, before_previous[j - 2] + 1)     # transposition
+            current.append(distance)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+class SpellingIndex:
+    """
+    Finds the words that are within a small edit distance of a (misspelled) word, to suggest corrections.
+    Every word is stored under all variants of it with up to max_distance characters deleted
+    (the 'symmetric delete' method). Looking up a word only needs the deletion variants of that word
+    and a few dictionary lookups, and then calculates the exact edit distance for the handful of candidates,
+    instead of calculating the edit distance to every word in the index.
+    Words can be added and removed.
+    """
+    __slots__ = ("max_distance", "words", "_deletes")
+
+    def __init__(self, words: Iterable[str]=(), max_distance: int=2) -> None:
+        self.max_distance = max_distance
+        self.words = set()   # type: Set[str]
+        self._deletes = {}   # type: Dict[str, List[str]]  # deletion variant -> words
+        for word in words:
+            self.add(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: str) -> None:
+        if word not in self.words:
+            self.words.add(word)
+            for variant in self._variants(word, self.max_distance):
+                self._deletes.setdefault(variant, []).append(word)
+
+    def discard(self, word: str) -> None:
+        if word in self.words:
+            self.words.remove(word)
+            for variant in self._variants(word, self.max_distance):
+                words = self._deletes[variant]
+                words.remove(word)
+                if not words:
+                    del self._deletes[variant]
+
+    def suggest(self, word: str, max_distance: Optional[int]=None) -> List[Tuple[int, str]]:
+        """
+        The words within the max distance (default and upper limit: the max_distance of the index)
+        of the given word, as (distance, word) tuples, closest first.
+        """
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()     # type: Set[str]
+        for variant in self._variants(word, max_distance):
+            candidates.update(self._deletes.get(variant, ()))
+        suggestions = []
+        for candidate in candidates:
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                suggestions.append((distance, candidate))
+        return sorted(suggestions)
+
+    @staticmethod
+    def _variants(word: str, max_distance: int) -> Set[str]:
+        """the word, and all words that can be made by deleting up to max_distance characters from it"""
+        variants = {word}
+        deleted = {word}
+        for _ in range(max_distance):
+            deleted = {w[:i] + w[i + 1:] for w in deleted for i in range(len(w))}
+            variants |= deleted
+        return variants
+
+
 def format_traceback(ex_type: Type=None, ex_value: Any=None, ex_tb: Any=None, detailed: bool=True, with_self: bool=False) -> List[str]:
     """Formats an exception traceback. If you ask for detailed formatting,
     the result will contain info on the variables in each stack frame.
@@ -478,7 +646,7 @@ def format_traceback(ex_type: Type=None, ex_value: Any=None, ex_tb: Any=None, de
                             result.append("    %s = %s\n" % (name2, makestrvalue(value)))
                             if name2 == "self" and with_self:
                                 # print the local variables of the class instance
-                                for name3, value in vars(value).items():
+                                for name3, value in object_vars(value).items():
                                     result.append("        self.%s = %s\n" % (name3, makestrvalue(value)))
                 skiplocals = False
                 ex_tb = ex_tb.tb_next
@@ -12,7 +12,10 @@ The soul parsing has been moved to the Soul class in the base module.
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
-from typing import Dict, Tuple, Sequence
+import re
+from typing import Dict, Tuple, Sequence, List, Optional, Union
+
+from .util import PrefixIndex, SpellingIndex
 
 
 DEFA = 1  # adds HOW+AT   (you smile happily at Fritz)
@@ -368,6 +371,178 @@ assert NONLIVING_OK_VERBS.issubset(VERBS.keys())
 MOVEMENT_VERBS = {"enter", "climb", "crawl", "go", "move"}     # used to move through an exit. Note: 'flee' and 'run' are special
 
 
+# escape codes in the compiled verb templates.
+# WHO..SUBJ depend on who sees the message, HOW..MSG are filled in once per parsed command.
+WHO, YOUR, MY, POSS, IS, SUBJ, HOW, WHERE, WHAT, MSG = range(10)
+_escape_codes = {"WHO": WHO, "YOUR": YOUR, "MY": MY, "POSS": POSS, "IS": IS, "SUBJ": SUBJ,
+                 "HOW": HOW, "WHERE": WHERE, "WHAT": WHAT, "MSG": MSG}
+_escape_regex = re.compile(r" \n(" + "|".join(sorted(_escape_codes, key=len, reverse=True)) + ")")
+
+TemplateType = Tuple[Union[str, int], ...]
+
+
+def _spacify(string: str) -> str:
+    return " " + string.lstrip(" \t") if string else ""
+
+
+def _tokenize(action: str) -> TemplateType:
+    """split an action text into literal strings and escape codes (the escape includes the space before it)"""
+    segments = []   # type: List[Union[str, int]]
+    position = 0
+    for match in _escape_regex.finditer(action):
+        if match.start() > position:
+            segments.append(action[position:match.start()])
+        segments.append(_escape_codes[match.group(1)])
+        position = match.end()
+    if position < len(action):
+        segments.append(action[position:])
+    return tuple(segments)
+
+
+class VerbTemplate:
+    """
+    A verb from the VERBS table, compiled into message templates.
+    The action texts are split into literal text and escape codes once, so creating the messages
+    doesn't have to scan the texts for every escape over and over again.
+    The actions are (player template, room template), for a verb without and with targets.
+    """
+    __slots__ = ("verb", "verbdata", "vtype", "adverb", "message", "where", "message_verb", "needs_person", "actions", "escapes")
+
+    def __init__(self, verb: str, verbdata: Tuple) -> None:
+        self.verb = verb
+        self.verbdata = verbdata     # the raw VERBS entry this was compiled from
+        self.vtype = vtype = verbdata[0]
+        defaults = verbdata[1] or ()    # type: Tuple
+        self.adverb = defaults[0] if defaults else ""
+        self.message = defaults[1] if len(defaults) > 1 else ""
+        self.where = _tokenize(" " + defaults[2]) if len(defaults) > 2 and defaults[2] else ()    # type: TemplateType
+        self.message_verb = "\nMSG" in verbdata[2] or "\nWHAT" in verbdata[2]
+        self.needs_person = False    # does the verb without targets fail because it needs one?
+        self.actions = None          # type: Optional[Tuple[Tuple[TemplateType, TemplateType], Tuple[TemplateType, TemplateType]]]
+        if vtype == DEUX:
+            self.needs_person = "\nWHO" in verbdata[2] or "\nPOSS" in verbdata[2]
+            action = (_tokenize(verbdata[2]), _tokenize(verbdata[3]))
+            self.actions = (action, action)
+        elif vtype == QUAD:
+            self.actions = ((_tokenize(verbdata[2]), _tokenize(verbdata[3])), (_tokenize(verbdata[4]), _tokenize(verbdata[5])))
+        elif vtype in (DEFA, PREV, PHYS, SHRT, PERS, SIMP):
+            self.actions = (self._compile_action(False), self._compile_action(True))    # type: ignore
+        # which escapes occur in the templates, so the values for the others don't have to be determined
+        self.escapes = frozenset(segment for actions in self.actions or () for action in actions
+                                 for segment in action + self.where if segment.__class__ is int)
+
+    def _compile_action(self, with_targets: bool) -> Tuple[TemplateType, TemplateType]:
+        verbdata = self.verbdata
+        if self.vtype == DEFA:
+            action = self.verb + "$ \nHOW \nAT"
+        elif self.vtype == PREV:
+            action = self.verb + "$" + _spacify(verbdata[2]) + " \nWHO \nHOW"
+        elif self.vtype == PHYS:
+            action = self.verb + "$" + _spacify(verbdata[2]) + " \nWHO \nHOW \nWHERE"
+        elif self.vtype == SHRT:
+            action = self.verb + "$" + _spacify(verbdata[2]) + " \nHOW"
+        elif self.vtype == PERS:
+            action = verbdata[3] if with_targets else verbdata[2]
+        else:
+            action = verbdata[2]
+        if with_targets and len(verbdata) > 3:
+            action = action.replace(" \nAT", _spacify(verbdata[3]) + " \nWHO")
+        else:
+            action = action.replace(" \nAT", "")
+            if not with_targets:
+                self.needs_person = "\nWHO" in action or "\nPOSS" in action
+        return _tokenize(action.replace("$", "")), _tokenize(action.replace("$", "s"))
+
+    @staticmethod
+    def fill(template: TemplateType, how: str, where: Union[str, TemplateType], what: str, msg: str) -> List[Union[str, int]]:
+        """
+        Fill in the HOW, WHERE, WHAT and MSG escapes and strip the resulting action.
+        The where can also be given as a template itself (the default where of the verb can contain escapes).
+        Returns a list with the literal texts on the even positions and the remaining escape codes
+        on the odd positions in between. Use render() to fill in those for a particular observer.
+        """
+        values = (how, where, what, msg)
+        result = []     # type: List[Union[str, int]]
+        text = ""
+        for segment in template:
+            if segment.__class__ is str:
+                text += segment     # type: ignore
+            elif segment >= HOW:    # type: ignore
+                value = values[segment - HOW]   # type: ignore
+                if value.__class__ is str:
+                    text += value       # type: ignore
+                else:
+                    for subsegment in value:
+                        if subsegment.__class__ is str:
+                            text += subsegment  # type: ignore
+                        else:
+                            result.append(text)
+                            result.append(subsegment)
+                            text = ""
+            else:
+                result.append(text)
+                result.append(segment)
+                text = ""
+        result.append(text)
+        result[0] = result[0].lstrip()      # type: ignore
+        result[-1] = result[-1].rstrip()    # type: ignore
+        return result
+
+    @staticmethod
+    def render(action: List[Union[str, int]], values: Sequence[str]) -> str:
+        """Create the message from a filled action, values are the texts for the WHO, YOUR, MY, POSS, IS and SUBJ escapes."""
+        pieces = list(action)
+        pieces[1::2] = [values[escape] for escape in action[1::2]]  # type: ignore
+        return "".join(pieces)     # type: ignore
+
+
+COMPILED_VERBS = {}    # type: Dict[str, VerbTemplate]
+_verb_prefixes = PrefixIndex()
+_verb_spelling = None     # type: Optional[SpellingIndex]   # created when it's needed for the first time
+
+
+def compile_verbs() -> None:
+    """(Re)compile all verbs in the VERBS table into VerbTemplates, and index them by prefix"""
+    global COMPILED_VERBS, _verb_prefixes, _verb_spelling
+    COMPILED_VERBS = {verb: VerbTemplate(verb, verbdata) for verb, verbdata in VERBS.items()}
+    _verb_prefixes = PrefixIndex(VERBS)
+    _verb_spelling = None
+
+
+def verbs_by_prefix(prefix: str) -> List[str]:
+    """
+    Return a sorted list of the verbs starting with the given prefix.
+    Uses binary search in the sorted verbs list, O(log n)
+    """
+    if len(_verb_prefixes) != len(VERBS):
+        compile_verbs()     # the VERBS table has been changed directly
+    return _verb_prefixes.with_prefix(prefix)
+
+
+def verbs_by_spelling(word: str, max_distance: int) -> List[Tuple[int, str]]:
+    """Return the verbs that are within the edit distance of the (misspelled) word, as (distance, verb) tuples."""
+    global _verb_spelling
+    if len(_verb_prefixes) != len(VERBS):
+        compile_verbs()     # the VERBS table has been changed directly
+    if _verb_spelling is None:
+        _verb_spelling = SpellingIndex(VERBS, max_distance=2)
+    return _verb_spelling.suggest(word, max_distance)
+
+
+def get_template(verb: str) -> Optional[VerbTemplate]:
+    """
+    Returns the compiled template for the given verb, or None if it is not a verb.
+    If the VERBS table has been changed directly, the affected verb is recompiled.
+    """
+    verbdata = VERBS.get(verb)
+    if verbdata is None:
+        return None
+    template = COMPILED_VERBS.get(verb)
+    if template is None or template.verbdata is not verbdata:
+        template = COMPILED_VERBS[verb] = VerbTemplate(verb, verbdata)
+    return template
+
+
 def adjust_available_verbs(allowed_verbs: Sequence[str]=None, remove_verbs: Sequence[str]=[], add_verbs: Dict[str, Tuple]={}) -> None:
     """Adjust the available verbs"""
     global VERBS, AGGRESSIVE_VERBS, NONLIVING_OK_VERBS, MOVEMENT_VERBS
@@ -386,6 +561,10 @@ def adjust_available_verbs(allowed_verbs: Sequence[str]=None, remove_verbs: Sequ
         NONLIVING_OK_VERBS.discard(v)
         MOVEMENT_VERBS.discard(v)
     VERBS.update(add_verbs)
+    compile_verbs()
+
+
+compile_verbs()
 
 
 ACTION_QUALIFIERS = {
@@ -5,17 +5,35 @@ Unittests for the driver
 Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 
+import asyncio
 import datetime
 import heapq
+import json
 import os
+import random
+import tempfile
+import time
 import unittest
+import unittest.mock
+import zlib
 
 import tale.base
+import tale.charbuilder
+import tale.cmds.wizard
 import tale.demo
 import tale.driver
 import tale.driver_if
 import tale.driver_mud
+import tale.driver_replay
+import tale.errors
+import tale.player
+import tale.profiler
+import tale.pubsub
+import tale.replay
+import tale.story
+import tale.tio.mud_browser_io
 import tale.util
+from tale import mud_context
 from tale.cmds import cmd, wizcmd, disabled_in_gamemode
 from tale.story import GameMode
 from tests.supportstuff import Thing, FakeDriver
@@ -61,6 +79,72 @@ class TestDriverCreation(unittest.TestCase):
         self.assertIsNone(d.resources)
         self.assertIsNone(d.user_resources)
 
+    def testMudInputWakeup(self):
+        d = tale.driver_mud.MudDriver()
+        self.assertEqual([], d.wait_for_player_input(0.01))
+        p1 = tale.player.Player("julie", "f")
+        p2 = tale.player.Player("fritz", "m")
+        d.notify_player_input(p2)
+        d.notify_player_input(p1)
+        d.notify_player_input(p2)
+        start = time.time()
+        self.assertEqual([p2, p1], d.wait_for_player_input(10))
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual([], d.wait_for_player_input(0.01))
+        d.wakeup_main_loop()
+        self.assertEqual([], d.wait_for_player_input(0.01))
+
+    def testAsyncioMudInputWakeup(self):
+        d = tale.driver_mud.AsyncioMudDriver()
+        self.assertEqual(GameMode.MUD, d.game_mode)
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            d._input_event = asyncio.Event()
+            self.assertEqual([], loop.run_until_complete(d.async_wait_for_player_input(0.01)))
+            p1 = tale.player.Player("julie", "f")
+            p2 = tale.player.Player("fritz", "m")
+            loop.call_later(0.05, d.notify_player_input, p2)
+            loop.call_later(0.05, d.notify_player_input, p1)
+            start = time.time()
+            self.assertEqual([p2, p1], loop.run_until_complete(d.async_wait_for_player_input(10)))
+            self.assertLess(time.time() - start, 1.0)
+            self.assertEqual([], loop.run_until_complete(d.async_wait_for_player_input(0.01)))
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+
+    def testAsyncWsgiServer(self):
+        def app(environ, start_response):
+            body = environ["wsgi.input"].read()
+            start_response("200 OK", [("Content-Type", "text/plain")])
+            return [environ["REQUEST_METHOD"].encode(), b" ", environ["PATH_INFO"].encode(), b" ", body]
+
+        async def client(port):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /tale/test%20path HTTP/1.1\r\nHost: localhost\r\n\r\n")
+            writer.write(b"POST /tale/input HTTP/1.1\r\nContent-Length: 5\r\nConnection: close\r\n\r\nhello")
+            response = await reader.read()
+            writer.close()
+            return response
+
+        loop = asyncio.new_event_loop()
+        try:
+            asyncio.set_event_loop(loop)
+            server = tale.tio.mud_browser_io.AsyncWsgiServer(app, "127.0.0.1", 0)
+            loop.run_until_complete(server.start())
+            response = loop.run_until_complete(client(server.server_address[1]))
+            server.close()
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+        first, second = response.split(b"HTTP/1.1 200 OK")[1:]
+        self.assertIn(b"Connection: keep-alive", first)
+        self.assertTrue(first.endswith(b"GET /tale/test path "))
+        self.assertIn(b"Connection: close", second)
+        self.assertIn(b"Content-Length: 22", second)
+        self.assertTrue(second.endswith(b"POST /tale/input hello"))
+
 
 class TestDeferreds(unittest.TestCase):
     def testSortable(self):
@@ -86,7 +170,7 @@ class TestDeferreds(unittest.TestCase):
         with self.assertRaises(ValueError):
             driver.defer("blerp", thing.move)
         driver.defer(3601, thing.move)
-        deferred = driver.deferreds[0]
+        deferred = next(iter(driver.deferreds))
         after = deferred.due_gametime - now
         self.assertEqual(3601, after.seconds)
 
@@ -97,7 +181,7 @@ class TestDeferreds(unittest.TestCase):
         driver.game_clock = tale.util.GameDateTime(now, 1)
         due = driver.game_clock.plus_realtime(datetime.timedelta(seconds=3601))
         driver.defer(due, thing.move)
-        deferred = driver.deferreds[0]
+        deferred = next(iter(driver.deferreds))
         after = deferred.due_gametime - now
         self.assertEqual(3601, after.seconds)
 
@@ -119,6 +203,65 @@ class TestDeferreds(unittest.TestCase):
             dues.append(heapq.heappop(heap).due_gametime)
         self.assertEqual([t1, t2, t3, t4, t5], dues)
 
+    def _check_scheduler(self, scheduler):
+        start = datetime.datetime(2000, 1, 1)
+        offsets = [0, 0.5, 1, 3, 63, 64, 65, 200, 4095, 4096, 5000, 300000, 20000000, 3.5, 1000.25]
+        owner1 = Thing()
+        owner2 = Thing()
+        for i, offset in enumerate(offsets):
+            owner = owner1 if i % 2 else owner2
+            scheduler.push(tale.driver.Deferred(start + datetime.timedelta(seconds=offset), owner.append, [offset], None))
+        self.assertEqual(len(offsets), len(scheduler))
+        self.assertEqual(sorted(offsets), sorted(d.vargs[0] for d in scheduler))
+        due = scheduler.pop_due(start + datetime.timedelta(seconds=3.4))
+        self.assertEqual([0, 0.5, 1, 3], [d.vargs[0] for d in due])
+        due = scheduler.pop_due(start + datetime.timedelta(seconds=3.4))
+        self.assertEqual([], due)
+        due = scheduler.pop_due(start + datetime.timedelta(seconds=3.5))
+        self.assertEqual([3.5], [d.vargs[0] for d in due])
+        scheduler.remove_owner(owner1)
+        self.assertEqual([63, 65, 1000.25, 4095, 5000, 20000000], sorted(d.vargs[0] for d in scheduler))
+        # a deferred that's already due when added, is returned on the next call
+        scheduler.push(tale.driver.Deferred(start, owner1.append, [-1], None))
+        due = scheduler.pop_due(start + datetime.timedelta(seconds=5000))
+        self.assertEqual([-1, 63, 65, 1000.25, 4095, 5000], [d.vargs[0] for d in due])
+        due = scheduler.pop_due(start + datetime.timedelta(days=365))
+        self.assertEqual([20000000], [d.vargs[0] for d in due])
+        self.assertEqual(0, len(scheduler))
+        scheduler.push(tale.driver.Deferred(start, owner1.append, [1], None))
+        scheduler.clear()
+        self.assertEqual(0, len(scheduler))
+        self.assertEqual([], list(scheduler))
+
+    def testHeapqScheduler(self):
+        self._check_scheduler(tale.driver.HeapqDeferredScheduler())
+
+    def testTimingWheelScheduler(self):
+        self._check_scheduler(tale.driver.TimingWheelDeferredScheduler())
+        self._check_scheduler(tale.driver.TimingWheelDeferredScheduler(datetime.timedelta(seconds=0.3)))
+        wheel = tale.driver.TimingWheelDeferredScheduler()
+        wheel.set_resolution(datetime.timedelta(seconds=10))
+        wheel.push(tale.driver.Deferred(datetime.datetime.now(), os.getcwd, None, None))
+        with self.assertRaises(tale.errors.TaleError):
+            wheel.set_resolution(datetime.timedelta(seconds=1))
+
+    def testTimingWheelManyTicks(self):
+        rnd = random.Random(42)
+        start = datetime.datetime(2000, 1, 1)
+        wheel = tale.driver.TimingWheelDeferredScheduler()
+        offsets = sorted(rnd.uniform(0, 100000) for _ in range(500))
+        for offset in offsets:
+            wheel.push(tale.driver.Deferred(start + datetime.timedelta(seconds=offset), os.getcwd, [offset], None))
+        result = []
+        now = start
+        while wheel:
+            now += datetime.timedelta(seconds=rnd.uniform(0, 700))
+            due = wheel.pop_due(now)
+            self.assertTrue(all(d.due_gametime <= now for d in due))
+            self.assertTrue(all(d.due_gametime > now for d in wheel))
+            result.extend(d.vargs[0] for d in due)
+        self.assertEqual(offsets, result)
+
     def testCallable(self):
         def scoped_function():
             pass
@@ -137,6 +280,27 @@ class TestDeferreds(unittest.TestCase):
         with self.assertRaises(ValueError):
             d = tale.driver.Deferred(due, lambda a, ctx=None: 1, [42], None)
 
+    def testInvokePeriodical(self):
+        t = Thing()
+        due = datetime.datetime(2016, 1, 1)
+        clock = tale.util.GameDateTime(due, 1)
+        ctx = tale.util.Context(driver=FakeDriver(), clock=clock, config=None, player_connection=None)
+        d = tale.driver.Deferred(due, t.append, [42], None, periodical=(10, 20))
+        self.assertTrue(d.invoke(ctx))
+        dispatch = d.resolve()
+        self.assertTrue(dispatch.wants_ctx)
+        self.assertFalse(dispatch.marked_periodical)
+        self.assertTrue(datetime.timedelta(seconds=10) <= d.due_gametime - due <= datetime.timedelta(seconds=20))
+        self.assertTrue(d.invoke(ctx))
+        self.assertIs(dispatch, d.resolve(), "dispatch must be resolved only once")
+        self.assertEqual([42, 42], t.x)
+        self.assertIsNone(d.kwargs, "kwargs must not be polluted with the ctx")
+        d = tale.driver.Deferred(due, t.append, [99], None)
+        self.assertFalse(d.invoke(ctx))
+        self.assertEqual([42, 42, 99], t.x)
+        with self.assertRaises(AttributeError):
+            d.__dict__
+
     def testDue_realtime(self):
         # test due timings where the gameclock == realtime clock
         game_clock = tale.util.GameDateTime(datetime.datetime(2013, 7, 18, 15, 29, 59, 123))
@@ -243,6 +407,318 @@ class TestCommands(unittest.TestCase):
         wiz = self.cmds.get([None])
         self.assertEqual({"verb2"}, set(wiz.keys()))
 
+    def testCommandsCached(self):
+        noob = self.cmds.get({"noob"})
+        self.assertIs(noob, self.cmds.get(["noob"]))
+        self.assertIsNot(noob, self.cmds.get(["wizard"]))
+        self.assertEqual({"verb1": "docstring1", "verb2": "docstring2", "verb4": "docstring3"}, self.cmds.helptexts({"noob"}))
+        self.cmds.override("verb4", func2, "noob")
+        noob = self.cmds.get({"noob"})
+        self.assertIs(func2, noob["verb4"])
+        self.assertEqual("docstring2", self.cmds.helptexts({"noob"})["verb4"])
+        self.cmds.add("verb5", func3, "noob")
+        self.assertIn("verb5", self.cmds.get({"noob"}))
+
+    def testCommandsBySpelling(self):
+        self.assertEqual([(1, "verb1"), (1, "verb2")], self.cmds.by_spelling([None], "verb", 1))
+        self.assertEqual([(1, "verb1"), (1, "verb2"), (1, "verb3")], self.cmds.by_spelling(["wizard"], "verb", 1))
+        self.assertEqual([(1, "verb4"), (2, "verb1"), (2, "verb2")], self.cmds.by_spelling(["noob"], "vreb4", 2))
+        self.cmds.add("verb6", func3, "noob")
+        self.assertEqual((0, "verb6"), self.cmds.by_spelling(["noob"], "verb6", 2)[0])
+
+
+class TestTickProfiler(unittest.TestCase):
+    def testHistogram(self):
+        histogram = tale.profiler.RollingHistogram(size=100)
+        self.assertEqual({"count": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}, histogram.stats())
+        for duration in range(200):
+            histogram.add(float(duration))
+        stats = histogram.stats()
+        self.assertEqual(200, stats["count"])
+        self.assertEqual(150.0, stats["p50"])
+        self.assertEqual(195.0, stats["p95"])
+        self.assertEqual(199.0, stats["p99"])
+        self.assertEqual(199.0, stats["max"])
+
+    def testServerTick(self):
+        driver = FakeDriver()
+        driver.story = tale.story.StoryBase()
+        thing = Thing()
+        driver.defer(0.1, thing.append, 42)
+        driver.defer(0.1, module_level_func)
+        tale.pubsub.topic("test-profiler").send("event")
+        driver._server_tick()
+        driver._server_tick()
+        self.assertEqual([42], thing.x)
+        profile = json.loads(driver.tick_profiler.dump_json())
+        for phase in tale.profiler.TickProfiler.phases:
+            self.assertEqual(2, profile["phases"][phase]["count"])
+        self.assertEqual({"Thing", "module:" + __name__}, {d["owner"] for d in profile["slowest_deferreds"]})
+        self.assertEqual({"append", "module_level_func"}, {d["action"] for d in profile["slowest_deferreds"]})
+        self.assertEqual(1, profile["pubsub_events"]["test-profiler"])
+        driver.tick_profiler.reset()
+        driver.tick_profiler.enabled = False
+        driver._server_tick()
+        self.assertEqual(0, driver.tick_profiler.phase_timings["total"].count)
+        self.assertEqual([], driver.tick_profiler.slowest_deferreds())
+
+
+class FakeTimer:
+    """stands in for time.perf_counter, so that the tick budget tests don't depend on the speed of the machine"""
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SlowThing(Thing):
+    def __init__(self, timer: FakeTimer) -> None:
+        super().__init__()
+        self.timer = timer
+
+    def slow_append(self, value, ctx):
+        self.timer.now += 0.05
+        self.x.append(value)
+
+
+class TestTickBudget(unittest.TestCase):
+    def setUp(self):
+        self.timer = FakeTimer()
+        patcher = unittest.mock.patch("time.perf_counter", self.timer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testCarryOver(self):
+        driver = FakeDriver()
+        driver.story = tale.story.StoryBase()
+        driver.story.config = tale.story.StoryConfig()
+        driver.story.config.server_tick_budget = 0.07
+        thing = SlowThing(self.timer)
+        other = SlowThing(self.timer)
+        for value in range(5):
+            driver.defer(0.1 + value / 100, thing.slow_append, value)
+        driver.defer(0.2, other.slow_append, 99)
+        driver._server_tick()
+        self.assertEqual([0, 1], thing.x)
+        self.assertEqual(1, driver.tick_overloads)
+        self.assertEqual(4, len(driver.overdue_deferreds))
+        driver.remove_deferreds(other)
+        self.assertEqual(3, len(driver.overdue_deferreds))
+        driver._run_overdue_deferreds()
+        self.assertEqual([0, 1, 2, 3], thing.x)
+        self.assertEqual(2, driver.tick_overloads)
+        driver._run_overdue_deferreds()
+        self.assertEqual([0, 1, 2, 3, 4], thing.x)
+        self.assertEqual([], driver.overdue_deferreds)
+        self.assertEqual(2, driver.tick_overloads)
+        self.assertEqual([], other.x)
+
+    def testNoBudget(self):
+        driver = FakeDriver()
+        driver.story = tale.story.StoryBase()
+        driver.story.config = tale.story.StoryConfig()
+        thing = SlowThing(self.timer)
+        for value in range(5):
+            driver.defer(0.1, thing.slow_append, value)
+        driver._server_tick()
+        self.assertEqual([0, 1, 2, 3, 4], thing.x)
+        self.assertEqual(0, driver.tick_overloads)
+
+
+class RecordingStory(tale.story.StoryBase):
+    def init_player(self, player):
+        player.insert(tale.base.Item("coin"), None)
+
+
+class TestCommandRecording(unittest.TestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.logfile = os.path.join(tmpdir.name, "commands.log")
+        self.addCleanup(setattr, mud_context, "driver", mud_context.driver)
+        self.addCleanup(setattr, mud_context, "config", mud_context.config)
+
+    def testRecordAndReadLog(self):
+        driver = FakeDriver()
+        driver.story = tale.story.StoryBase()
+        driver.story.config = tale.story.StoryConfig()
+        driver.story.config.name = "Test Story"
+        driver.game_mode = GameMode.MUD
+        driver.command_recorder = tale.replay.CommandRecorder(self.logfile, seed=42)
+        mud_context.driver = driver
+        mud_context.config = driver.story.config
+        room = tale.base.Location("Room", "A test room.")
+        julie = tale.player.Player("julie", "f")
+        julie.move(room)
+        conn = tale.player.PlayerConnection(julie)
+        driver.command_recorder.start(driver)
+        driver._server_tick()
+        output_before = julie._output.text()
+        self.assertTrue(driver._execute_player_command("look", conn))
+        expected_checksum = tale.replay.output_checksum(output_before, julie)
+        self.assertIn("A test room.", julie.test_get_output_paragraphs()[-1])
+        self.assertFalse(driver._execute_player_command("xyzzy", conn))
+        driver.command_recorder.leave(driver.server_ticks, julie)
+        driver.command_recorder.close()
+        header, events = tale.replay.read_log(self.logfile)
+        self.assertEqual("Test Story", header["story"])
+        self.assertEqual("mud", header["game_mode"])
+        self.assertEqual(42, header["seed"])
+        events = list(events)
+        self.assertEqual(4, len(events))
+        self.assertEqual("Room", events[0]["enter"]["location"])
+        self.assertEqual("f", events[0]["enter"]["gender"])
+        self.assertEqual({"tick": 1, "player": "julie", "cmd": "look", "output": expected_checksum}, events[1])
+        self.assertEqual("xyzzy", events[2]["cmd"])
+        self.assertEqual({"tick": 1, "player": "julie", "leave": True}, events[3])
+
+    def testRecordAndReplay(self):
+        config = tale.story.StoryConfig()
+        config.name = "Test Story"
+        driver = FakeDriver()
+        driver.story = RecordingStory()
+        driver.story.config = config
+        driver.game_mode = GameMode.IF
+        driver.command_recorder = tale.replay.CommandRecorder(self.logfile, seed=42)
+        mud_context.driver = driver
+        mud_context.config = config
+        room = tale.base.Location("Vault", "A test room.")
+        julie = tale.player.Player("julie", "f")
+        julie.move(room)
+        driver.story.init_player(julie)
+        conn = tale.player.PlayerConnection(julie)
+        conn.io = tale.driver_replay.ReplayIo(conn)
+        driver.all_players[julie.name] = conn
+        driver.command_recorder.start(driver)
+
+        def enter(line):
+            # like the main loop does: continue the dialogs, then process the line the player entered
+            tale.pubsub.sync("driver-async-dialogs")
+            conn.write_output()
+            if conn in driver.waiting_for_input:
+                julie.store_input_line(line)
+                driver._answer_dialog(conn)
+            else:
+                driver._execute_player_command(line, conn)
+
+        for line in ["inventory", "drop all", "maybe", "yes", "inventory"]:
+            enter(line)
+        self.assertNotIn(julie, driver.waiting_for_input)
+        self.assertEqual(0, julie.inventory_size)
+        driver.command_recorder.leave(driver.server_ticks, julie)
+        driver.command_recorder.close()
+        events = list(tale.replay.read_log(self.logfile)[1])
+        self.assertEqual(["inventory", "drop all", None, None, "inventory"], [e.get("cmd") for e in events[1:-1]])
+        self.assertEqual(["maybe", "yes"], [e["answer"] for e in events if "answer" in e])
+        # get rid of the recorded session, and replay it
+        room.remove(julie, None)
+        julie.destroy(tale.util.Context(driver, None, config, None))
+        for item in list(room.items):
+            room.remove(item, None)
+        tale.pubsub.unsubscribe_all(driver)     # the recording driver shouldn't continue the dialogs of the replay
+        replayer = tale.driver_replay.ReplayDriver(self.logfile)
+        replayer.story = RecordingStory()
+        replayer.story.config = config
+        replayer.game_clock = driver.game_clock
+        replayer.moneyfmt = driver.moneyfmt
+        mud_context.driver = replayer
+        replayer.start_main_loop()
+        self.assertEqual(3, replayer.results["commands"])
+        self.assertEqual(0, replayer.results["errors"])
+        self.assertEqual([], replayer.results["first_mismatches"])
+        self.assertEqual(0, replayer.results["output_mismatches"])
+        self.assertEqual(1, len(room.items))
+        self.assertEqual([], list(replayer.all_players))
+
+    def testReadInvalidLog(self):
+        with open(self.logfile, "w") as out:
+            out.write('{"format": "something else"}\n')
+        with self.assertRaises(ValueError):
+            tale.replay.read_log(self.logfile)
+
+    def testOutputChecksum(self):
+        julie = tale.player.Player("julie", "f")
+        julie.tell("first")
+        before = julie._output.text()
+        julie.tell("second")
+        self.assertEqual(zlib.crc32(b"second"), tale.replay.output_checksum(before, julie))
+        self.assertEqual("first\nsecond\n", julie._output.text())   # the buffer is not cleared
+
+
+class TestVerbSuggestions(unittest.TestCase):
+    def testSuggestVerbs(self):
+        driver = FakeDriver()
+        mud_context.driver = driver
+        mud_context.config = tale.story.StoryConfig()
+        room = tale.base.Location("Room", "A test room.")
+        room.add_exits([tale.base.Exit("north", room, "The way north.")])
+        julie = tale.player.Player("julie", "f")
+        julie.move(room)
+        tale.base.Living("kate", "f", race="human").move(room)
+        self.assertEqual(["north"], driver.suggest_verbs(julie, "nroth"))
+        self.assertIn("smile", driver.suggest_verbs(julie, "smlie"))
+        self.assertIn("look", driver.suggest_verbs(julie, "loook"))
+        self.assertIn("kate", driver.suggest_verbs(julie, "kaet"))
+        self.assertEqual([], driver.suggest_verbs(julie, "xyzzyx"))
+        self.assertLessEqual(len(driver.suggest_verbs(julie, "sit", amount=3)), 3)
+        conn = tale.player.PlayerConnection(julie)
+        self.assertFalse(driver._execute_player_command("nroth", conn))
+        self.assertEqual(["The verb `nroth' is unrecognized.\nDid you mean `north'?\n"], julie.test_get_output_paragraphs()[-1:])
+
+
+class TestPlayerSearch(unittest.TestCase):
+    def testSearchAndRename(self):
+        driver = FakeDriver()
+        mud_context.driver = driver
+        mud_context.config = tale.story.StoryConfig()
+        julie = tale.player.Player("julie", "f")
+        driver.all_players[julie.name] = tale.player.PlayerConnection(julie)
+        self.assertIs(julie, driver.search_player("julie"))
+        self.assertIs(julie, driver.search_player("Julie"))
+        self.assertIsNone(driver.search_player("kate"))
+        naming = tale.charbuilder.PlayerNaming()
+        naming.name = "Kate"
+        naming.gender = "f"
+        driver._rename_player(julie, naming)
+        self.assertEqual("kate", julie.name)
+        self.assertEqual(["kate"], list(driver.all_players))
+        self.assertIs(julie, driver.search_player("KATE"))
+        self.assertIsNone(driver.search_player("julie"))
+
+    def testTeleportByName(self):
+        driver = FakeDriver()
+        mud_context.driver = driver
+        mud_context.config = tale.story.StoryConfig()
+        ctx = tale.util.Context(driver, None, mud_context.config, None)
+        hall = tale.base.Location("Hall")
+        sewer = tale.base.Location("Sewer")
+        wizard = tale.player.Player("merlin", "m")
+        wizard.privileges.add("wizard")
+        wizard.move(hall)
+        rat = tale.base.Living("rat", "n")
+        mouse = tale.base.Living("mouse", "n")
+        sewer.insert(rat, None)
+        sewer.insert(mouse, None)
+        teleport = tale.cmds.wizard.do_teleport
+        teleport(wizard, tale.base.ParseResult("!teleport", args=["rat"]), ctx)
+        self.assertIs(hall, rat.location)
+        # a renamed creature is found by its new name only
+        rat.name = "fido"
+        with self.assertRaises(tale.errors.ActionRefused):
+            teleport(wizard, tale.base.ParseResult("!teleport", args=["rat"]), ctx)
+        rat.move(sewer)
+        teleport(wizard, tale.base.ParseResult("!teleport", args=["fido"]), ctx)
+        self.assertIs(hall, rat.location)
+        # a cloned creature is found as well
+        wizard.move(sewer)
+        clone = mouse.wiz_clone(wizard)
+        mouse.destroy(ctx)
+        sewer.remove(mouse, None)
+        wizard.move(hall)
+        teleport(wizard, tale.base.ParseResult("!teleport", args=["mouse"]), ctx)
+        self.assertIs(hall, clone.location)
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
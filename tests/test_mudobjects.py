@@ -8,9 +8,10 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 import datetime
 import unittest
 
-from tale import pubsub, mud_context
+from tale import base, pubsub, mud_context
 from tale.base import Location, Exit, Item, MudObject, Living, _limbo, Container, Weapon, Door, Key, ParseResult, MudObjRegistry
 from tale.demo.story import Story as DemoStory
+from tale.items.basic import Boxlike
 from tale.errors import ActionRefused, LocationIntegrityError, UnknownVerbException, TaleError
 from tale.player import Player
 from tale.story import MoneyType
@@ -82,6 +83,35 @@ class TestLocations(unittest.TestCase):
         expected = ["[Main hall]", "Exits: door, east, up", "You see: key, two magazines, and table", "Present here: fly, julie, and two rats"]
         self.assertEqual(expected, strip_text_styles(self.hall.look(exclude_living=self.player, short=True)))
 
+    def test_look_cached(self):
+        looked = self.hall.look(exclude_living=self.player)
+        self.assertEqual(looked, self.hall.look(exclude_living=self.player))
+        self.assertIsNot(looked, self.hall.look(exclude_living=self.player), "must return a copy")
+        self.assertIn("Player, attractive Julie, and two rats are here.", self.hall.look()[-1])
+        self.assertNotIn("fly", self.hall.look(exclude_living=self.fly, short=True)[-1])
+        fly2 = Living("fly", "n", race="insect", short_descr="A fly buzzes around your head.")
+        self.hall.insert(fly2, None)
+        self.assertIn("A fly buzzes around your head.", self.hall.look(exclude_living=self.fly)[-1])
+        self.hall.remove(fly2, None)
+        self.assertNotIn("A fly buzzes around your head.", self.hall.look(exclude_living=self.fly)[-1])
+        # changes of the things present, the exits and the location itself are noticed
+        self.julie.title = "lovely Julie"
+        self.assertIn("Lovely Julie and two rats are here.", self.hall.look(exclude_living=self.player)[-1])
+        self.key.short_description = "A key lies on the floor."
+        self.assertTrue(self.hall.look()[-1].startswith("A key lies on the floor."))
+        self.hall.add_exits([Exit("west", self.street, "A window looks out on the street.")])
+        self.assertIn("A window looks out on the street.", self.hall.look()[2])
+        self.hall.description = "A big hall."
+        self.assertEqual("A big hall.", self.hall.look()[1])
+        self.hall.remove(self.julie, None)
+        self.assertNotIn("Julie", self.hall.look()[-1])
+        # things with a dynamic title are described anew every time
+        box = Boxlike("box", "box")
+        self.attic.insert(box, None)
+        self.assertEqual("You see a box.", self.attic.look()[-1])
+        box.opened = True
+        self.assertEqual("You see an empty box.", self.attic.look()[-1])
+
     def test_search_living(self):
         self.assertEqual(None, self.hall.search_living("<notexisting>"))
         self.assertEqual(None, self.attic.search_living("<notexisting>"))
@@ -252,6 +282,113 @@ class TestLocations(unittest.TestCase):
         room.notify_action(parsed, player)
         room._notify_action_all(parsed, player)
 
+    def test_name_index(self):
+        room = Location("room")
+        rat = Living("rat", "n", race="rodent")
+        bag = Item("bag", "leather bag")
+        bag.aliases = {"leather bag"}
+        rat.move(room)
+        room.insert(bag, None)
+        self.assertIs(rat, room.livings.find("rat"))
+        self.assertIs(bag, room.items.find("leather bag"))
+        self.assertIsNone(room.items.find("rat"))
+        self.assertEqual((bag, "leather bag", 2), room.items.match_words(["the", "leather", "bag", "here"], 1))
+        self.assertEqual((None, "", 0), room.items.match_words(["leather", "thing"], 0))
+        rat.aliases.add("big rodent")
+        self.assertIs(rat, room.livings.find("big rodent"))
+        self.assertEqual((rat, "big rodent", 2), room.livings.match_words(["big", "rodent"], 0))
+        rat.aliases = ["vermin"]
+        self.assertIsNone(room.livings.find("big rodent"))
+        self.assertIs(rat, room.livings.find("vermin"))
+        bag.init_names("sack", None, None, None)
+        self.assertIsNone(room.items.find("bag"))
+        self.assertIs(bag, room.items.find("sack"))
+        room.remove(bag, None)
+        self.assertIsNone(room.items.find("sack"))
+        self.assertEqual((None, "", 0), room.items.match_words(["leather", "bag"], 0))
+        self.assertEqual({}, room.items._trie)
+        bag.aliases.add("pouch")     # not in the room anymore
+        self.assertIsNone(room.items.find("pouch"))
+        room.livings = [rat]
+        self.assertIs(rat, room.livings.find("vermin"))
+        julie = Player("julie", "f")
+        julie.insert(bag, julie)
+        self.assertIs(bag, julie.inventory_names.find("pouch"))
+        # the results of set operators are plain sets that don't take over the name index of the objects
+        kate = Living("kate", "f")
+        room.insert(kate, None)
+        version = room.livings.version
+        others = room.livings - {kate}
+        self.assertEqual({rat}, others)
+        self.assertIsInstance(others, set)
+        self.assertIsInstance(room.livings | {bag}, set)
+        del others
+        rat.name = "mouse"
+        self.assertIs(rat, room.livings.find("mouse"))
+        self.assertIsNone(room.livings.find("rat"))
+        self.assertNotEqual(version, room.livings.version)
+
+    def test_name_prefix_index(self):
+        room = Location("room")
+        rat = Living("rat", "n", race="rodent")
+        rat.aliases = {"rodent"}
+        rat.move(room)
+        room.insert(Item("rope"), None)
+        self.assertEqual(["rat"], room.livings.names_with_prefix("ra"))
+        self.assertEqual(["rodent"], room.livings.names_with_prefix("ro"))
+        self.assertEqual("rope", room.items.first_name_with_prefix("ro"))
+        rat.aliases.add("rascal")
+        self.assertEqual(["rascal", "rat"], room.livings.names_with_prefix("ra"))
+        rat.verbs["rattle"] = "rattle the cage"
+        self.assertEqual(["rattle"], room.livings.verbs_with_prefix("r"))
+        self.assertEqual({"rattle"}, room.custom_verbs_with_prefix("ra"))
+        room.remove(rat, None)
+        self.assertEqual([], room.livings.names_with_prefix(""))
+        self.assertEqual([], room.livings.verbs_with_prefix(""))
+        self.assertIsNone(room.livings.first_name_with_prefix("ra"))
+
+    def test_name_spelling_index(self):
+        room = Location("room")
+        rat = Living("rat", "n", race="rodent")
+        rat.move(room)
+        self.assertEqual([(1, "rat")], room.livings.names_by_spelling("rta", 1))
+        rat.aliases.add("rodent")
+        self.assertEqual([(2, "rat"), (2, "rodent")], room.livings.names_by_spelling("rdnt", 2))
+        room.remove(rat, None)
+        self.assertEqual([], room.livings.names_by_spelling("rta", 1))
+
+    def test_custom_verbs_aggregate(self):
+        room = Location("room")
+        rat = Living("rat", "n", race="rodent")
+        box = Item("box")
+        box.verbs = {"open": "open it"}
+        rat.move(room)
+        room.insert(box, None)
+        room.add_exits([Exit("north", room, "north", "north")])
+        self.assertTrue(room.has_custom_verb("open"))
+        self.assertFalse(room.has_custom_verb("squeak"))
+        rat.verbs["squeak"] = "make a noise"
+        self.assertTrue(room.has_custom_verb("squeak"))
+        self.assertEqual({"open": "open it", "squeak": "make a noise"}, room.custom_verbs())
+        del rat.verbs["squeak"]
+        self.assertFalse(room.has_custom_verb("squeak"))
+        room.exits["north"].verbs["knock"] = "knock knock"
+        self.assertTrue(room.has_custom_verb("knock"))
+        room.remove(box, None)
+        self.assertFalse(room.has_custom_verb("open"))
+        room.verbs = {"dance": "dance around"}
+        self.assertTrue(room.has_custom_verb("dance"))
+        julie = Player("julie", "f")
+        julie.move(room)
+        julie.insert(box, julie)
+        self.assertTrue(mud_context.driver.is_custom_verb(julie, "open"))
+        self.assertTrue(mud_context.driver.is_custom_verb(julie, "dance"))
+        self.assertFalse(mud_context.driver.is_custom_verb(julie, "squeak"))
+        verbs = mud_context.driver.recognised_verbs(julie)
+        self.assertIn("open", verbs)
+        self.assertIn("look", verbs)
+        self.assertNotIn("squeak", verbs)
+
 
 class TestDoorsExits(unittest.TestCase):
     def setUp(self):
@@ -777,6 +914,34 @@ class TestLiving(unittest.TestCase):
         self.assertEqual(npc, room2.npc_arrived)
         self.assertEqual(room1, room2.npc_arrived_from)
 
+    def test_location_notifications_batched(self):
+        class ArrivalNotify(Location):
+            def notify_npc_arrived(self, npc: Living, previous_location: Location) -> None:
+                self.arrivals.append((npc, previous_location))
+
+        npc = Living("rat", "m", race="rodent")
+        plain = Location("plain")
+        room = ArrivalNotify("room")
+        room.arrivals = []
+        plain.insert(npc, None)
+        base.location_notifications.sync()
+        npc.move(room)
+        npc.move(plain)
+        npc.move(room)
+        self.assertEqual([], room.arrivals, "notifications are delivered in batch")
+        self.assertEqual([
+            (base.LocationNotificationKind.NPC_LEFT, npc, plain, room, None),
+            (base.LocationNotificationKind.NPC_ARRIVED, npc, room, plain, None),
+            (base.LocationNotificationKind.NPC_LEFT, npc, room, plain, None),
+            (base.LocationNotificationKind.NPC_ARRIVED, npc, plain, room, None),
+            (base.LocationNotificationKind.NPC_LEFT, npc, plain, room, None),
+            (base.LocationNotificationKind.NPC_ARRIVED, npc, room, plain, None)], base.location_notifications.events)
+        base.location_notifications.sync()
+        self.assertEqual([(npc, plain), (npc, plain)], room.arrivals)
+        notifier = base.LocationNotifier()
+        self.assertEqual(frozenset(), notifier.location_overrides(Location))
+        self.assertEqual({base.LocationNotificationKind.NPC_ARRIVED}, notifier.location_overrides(ArrivalNotify))
+
     def test_init_names(self):
         j = Living("julie", "f", race="human", descr="   this is julie    ", short_descr="     short descr of julie    ")
         self.assertEqual("julie", j.name)
@@ -821,6 +986,36 @@ class TestLiving(unittest.TestCase):
         self.assertEqual(["Julie farts.", "Julie takes a note."], listener.messages)
         self.assertEqual(1, j.inventory_size)
 
+    def test_wiretap_created_lazily(self):
+        room = Location("room")
+        j = Living("julie", "f")
+        room.insert(j, None)
+        topicname = ("wiretap-living", "julie#%d" % j.vnum)
+        j.tell("message")
+        room.tell("room message")
+        self.assertNotIn(topicname, pubsub.all_topics, "untapped objects shouldn't create topics")
+        self.assertNotIn(("wiretap-location", "room#%d" % room.vnum), pubsub.all_topics)
+        self.assertNotIn(j, base.wiretapped)
+        listener = PubsubCollector()
+        tap = j.get_wiretap()
+        self.assertIs(tap, j.get_wiretap())
+        tap.subscribe(listener)
+        self.assertIn(j, base.wiretapped)
+        self.assertIs(tap, pubsub.all_topics[topicname])
+        j.tell("tapped message")
+        pubsub.sync()
+        self.assertEqual(["tapped message"], listener.messages)
+        base.destroy_idle_wiretaps(0)
+        self.assertIs(tap, j.get_wiretap(), "tap with a subscriber is not idle")
+        tap.unsubscribe(listener)
+        base.destroy_idle_wiretaps(0)
+        self.assertEqual("<defunct>", tap.name)
+        self.assertNotIn(j, base.wiretapped)
+        self.assertNotIn(topicname, pubsub.all_topics)
+        j.tell("message")
+        self.assertIsNot(tap, j.get_wiretap())
+        base.destroy_wiretap(j)
+        self.assertNotIn(topicname, pubsub.all_topics)
 
 class TestAggressiveNpc(unittest.TestCase):
     def test_init_inventory(self):
@@ -1255,6 +1450,73 @@ class TestMudObject(unittest.TestCase):
         self.assertIs(e1, MudObjRegistry.all_exits[e1.vnum])
         self.assertIs(n1, MudObjRegistry.all_livings[n1.vnum])
 
+    def test_registry_indexes(self):
+        class Rat(Living):
+            pass
+        class BigRat(Rat):
+            pass
+        sewer = Location("Sewer")
+        attic = Location("Attic")
+        rat1 = Rat("rat", "n")
+        rat2 = BigRat("bigrat", "n")
+        cheese = Item("cheese")
+        sewer.insert(rat1, None)
+        sewer.insert(cheese, None)
+        attic.insert(rat2, None)
+        self.assertEqual({rat1, rat2}, set(MudObjRegistry.of_class(Rat)))
+        self.assertEqual({rat2}, set(MudObjRegistry.of_class(BigRat)))
+        self.assertEqual([rat1], list(MudObjRegistry.of_class(Rat, [sewer])))
+        self.assertEqual({rat1, rat2}, set(MudObjRegistry.of_class(Rat, [sewer, attic])))
+        self.assertEqual([cheese], list(MudObjRegistry.of_class(Item, [sewer, attic])))
+        rat3 = Rat("rat", "n")     # the class index is kept up to date
+        self.assertEqual({rat1, rat2, rat3}, set(MudObjRegistry.of_class(Rat)))
+        self.assertIn(cheese, MudObjRegistry.of_class(Item))
+        self.assertIn(sewer, MudObjRegistry.by_name("sewer"))
+        self.assertIn(sewer, MudObjRegistry.by_name("SEWER", Location))
+        self.assertNotIn(rat1, MudObjRegistry.by_name("sewer"))
+        self.assertEqual({rat1, rat3}, set(MudObjRegistry.by_name("rat", Rat)))
+        # the name index is kept up to date
+        rat3.init_names("mouse", "", "", "")
+        self.assertEqual([rat1], MudObjRegistry.by_name("rat", Rat))
+        self.assertEqual([rat3], MudObjRegistry.by_name("mouse", Rat))
+        rat4 = Rat("rat", "n")
+        self.assertEqual({rat1, rat4}, set(MudObjRegistry.by_name("rat", Rat)))
+        # assigning the name directly also updates the index (and the index of the location)
+        rat1.name = "fido"
+        self.assertEqual([rat4], MudObjRegistry.by_name("rat", Rat))
+        self.assertEqual([rat1], MudObjRegistry.by_name("fido"))
+        self.assertTrue(sewer.livings.has_name("fido"))
+        self.assertFalse(sewer.livings.has_name("rat"))
+        rat1.name = "rat"
+        # clones are added to the index
+        sword = Item("sword")
+        self.assertEqual([sword], MudObjRegistry.by_name("sword"))
+        sword2 = sword.clone()
+        self.assertEqual({sword, sword2}, set(MudObjRegistry.by_name("sword", Item)))
+        wizard = Player("merlin", "m")
+        wizard.privileges.add("wizard")
+        wizard.move(attic)
+        rat5 = rat1.wiz_clone(wizard)
+        self.assertEqual({rat1, rat4, rat5}, set(MudObjRegistry.by_name("rat", Rat)))
+        rat5.destroy(Context(mud_context.driver, None, None, None))
+        # destroyed objects are removed from the indexes
+        rat4.destroy(Context(mud_context.driver, None, None, None))
+        self.assertEqual([rat1], MudObjRegistry.by_name("rat", Rat))
+        self.assertNotIn(rat4, MudObjRegistry.of_class(Rat))
+        # lazy listings start at a given vnum
+        listing = list(MudObjRegistry.listing(MudObjRegistry.all_livings, rat2.vnum))
+        self.assertNotIn((rat1.vnum, rat1), listing)
+        self.assertIn((rat2.vnum, rat2), listing)
+        self.assertIn((rat4.vnum, rat4), listing)
+        # in vnum order, also for objects created with a given vnum
+        rat6 = MudObjRegistry.create_object(Rat, "rat", "n", vnum=999998)
+        rat7 = MudObjRegistry.create_object(Rat, "rat", "n", vnum=999997)
+        vnums = [vnum for vnum, _ in MudObjRegistry.listing(MudObjRegistry.all_livings)]
+        self.assertEqual(sorted(vnums), vnums)
+        self.assertEqual([(999997, rat7), (999998, rat6)], list(MudObjRegistry.listing(MudObjRegistry.all_livings, 999997)))
+        with self.assertRaises(TypeError):
+            MudObjRegistry.track_vnum(object())
+
     def test_story_data(self):
         i = Item("thing")
         self.assertEqual({}, i.story_data)
@@ -1265,6 +1527,111 @@ class TestMudObject(unittest.TestCase):
         p.story_data["test"] = 42
         self.assertEqual({"test": 42}, p.story_data)
 
+    def test_compact_layout(self):
+        i = Item("Sword", "long sword")
+        self.assertIs(i.name, Item("sword").name, "names should be interned")
+        # the containers are created when they're needed
+        self.assertIsNone(i._aliases)
+        self.assertIsNone(i._verbs)
+        self.assertIsNone(i._extradesc)
+        self.assertIsNone(i._story_data)
+        i.aliases = set()
+        i.verbs = {}
+        self.assertIsNone(i._aliases)
+        self.assertIsNone(i._verbs)
+        room = Location("armory")
+        room.insert(i, None)
+        self.assertEqual(set(), i.aliases)
+        i.aliases.add("blade")
+        i.verbs["swing"] = "swing the sword"
+        self.assertIs(i, room.items.find("blade"))
+        self.assertTrue(room.has_custom_verb("swing"))
+        i.add_extradesc({"hilt"}, "The hilt is decorated.")
+        self.assertEqual({"hilt": "The hilt is decorated."}, i.extra_desc)
+        # stories can still add their own attributes
+        i.sharpness = 42
+        self.assertEqual(42, i.sharpness)
+        self.assertEqual({"sharpness": 42}, vars(i))
+        with self.assertRaises(AttributeError):
+            base.Stats().sharpness = 42
+        # empty name indexes share their (read only) structures
+        self.assertIs(base.NameIndexedSet()._names, Location("cellar").items._names)
+        self.assertIsNot(base.NameIndexedSet()._names, room.items._names)
+        # clones get their own containers
+        wizard = Living("merlin", "m")
+        wizard.privileges.add("wizard")
+        i.location = None
+        clone = i.wiz_clone(wizard)
+        self.assertEqual({"blade"}, clone.aliases)
+        self.assertIsNot(i.aliases, clone.aliases)
+        self.assertIs(clone, clone.aliases.owner)
+        clone.aliases.add("weapon")
+        self.assertEqual({"blade"}, i.aliases)
+
+    def test_prototype(self):
+        with self.assertRaises(TaleError):
+            base.Prototype("rat", "the rat")
+        rat = base.Prototype("Rat", "big rat", descr="  A big, ugly rat.  ", short_descr="A big rat scurries around.",
+                             aliases={"rodent"}, extra_desc={"tail": "It's long."})
+        rat1 = Living("rat", "n")
+        rat1.init_from_prototype(rat)
+        rat2 = Living("rat", "n")
+        rat2.init_from_prototype(rat)
+        self.assertIs(rat, rat1.prototype)
+        self.assertEqual("rat", rat1.name)
+        self.assertEqual("big rat", rat1.title)
+        self.assertEqual("A big, ugly rat.", rat1.description)
+        self.assertEqual("A big rat scurries around.", rat1.short_description)
+        # the strings and containers are shared until they're changed
+        self.assertIs(rat1.description, rat2.description)
+        self.assertIs(rat1._aliases, rat2._aliases)
+        self.assertIs(rat1._extradesc, rat2._extradesc)
+        self.assertEqual("It's long.", rat1.get_extradesc("tail"))
+        self.assertEqual("", rat1.get_extradesc("teeth"))
+        room = Location("sewer")
+        room.insert(rat1, None)
+        room.insert(rat2, None)
+        self.assertIs(rat1, room.search_living("rodent"))
+        rat1.aliases.add("vermin")
+        rat1.extra_desc["teeth"] = "Sharp!"
+        rat1.description = "A big rat with sharp teeth."
+        self.assertIs(rat1, room.search_living("vermin"))
+        self.assertEqual({"rodent", "vermin"}, rat1.aliases)
+        self.assertEqual({"tail": "It's long.", "teeth": "Sharp!"}, rat1.extra_desc)
+        self.assertIs(rat.aliases, rat2._aliases)
+        self.assertIs(rat.extra_desc, rat2._extradesc)
+        self.assertEqual("", rat2.get_extradesc("teeth"))
+        self.assertEqual("A big, ugly rat.", rat2.description)
+        self.assertEqual(frozenset({"rodent"}), rat.aliases)
+        self.assertEqual({"tail": "It's long."}, rat.extra_desc)
+        # clones share the prototype as well, and things in their inventory are cloned too
+        cheese = Item("cheese")
+        cheese.init_from_prototype(base.Prototype("cheese", "piece of cheese", aliases={"food"}, extra_desc={"holes": "Many."}))
+        rat2.insert(cheese, rat2)
+        wizard = Living("merlin", "m")
+        wizard.privileges.add("wizard")
+        room.insert(wizard, None)
+        clone = rat2.wiz_clone(wizard)
+        self.assertIsNot(rat2, clone)
+        self.assertNotEqual(rat2.vnum, clone.vnum)
+        self.assertIs(clone, MudObjRegistry.all_livings[clone.vnum])
+        self.assertIs(rat, clone.prototype)
+        self.assertIs(rat2._aliases, clone._aliases)
+        self.assertIs(room, clone.location)
+        self.assertIsNot(rat2.soul, clone.soul)
+        self.assertEqual(rat2.stats.hp, clone.stats.hp)
+        self.assertIsNot(rat2.stats, clone.stats)
+        cheese2 = clone.search_item("cheese")
+        self.assertIsNot(cheese, cheese2)
+        self.assertIs(clone, cheese2.contained_in)
+        self.assertIs(cheese2, MudObjRegistry.all_items[cheese2.vnum])
+        self.assertIs(cheese._extradesc, cheese2._extradesc)
+        self.assertIs(cheese2, clone.search_item("food"))
+        cheese3 = cheese.clone()
+        self.assertIs(rat2, cheese3.contained_in)
+        self.assertNotIn(cheese3, rat2)
+        self.assertIs(cheese.prototype, cheese3.prototype)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -680,6 +680,29 @@ class TestTabCompletion(unittest.TestCase):
         conn.io = io
         self.assertEqual(["criticize"], io.tab_complete("critic", driver))
 
+    def test_complete_room_contents(self):
+        player = Player("fritz", "m")
+        driver = FakeDriver()
+        conn = PlayerConnection(player)
+        io = IoAdapterBase(conn)
+        conn.io = io
+        room = Location("room")
+        room.add_exits([Exit("crawlspace", room, "a crawlspace")])
+        player.move(room)
+        cat = Living("cat", "f", race="cat")
+        cat.aliases = {"crazy cat"}
+        cat.verbs["cuddle"] = "cuddle the cat"
+        cat.move(room)
+        room.insert(Item("crowbar"), None)
+        player.insert(Item("crumpet"), player)
+        result = io.tab_complete("cr", driver)
+        for name in ["crawlspace", "crazy cat", "crowbar", "crumpet", "criticize"]:
+            self.assertIn(name, result)
+        self.assertEqual(sorted(result), result)
+        self.assertIn("cuddle", io.tab_complete("cu", driver))
+        cat.move(Location("elsewhere"))
+        self.assertNotIn("crazy cat", io.tab_complete("cr", driver))
+
 
 class TestMudAccounts(unittest.TestCase):
     def setUp(self):
@@ -9,7 +9,8 @@ import gc
 import time
 import unittest
 
-from tale.pubsub import topic, unsubscribe_all, Listener, sync, pending
+from tale import pubsub
+from tale.pubsub import topic, bounded_topic, unsubscribe_all, Listener, Overflow, sync, pending, subscriptions
 
 
 class Subber(Listener):
@@ -25,11 +26,23 @@ class Subber(Listener):
         self.messages = []
 
 
+class BatchSubber(Subber):
+    def pubsub_events(self, topicname, events):
+        self.messages.append((topicname, list(events)))
+        return len(events)
+
+
 class RefusingSubber(Subber):
     def pubsub_event(self, topicname, event):
         raise Listener.NotYet
 
 
+class SlowSubber(Subber):
+    def pubsub_event(self, topicname, event):
+        time.sleep(0.02)
+        return super().pubsub_event(topicname, event)
+
+
 class TestPubsub(unittest.TestCase):
     def test_global_namespace(self):
         s1 = topic("s1")
@@ -159,6 +172,44 @@ class TestPubsub(unittest.TestCase):
         sync()
         self.assertEqual([], subber.messages)
 
+    def test_subscription_index(self):
+        s1 = topic("index1")
+        s2 = topic("index2")
+        subber = Subber("sub1")
+        s1.subscribe(subber)
+        s1.subscribe(subber)
+        s2.subscribe(subber)
+        self.assertEqual(1, len(s1.subscribers))
+        subber_ref, topics = subscriptions[id(subber)]
+        self.assertEqual({s1, s2}, topics)
+        self.assertIn(subber_ref, s1.subscribers)
+        self.assertIn(subber_ref, s2.subscribers)
+        s1.unsubscribe(subber)
+        self.assertEqual({s2}, topics)
+        self.assertEqual(0, len(s1.subscribers))
+        s1.subscribe(subber)
+        s2.destroy()
+        self.assertEqual({s1}, topics)
+        unsubscribe_all(subber)
+        self.assertEqual(set(), topics)
+        self.assertEqual(0, len(s1.subscribers))
+        s1.destroy()
+
+    def test_dead_subscribers_removed(self):
+        s1 = topic("dead1")
+        s2 = topic("dead2")
+        subber = Subber("sub1")
+        s1.subscribe(subber)
+        s2.subscribe(subber)
+        key = id(subber)
+        del subber
+        gc.collect()
+        self.assertEqual(0, len(s1.subscribers))
+        self.assertEqual(0, len(s2.subscribers))
+        self.assertNotIn(key, subscriptions)
+        s1.destroy()
+        s2.destroy()
+
     def test_destroy(self):
         sync()
         s1 = topic("testA")
@@ -187,5 +238,144 @@ class TestPubsub(unittest.TestCase):
         self.assertLess(s.idle_time, 0.1)
 
 
+class TestBoundedTopic(unittest.TestCase):
+    def test_batch_delivery(self):
+        t = bounded_topic("bounded-batch", 10)
+        self.assertIs(t, bounded_topic("bounded-batch", 10))
+        self.assertIs(t, topic("bounded-batch"))
+        batch_subber = BatchSubber("batch")
+        subber = Subber("single")
+        t.subscribe(batch_subber)
+        t.subscribe(subber)
+        t.send(1)
+        t.send(2)
+        results = t.sync()
+        self.assertEqual([("bounded-batch", [1, 2])], batch_subber.messages)
+        self.assertEqual([("bounded-batch", 1), ("bounded-batch", 2)], subber.messages, "default pubsub_events calls pubsub_event")
+        self.assertIn(2, results)
+        self.assertIn(["single", "single"], results)
+        self.assertEqual([], t.sync())
+        self.assertEqual(2, t.events_processed)
+        t.destroy()
+
+    def test_existing_topic(self):
+        t = topic("bounded-existing")
+        with self.assertRaises(TypeError):
+            bounded_topic("bounded-existing", 10)
+        t.destroy()
+        with self.assertRaises(ValueError):
+            bounded_topic("bounded-invalid", 0)
+        with self.assertRaises(ValueError):
+            bounded_topic("bounded-invalid", 10, Overflow.COALESCE)
+
+    def test_drop(self):
+        t = bounded_topic("bounded-drop", 3, Overflow.DROP)
+        subber = BatchSubber("batch")
+        t.subscribe(subber)
+        for event in range(5):
+            t.send(event)
+        self.assertEqual(3, len(t.events))
+        self.assertEqual(2, t.events_dropped)
+        t.sync()
+        self.assertEqual([("bounded-drop", [0, 1, 2])], subber.messages)
+        t.destroy()
+
+    def test_coalesce(self):
+        t = bounded_topic("bounded-coalesce", 3, Overflow.COALESCE, key=lambda event: event[0])
+        subber = BatchSubber("batch")
+        t.subscribe(subber)
+        t.send(("a", 1))
+        t.send(("b", 1))
+        t.send(("a", 2))
+        t.send((None, 1))
+        t.send(("c", 1))
+        t.send(("b", 2))
+        self.assertEqual(1, t.events_dropped)
+        t.sync()
+        self.assertEqual([("bounded-coalesce", [("a", 2), ("b", 2), (None, 1)])], subber.messages)
+        t.send(("a", 3))
+        t.sync()
+        self.assertEqual(("bounded-coalesce", [("a", 3)]), subber.messages[-1])
+        t.destroy()
+
+    def test_sync_when_full(self):
+        t = bounded_topic("bounded-sync", 3, Overflow.SYNC)
+        subber = BatchSubber("batch")
+        t.subscribe(subber)
+        for event in range(5):
+            t.send(event)
+        self.assertEqual([("bounded-sync", [0, 1, 2, 3])], subber.messages)
+        self.assertEqual([4], t.events)
+        self.assertEqual(0, t.events_dropped)
+        t.destroy()
+
+
+class TestStats(unittest.TestCase):
+    def test_stats(self):
+        t = topic("stats-topic")
+        subber = Subber("sub1")
+        refuser = RefusingSubber("refuser")
+        t.subscribe(subber)
+        t.subscribe(refuser)
+        t.send("event1")
+        t.send("event2")
+        self.assertEqual(2, t.events_sent)
+        self.assertEqual(0, t.events_processed)
+        t.send("event3", True)
+        stats = pubsub.stats("stats-topic")["stats-topic"]
+        self.assertEqual(3, stats["sent"])
+        self.assertEqual(3, stats["processed"])
+        self.assertEqual(0, stats["pending"])
+        self.assertEqual(3, stats["notyet"])
+        self.assertEqual({"Subber sub1", "RefusingSubber refuser"}, set(stats["subscribers"]))
+        subber_stats = stats["subscribers"]["Subber sub1"]
+        self.assertEqual(3, subber_stats["events"])
+        self.assertLessEqual(subber_stats["max_time"], subber_stats["total_time"])
+        self.assertIn("stats-topic", pubsub.stats())
+        pubsub.reset_stats()
+        stats = pubsub.stats("stats-topic")["stats-topic"]
+        self.assertEqual(0, stats["sent"])
+        self.assertEqual({}, stats["subscribers"])
+        t.destroy()
+
+    def test_stats_per_subscriber(self):
+        t = topic("stats-same-names")
+        subber1 = Subber("sub")
+        subber2 = Subber("sub")
+        t.subscribe(subber1)
+        t.subscribe(subber2)
+        t.send("event", True)
+        stats = pubsub.stats("stats-same-names")["stats-same-names"]["subscribers"]
+        self.assertEqual({"Subber sub", "Subber sub (2)"}, set(stats))
+        self.assertEqual([1, 1], [subber_stats["events"] for subber_stats in stats.values()])
+        # the statistics of a subscriber go away with the subscription
+        t.unsubscribe(subber1)
+        del subber2
+        self.assertEqual(0, len(t.subscribers))
+        self.assertEqual({}, pubsub.stats("stats-same-names")["stats-same-names"]["subscribers"])
+        t.destroy()
+
+    def test_slow_subscribers(self):
+        t = topic("stats-slow")
+        b = bounded_topic("stats-slow-bounded", 10)
+        subber = Subber("fast")
+        slow = SlowSubber("slow")
+        t.subscribe(subber)
+        t.subscribe(slow)
+        b.subscribe(slow)
+        t.send("event", True)
+        b.send("event1")
+        b.send("event2")
+        b.sync()
+        slow_subbers = [(topicname, name) for topicname, name, _ in pubsub.slow_subscribers() if topicname.startswith("stats-slow")]
+        self.assertEqual({("stats-slow", "SlowSubber slow"), ("stats-slow-bounded", "SlowSubber slow")}, set(slow_subbers))
+        stats = pubsub.stats("stats-slow-bounded")["stats-slow-bounded"]["subscribers"]["SlowSubber slow"]
+        self.assertEqual(2, stats["events"])
+        self.assertEqual(2, stats["slow_events"])
+        self.assertGreaterEqual(stats["max_time"], 0.015)
+        t.destroy()
+        b.destroy()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -938,12 +938,100 @@ class TestSoul(unittest.TestCase):
             self.assertEqual(set(), tale.verbdefs.MOVEMENT_VERBS)
             remaining = sorted(tale.verbdefs.VERBS.keys())
             self.assertEqual(["cough", "frobnizificate", "greet", "poke", "ponder", "sit", "yawn"], remaining)
+            self.assertEqual(remaining, sorted(tale.verbdefs.COMPILED_VERBS.keys()))
+            player = tale.player.Player("julie", "f")
+            who, player_msg, room_msg, target_msg = tale.base.Soul().process_verb_parsed(player, tale.base.ParseResult("frobnizificate"))
+            self.assertEqual("You frobnizes.", player_msg)
         finally:
             # restore original values
             tale.verbdefs.VERBS = ORIG_VERBS
             tale.verbdefs.AGGRESSIVE_VERBS = ORIG_AGGRESSIVE_VERBS
             tale.verbdefs.NONLIVING_OK_VERBS = ORIG_NONLIVING_OK_VERBS
             tale.verbdefs.MOVEMENT_VERBS = ORIG_MOVEMENT_VERBS
+            tale.verbdefs.compile_verbs()
+
+    def test_compiled_verbs(self):
+        template = tale.verbdefs.get_template("smile")
+        self.assertIs(template, tale.verbdefs.COMPILED_VERBS["smile"])
+        self.assertEqual("happily", template.adverb)
+        self.assertFalse(template.message_verb)
+        self.assertFalse(template.needs_person)
+        self.assertEqual((("smile", tale.verbdefs.HOW), ("smiles", tale.verbdefs.HOW)), template.actions[0])
+        self.assertEqual((("smile", tale.verbdefs.HOW, " at", tale.verbdefs.WHO), ("smiles", tale.verbdefs.HOW, " at", tale.verbdefs.WHO)),
+                         template.actions[1])
+        self.assertEqual({tale.verbdefs.HOW, tale.verbdefs.WHO}, template.escapes)
+        self.assertTrue(tale.verbdefs.get_template("reply").message_verb)
+        self.assertTrue(tale.verbdefs.get_template("pet").needs_person)
+        self.assertIsNone(tale.verbdefs.get_template("_unknown_verb_"))
+        action = template.fill(template.actions[1][0], " broadly", "", "", "")
+        self.assertEqual(["smile broadly at", tale.verbdefs.WHO, ""], action)
+        self.assertEqual("smile broadly at Kate", template.render(action, [" Kate"]))
+        # a verb that was changed directly in the verbs table, is recompiled
+        ORIG_VERBS = tale.verbdefs.VERBS.copy()
+        try:
+            tale.verbdefs.VERBS["smile"] = (tale.verbdefs.SIMP, None, "grimace$ \nAT", "at")
+            template = tale.verbdefs.get_template("smile")
+            self.assertEqual((("grimace",), ("grimaces",)), template.actions[0])
+        finally:
+            tale.verbdefs.VERBS = ORIG_VERBS
+            tale.verbdefs.compile_verbs()
+
+    def test_message_not_interpreted_as_template(self):
+        soul = tale.base.Soul()
+        player = tale.player.Player("julie", "f")
+        parsed = soul.parse(player, "mumble 'it costs $5 \\nWHO'")
+        who, player_msg, room_msg, target_msg = soul.process_verb_parsed(player, parsed)
+        self.assertEqual("You mumble 'it costs $5 \\nWHO'.", player_msg)
+        self.assertEqual("Julie mumbles 'it costs $5 \\nWHO'.", room_msg)
+
+    def test_parse_cache(self):
+        soul = tale.base.Soul(parse_cache_size=2)
+        player = tale.player.Player("julie", "f")
+        room = tale.base.Location("somewhere")
+        room.add_exits([tale.base.Exit("east", room, "east")])
+        player.move(room)
+        kate = tale.base.Living("kate", "f")
+        room.insert(kate, None)
+        parsed = soul.parse(player, "hug kate")
+        parsed2 = soul.parse(player, "hug kate")
+        self.assertEqual(1, len(soul._parse_cache))
+        self.assertIsNot(parsed, parsed2)
+        self.assertEqual(str(parsed), str(parsed2))
+        parsed2.args.clear()
+        parsed2.who_info.clear()
+        parsed3 = soul.parse(player, "hug kate")
+        self.assertEqual(["kate"], parsed3.args)
+        self.assertEqual([kate], list(parsed3.who_info))
+        # changes in the room or inventory invalidate the cached results
+        version = room.version
+        room.remove(kate, None)
+        self.assertNotEqual(version, room.version)
+        with self.assertRaises(tale.errors.ParseError):
+            soul.parse(player, "hug kate")
+        room.insert(kate, None)
+        kate.aliases.add("katie")
+        self.assertEqual([kate], list(soul.parse(player, "hug katie").who_info))
+        kate.aliases.clear()
+        with self.assertRaises(tale.errors.ParseError):
+            soul.parse(player, "hug katie")
+        version = player.inventory_names.version
+        player.insert(tale.base.Item("rock"), player)
+        self.assertNotEqual(version, player.inventory_names.version)
+        self.assertEqual("rock", soul.parse(player, "rock").args[0])
+        # exits are cached too
+        for _ in range(2):
+            with self.assertRaises(tale.errors.NonSoulVerb) as x:
+                soul.parse(player, "go east")
+            self.assertEqual("east", x.exception.parsed.verb)
+        # the cache keeps only the most recent command lines
+        self.assertEqual(["rock", "go east"], list(soul._parse_cache))
+        # parses with pronouns or external verbs without a cache token are not cached
+        soul.remember_previous_parse(soul.parse(player, "hug kate"))
+        soul.parse(player, "kiss her")
+        soul.parse(player, "hug kate", {"hug"})
+        self.assertEqual(["go east", "hug kate"], list(soul._parse_cache))
+        self.assertEqual(16, player.soul.parse_cache_size)
+        self.assertEqual(0, kate.soul.parse_cache_size)
 
 
 if __name__ == "__main__":
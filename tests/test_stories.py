@@ -100,6 +100,9 @@ class TestCircleStory(StoryCaseBase, unittest.TestCase):
         self.assertIsInstance(o, Money)
         self.assertEqual("pile", o.name)
         self.assertEqual(23574.0, o.value, "money object must have value>0")
+        self.assertTrue(o.description.endswith(" dollars."), "money keeps its description: " + o.description)
+        o = make_item(2539)     # spawned again from the same prototype
+        self.assertTrue(o.description.endswith(" dollars."), "money keeps its description: " + o.description)
 
 
 class TestBuiltinDemoStory(StoryCaseBase, unittest.TestCase):
@@ -6,6 +6,7 @@ Copyright by Irmen de Jong (irmen@razorvine.net)
 """
 import datetime
 import os
+import types
 import unittest
 
 from tale import util, mud_context
@@ -346,6 +347,63 @@ class TestUtil(unittest.TestCase):
         self.assertEqual([a, b, c], util.sorted_by_name(stuff))
         self.assertEqual([a, c, b], util.sorted_by_title(stuff))
 
+    def test_prefix_index(self):
+        index = util.PrefixIndex(["north", "nod", "newspaper", "nod", "apple"])
+        self.assertEqual(["apple", "newspaper", "nod", "north"], index.words)
+        self.assertEqual(["nod", "north"], index.with_prefix("no"))
+        self.assertEqual(["apple", "newspaper", "nod", "north"], index.with_prefix(""))
+        self.assertEqual([], index.with_prefix("x"))
+        self.assertEqual("nod", index.first_with_prefix("no"))
+        self.assertIsNone(index.first_with_prefix("nx"))
+        index.add("noodle")
+        index.add("noodle")
+        self.assertEqual(["nod", "noodle", "north"], index.with_prefix("no"))
+        index.discard("nod")
+        index.discard("nothing")
+        self.assertEqual(["noodle", "north"], index.with_prefix("no"))
+        self.assertIn("north", index)
+        self.assertNotIn("nod", index)
+        self.assertEqual(4, len(index))
+
+    def test_edit_distance(self):
+        self.assertEqual(0, util.edit_distance("north", "north"))
+        self.assertEqual(1, util.edit_distance("nroth", "north"))    # transposition
+        self.assertEqual(1, util.edit_distance("smil", "smile"))
+        self.assertEqual(1, util.edit_distance("smiles", "smile"))
+        self.assertEqual(3, util.edit_distance("kitten", "sitting"))
+        self.assertEqual(5, util.edit_distance("", "smile"))
+        self.assertEqual(2, util.edit_distance("kitten", "sitting", max_distance=1))
+        self.assertEqual(3, util.edit_distance("a", "abcdef", max_distance=2))
+
+    def test_object_vars(self):
+        class Thing:
+            __slots__ = ("name", "__secret", "unset", "__dict__")
+
+            def __init__(self):
+                self.name = "thing"
+                self.__secret = 42
+
+        thing = Thing()
+        self.assertEqual({"name": "thing", "_Thing__secret": 42}, util.object_vars(thing))
+        thing.extra = "extra"
+        self.assertEqual({"name": "thing", "_Thing__secret": 42, "extra": "extra"}, util.object_vars(thing))
+        self.assertEqual({"extra": "extra"}, vars(thing))
+        self.assertEqual({"x": 1}, util.object_vars(types.SimpleNamespace(x=1)))
+
+    def test_spelling_index(self):
+        index = util.SpellingIndex(["north", "south", "smile", "smirk", "nod"])
+        self.assertEqual(5, len(index))
+        self.assertIn("smile", index)
+        self.assertEqual([(1, "north")], index.suggest("nroth"))
+        self.assertEqual([(1, "smile"), (2, "smirk")], index.suggest("smil"))
+        self.assertEqual([(1, "smile")], index.suggest("smil", max_distance=1))
+        self.assertEqual([], index.suggest("xyzzy"))
+        index.discard("smile")
+        index.discard("smile")
+        self.assertEqual([(2, "smirk")], index.suggest("smil"))
+        index.add("smiles")
+        self.assertEqual([(2, "smiles"), (2, "smirk")], index.suggest("smil"))
+
 
 class TestVfs(unittest.TestCase):
     def test_resource_text(self):